@@ -0,0 +1,135 @@
+"""Admin endpoints for yeest.xyz backend: snapshots and profiling.
+
+Every route requires the X-Admin-Token header to match ADMIN_TOKEN; with no
+token configured the routes are disabled.
+"""
+
+import hmac
+import json
+import os
+import tempfile
+from typing import Optional
+import logging
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, PlainTextResponse
+from pydantic import BaseModel, Field
+from starlette.background import BackgroundTask
+
+from .config import config
+from .rag import rag_system
+from .snapshot import SnapshotError, verify_snapshot
+from .profiling import profiler, to_speedscope
+
+logger = logging.getLogger(__name__)
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Reject requests without the configured admin token."""
+    if not config.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, config.ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+@router.get("/snapshot")
+async def download_snapshot():
+    """Export the current index, embedding cache and retrieval state as one file."""
+    fd, path = tempfile.mkstemp(suffix=".yeest")
+    os.close(fd)
+    try:
+        await run_in_threadpool(rag_system.export_snapshot, path)
+    except SnapshotError as e:
+        os.unlink(path)
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        os.unlink(path)
+        logger.error(f"Error exporting snapshot: {e}")
+        raise HTTPException(status_code=500, detail=f"Error exporting snapshot: {str(e)}")
+    return FileResponse(
+        path,
+        media_type="application/octet-stream",
+        filename="snapshot.yeest",
+        background=BackgroundTask(os.unlink, path)
+    )
+
+@router.put("/snapshot")
+async def upload_snapshot(request: Request):
+    """Store an uploaded snapshot as SNAPSHOT_PATH; it is imported on the next start."""
+    if not config.SNAPSHOT_PATH:
+        raise HTTPException(status_code=400, detail="SNAPSHOT_PATH is not configured")
+
+    limit = config.SNAPSHOT_MAX_UPLOAD_BYTES
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > limit:
+        raise HTTPException(status_code=413, detail=f"Snapshot exceeds {limit} bytes")
+
+    upload_path = f"{config.SNAPSHOT_PATH}.upload"
+    os.makedirs(os.path.dirname(upload_path) or ".", exist_ok=True)
+    f = await run_in_threadpool(open, upload_path, 'wb')
+    try:
+        received = 0
+        async for block in request.stream():
+            received += len(block)
+            if received > limit:
+                raise HTTPException(status_code=413, detail=f"Snapshot exceeds {limit} bytes")
+            await run_in_threadpool(f.write, block)
+    except BaseException:
+        await run_in_threadpool(f.close)
+        os.unlink(upload_path)
+        raise
+    await run_in_threadpool(f.close)
+    try:
+        manifest = await run_in_threadpool(verify_snapshot, upload_path)
+    except SnapshotError as e:
+        os.unlink(upload_path)
+        raise HTTPException(status_code=400, detail=str(e))
+    os.replace(upload_path, config.SNAPSHOT_PATH)
+
+    return {
+        "message": "Snapshot stored; it will be imported on the next restart",
+        "parts": len(manifest["parts"]),
+        "vector_store_backend": manifest["vector_store_backend"],
+    }
+
+class ProfilingSettings(BaseModel):
+    """Runtime profiling settings for this worker."""
+    sample_rate: float = Field(ge=0.0, le=1.0)
+
+@router.get("/profiling")
+async def get_profiling():
+    """Whether profiling is installed and the current sample rate."""
+    return {"enabled": config.PROFILING_ENABLED, "sample_rate": profiler.sample_rate}
+
+@router.put("/profiling")
+async def set_profiling(settings: ProfilingSettings):
+    """Change the fraction of requests profiled without an X-Profile header."""
+    if not config.PROFILING_ENABLED:
+        raise HTTPException(status_code=409, detail="Profiling is not installed; set PROFILING_ENABLED=true")
+    profiler.sample_rate = settings.sample_rate
+    logger.info(f"Profiling sample rate set to {settings.sample_rate}")
+    return {"enabled": True, "sample_rate": profiler.sample_rate}
+
+@router.get("/profiles")
+async def list_profiles():
+    """Stored request profiles, newest first."""
+    return {"profiles": await run_in_threadpool(profiler.list_profiles)}
+
+@router.get("/profiles/{profile_id}")
+async def download_profile(profile_id: str, format: str = "speedscope"):
+    """Download a profile as speedscope JSON or as collapsed stacks (for flamegraph.pl)."""
+    path = profiler.collapsed_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    with open(path, 'r', encoding='utf-8') as f:
+        collapsed = f.read()
+    if format == "collapsed":
+        return PlainTextResponse(collapsed)
+    if format != "speedscope":
+        raise HTTPException(status_code=400, detail="format must be 'speedscope' or 'collapsed'")
+    return PlainTextResponse(
+        json.dumps(to_speedscope(collapsed, profile_id, config.PROFILE_INTERVAL_MS)),
+        media_type="application/json",
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.speedscope.json"'}
+    )
@@ -0,0 +1,114 @@
+"""Admission control for yeest.xyz backend.
+
+Sits in front of the RAG pipeline: identical in-flight questions share one
+execution, at most MAX_CONCURRENT_REQUESTS pipelines run at once, and
+requests beyond that wait in a bounded queue with a deadline.
+"""
+
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+import logging
+
+from .config import config
+from .profiling import current_profile_id, mark_coalesced
+
+logger = logging.getLogger(__name__)
+
+class Overloaded(Exception):
+    """Raised when a request is shed instead of admitted."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+def coalesce_key(question: str) -> str:
+    """Normalize a question so trivially different phrasings coalesce."""
+    return " ".join(question.lower().split()).rstrip("?!. ")
+
+class AdmissionController:
+    """Coalesces, queues and sheds pipeline executions."""
+
+    def __init__(
+        self,
+        max_concurrent: int = config.MAX_CONCURRENT_REQUESTS,
+        max_queued: int = config.MAX_QUEUED_REQUESTS,
+        queue_timeout: float = config.QUEUE_TIMEOUT_SECONDS,
+        max_embeddings: int = config.MAX_CONCURRENT_EMBEDDINGS,
+        max_llm_calls: int = config.MAX_CONCURRENT_LLM_CALLS
+    ):
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self._active = asyncio.Semaphore(max_concurrent)
+        self._waiting = 0
+        # Shared executions by key, with the profile ID of the request that started each
+        self._inflight: Dict[str, Tuple[asyncio.Task, Optional[str]]] = {}
+
+        # The pipeline runs in worker threads, so these are thread semaphores
+        self.embedding_slots = threading.BoundedSemaphore(max_embeddings)
+        self.llm_slots = threading.BoundedSemaphore(max_llm_calls)
+
+    async def run(self, key: str, func: Callable[..., Any], *args: Any) -> Any:
+        """Run `func(*args)` in a worker thread, sharing the result with identical requests."""
+        inflight = self._inflight.get(key)
+        if inflight is None:
+            task = asyncio.ensure_future(self._admit(func, *args))
+            self._inflight[key] = (task, current_profile_id())
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            task, owner = inflight
+            logger.info(f"Coalescing request into in-flight execution: {key[:50]}")
+            # The samples land in the starting request's profile, so point there
+            mark_coalesced(owner)
+
+        # Shield so one caller disconnecting doesn't cancel the shared execution
+        return await asyncio.shield(task)
+
+    async def _admit(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Wait for a pipeline slot, shedding when the queue is full or the deadline passes."""
+        if not self._active.locked():
+            await self._active.acquire()
+        else:
+            if self._waiting >= self.max_queued:
+                raise Overloaded(429, "Too many requests queued, please retry shortly")
+
+            self._waiting += 1
+            try:
+                # Unlike wait_for, a timeout here can't fire after the acquire has
+                # succeeded, and a cancelled acquire hands its permit to the next waiter
+                async with asyncio.timeout(self.queue_timeout):
+                    await self._active.acquire()
+            except TimeoutError:
+                raise Overloaded(503, "Timed out waiting for capacity, please retry shortly")
+            finally:
+                self._waiting -= 1
+
+        try:
+            return await asyncio.to_thread(func, *args)
+        finally:
+            self._active.release()
+
+    @asynccontextmanager
+    async def llm_slot(self) -> AsyncIterator[None]:
+        """Hold one of the shared LLM slots from async code."""
+        acquire = asyncio.ensure_future(asyncio.to_thread(self.llm_slots.acquire))
+        try:
+            await asyncio.shield(acquire)
+        except asyncio.CancelledError:
+            # The thread still takes the slot; hand it back once it does
+            acquire.add_done_callback(lambda _: self.llm_slots.release())
+            raise
+        try:
+            yield
+        finally:
+            self.llm_slots.release()
+
+    @property
+    def queued(self) -> int:
+        """Number of requests waiting for a slot."""
+        return self._waiting
+
+# Global admission controller instance
+admission = AdmissionController()
@@ -1,7 +1,7 @@
 """Configuration module for yeest.xyz backend."""
 
 import os
-from typing import Optional
+from typing import List, Optional
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -24,18 +24,104 @@ class Config:
     
     # LLM Configuration
     GROQ_MODEL_NAME: str = os.getenv("GROQ_MODEL_NAME", "mixtral-8x7b-32768")
+    # Smaller, faster model used when the main model is slow or rate-limited
+    GROQ_FALLBACK_MODEL_NAME: str = os.getenv("GROQ_FALLBACK_MODEL_NAME", "llama3-8b-8192")
+    # Cheaper model for conversation summarization
+    GROQ_SUMMARY_MODEL_NAME: str = os.getenv("GROQ_SUMMARY_MODEL_NAME", "llama3-8b-8192")
+    LLM_DEADLINE_SECONDS: float = float(os.getenv("LLM_DEADLINE_SECONDS", "20"))
+    # Upper bound on one LLM call across all tiers, hedges included
+    LLM_BUDGET_SECONDS: float = float(os.getenv("LLM_BUDGET_SECONDS", "30"))
+    # Send a hedged duplicate once a call outlives this latency percentile (0 disables)
+    LLM_HEDGE_PERCENTILE: float = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+    LLM_HEDGE_MIN_SAMPLES: int = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
     
     # Vector Store Configuration
+    EMBEDDING_MODEL_NAME: str = os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
     VECTOR_STORE_PATH: str = os.getenv("VECTOR_STORE_PATH", "./chroma_db")
+    # "chroma" (float32 in Chroma) or "quantized" (int8 codes + on-disk float rescoring)
+    VECTOR_STORE_BACKEND: str = os.getenv("VECTOR_STORE_BACKEND", "chroma")
+    # Candidates per result taken from the int8 pass for full-precision rescoring
+    QUANTIZED_RESCORE_FACTOR: int = int(os.getenv("QUANTIZED_RESCORE_FACTOR", "4"))
+    # When set, connect to a shared Chroma server instead of the embedded client
+    CHROMA_SERVER_HOST: Optional[str] = os.getenv("CHROMA_SERVER_HOST")
+    CHROMA_SERVER_PORT: int = int(os.getenv("CHROMA_SERVER_PORT", "8001"))
+    # Append-only on-disk cache of chunk embeddings (disabled when unset)
+    EMBEDDING_CACHE_PATH: Optional[str] = os.getenv("EMBEDDING_CACHE_PATH")
     CHUNK_SIZE: int = int(os.getenv("CHUNK_SIZE", "500"))
     CHUNK_OVERLAP: int = int(os.getenv("CHUNK_OVERLAP", "50"))
     
     # Memory Configuration
     MEMORY_BUFFER_SIZE: int = int(os.getenv("MEMORY_BUFFER_SIZE", "8"))
     MEMORY_SUMMARY_MAX_TOKENS: int = int(os.getenv("MEMORY_SUMMARY_MAX_TOKENS", "1200"))
+    # When set, session memory is kept in Redis so it is shared across workers
+    REDIS_URL: Optional[str] = os.getenv("REDIS_URL")
+    SESSION_TTL_SECONDS: int = int(os.getenv("SESSION_TTL_SECONDS", "86400"))
+    # Sessions kept in this process when REDIS_URL is unset (least recently used evicted)
+    MAX_LOCAL_SESSIONS: int = int(os.getenv("MAX_LOCAL_SESSIONS", "1024"))
+    
+    # Worker Configuration
+    WEB_CONCURRENCY: int = int(os.getenv("WEB_CONCURRENCY", "1"))
+    
+    # Admission Control
+    MAX_CONCURRENT_REQUESTS: int = int(os.getenv("MAX_CONCURRENT_REQUESTS", "4"))
+    MAX_QUEUED_REQUESTS: int = int(os.getenv("MAX_QUEUED_REQUESTS", "32"))
+    QUEUE_TIMEOUT_SECONDS: float = float(os.getenv("QUEUE_TIMEOUT_SECONDS", "30"))
+    # Processes that chunk and embed outside the web worker (0 runs them in-process)
+    INDEXING_WORKERS: int = int(os.getenv("INDEXING_WORKERS", "0"))
+    MAX_CONCURRENT_EMBEDDINGS: int = int(os.getenv("MAX_CONCURRENT_EMBEDDINGS", "2"))
+    MAX_CONCURRENT_LLM_CALLS: int = int(os.getenv("MAX_CONCURRENT_LLM_CALLS", "4"))
     
     # RAG Configuration
     RAG_K: int = int(os.getenv("RAG_K", "5"))
+    # "similarity" or "mmr" (maximal marginal relevance, fewer near-duplicate chunks)
+    RAG_SEARCH_TYPE: str = os.getenv("RAG_SEARCH_TYPE", "similarity")
+    
+    # Batch Chat Configuration
+    BATCH_MAX_QUESTIONS: int = int(os.getenv("BATCH_MAX_QUESTIONS", "500"))
+    # Distinct questions fetched from upstream sources at once
+    BATCH_FETCH_CONCURRENCY: int = int(os.getenv("BATCH_FETCH_CONCURRENCY", "4"))
+    # LLM calls in flight per batch (they also count against MAX_CONCURRENT_LLM_CALLS)
+    BATCH_LLM_CONCURRENCY: int = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+    
+    # Local Wikipedia Corpus Configuration
+    # When set, Wikipedia is served from a prebuilt local index instead of the API
+    WIKI_CORPUS_PATH: Optional[str] = os.getenv("WIKI_CORPUS_PATH")
+    # Clusters of the corpus' inverted file scored per query (more is slower but more exact)
+    WIKI_CORPUS_NPROBE: int = int(os.getenv("WIKI_CORPUS_NPROBE", "16"))
+    
+    # Background Ingestion Configuration
+    INGEST_ENABLED: bool = os.getenv("INGEST_ENABLED", "false").lower() == "true"
+    INGEST_TOPICS: List[str] = [t.strip() for t in os.getenv("INGEST_TOPICS", "").split(",") if t.strip()]
+    INGEST_SUBREDDITS: List[str] = [s.strip() for s in os.getenv("INGEST_SUBREDDITS", "").split(",") if s.strip()]
+    INGEST_INTERVAL_SECONDS: int = int(os.getenv("INGEST_INTERVAL_SECONDS", "900"))
+    # 100-article NewsAPI pages requested per topic and run
+    INGEST_MAX_PAGES: int = int(os.getenv("INGEST_MAX_PAGES", "5"))
+    INGEST_STATE_PATH: str = os.getenv("INGEST_STATE_PATH", os.path.join(VECTOR_STORE_PATH, "ingest_state.json"))
+    # Minimum cosine similarity for a locally ingested item to count as a hit
+    FRESHNESS_MIN_SIMILARITY: float = float(os.getenv("FRESHNESS_MIN_SIMILARITY", "0.5"))
+    
+    # Follow-up Working Set Configuration
+    WORKING_SET_TURNS: int = int(os.getenv("WORKING_SET_TURNS", "3"))
+    WORKING_SET_MIN_SIMILARITY: float = float(os.getenv("WORKING_SET_MIN_SIMILARITY", "0.55"))
+    WORKING_SET_MIN_HITS: int = int(os.getenv("WORKING_SET_MIN_HITS", "2"))
+    WORKING_SET_MAX_SESSIONS: int = int(os.getenv("WORKING_SET_MAX_SESSIONS", "256"))
+    
+    # Snapshot Configuration
+    # Snapshot imported at startup when it differs from the last one imported
+    SNAPSHOT_PATH: Optional[str] = os.getenv("SNAPSHOT_PATH")
+    # Largest snapshot accepted by PUT /admin/snapshot (default 8 GiB)
+    SNAPSHOT_MAX_UPLOAD_BYTES: int = int(os.getenv("SNAPSHOT_MAX_UPLOAD_BYTES", "8589934592"))
+    # Token expected in the X-Admin-Token header (admin endpoints are off when unset)
+    ADMIN_TOKEN: Optional[str] = os.getenv("ADMIN_TOKEN")
+    
+    # Profiling Configuration
+    # Installs the per-request profiler; nothing is profiled or hooked when false
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+    # Fraction of requests profiled without an X-Profile header (adjustable via /admin/profiling)
+    PROFILE_SAMPLE_RATE: float = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    PROFILE_INTERVAL_MS: float = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", "./profiles")
+    PROFILE_MAX_STORED: int = int(os.getenv("PROFILE_MAX_STORED", "200"))
     
     # LangSmith Configuration
     LANGCHAIN_TRACING_V2: str = os.getenv("LANGCHAIN_TRACING_V2", "true")
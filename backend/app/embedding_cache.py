@@ -0,0 +1,126 @@
+"""Persistent embedding cache for yeest.xyz backend.
+
+Re-fetching the same article produces the same chunks, so their embeddings
+are cached on disk keyed by the SHA-1 of the chunk text. The cache is one
+append-only file of fixed-size records that is memory-mapped for reads, so
+opening even a large cache costs one pass over the keys.
+
+File layout: b"YEC1", uint32 dimension, then records of
+(20-byte SHA-1, dim float32 values).
+"""
+
+import fcntl
+import hashlib
+import os
+import struct
+import threading
+from typing import Dict, List, Optional
+import logging
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"YEC1"
+HEADER_SIZE = 8
+
+def text_key(text: str) -> bytes:
+    return hashlib.sha1(text.encode("utf-8")).digest()
+
+class EmbeddingCache:
+    """Append-only, memory-mapped map from text hash to embedding."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.dim: Optional[int] = None
+        self._rows: Dict[bytes, int] = {}
+        self._mapped = None
+        self._lock = threading.Lock()
+        self._load()
+
+    def _dtype(self) -> np.dtype:
+        return np.dtype([("key", "S20"), ("vector", "<f4", (self.dim,))])
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < HEADER_SIZE:
+            return
+        with open(self.path, 'rb') as f:
+            magic, dim = struct.unpack("<4sI", f.read(HEADER_SIZE))
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not an embedding cache")
+        self.dim = dim
+        # Drop a partial record left by an interrupted append
+        with open(self.path, 'r+b') as f:
+            # Same lock as appenders, so another worker's in-progress append isn't cut
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                tail = (os.fstat(f.fileno()).st_size - HEADER_SIZE) % self._dtype().itemsize
+                if tail:
+                    f.truncate(os.fstat(f.fileno()).st_size - tail)
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        self._remap()
+        if self._mapped is not None:
+            self._rows = {key: row for row, key in enumerate(self._mapped["key"].tolist())}
+        logger.info(f"Loaded {len(self._rows)} cached embeddings from {self.path}")
+
+    def _remap(self) -> None:
+        rows = (os.path.getsize(self.path) - HEADER_SIZE) // self._dtype().itemsize
+        self._mapped = np.memmap(self.path, dtype=self._dtype(), mode='r', offset=HEADER_SIZE, shape=(rows,)) if rows else None
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        with self._lock:
+            rows = [self._rows.get(text_key(text)) for text in texts]
+            if any(row is not None and (self._mapped is None or row >= len(self._mapped)) for row in rows):
+                self._remap()
+            return [None if row is None else np.array(self._mapped[row]["vector"]) for row in rows]
+
+    def put_many(self, texts: List[str], vectors: np.ndarray) -> None:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            records = np.empty(len(texts), dtype=self._dtype())
+            records["key"] = [text_key(text) for text in texts]
+            records["vector"] = vectors
+
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, 'ab') as f:
+                # Other worker processes may append too; rows are numbered by file position
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    # The position from open() predates appends made while we waited for the lock
+                    f.seek(0, os.SEEK_END)
+                    if f.tell() == 0:
+                        f.write(struct.pack("<4sI", MAGIC, self.dim))
+                    first_row = (f.tell() - HEADER_SIZE) // records.itemsize
+                    f.write(records.tobytes())
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+            for offset, key in enumerate(records["key"].tolist()):
+                self._rows[key] = first_row + offset
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only computes vectors for texts it hasn't seen."""
+
+    def __init__(self, model: Embeddings, cache: EmbeddingCache):
+        self.model = model
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        cached = self.cache.get_many(texts)
+        misses = [i for i, vector in enumerate(cached) if vector is None]
+        if misses:
+            fresh = np.asarray(self.model.embed_documents([texts[i] for i in misses]), dtype=np.float32)
+            self.cache.put_many([texts[i] for i in misses], fresh)
+            for i, vector in zip(misses, fresh):
+                cached[i] = vector
+        logger.debug(f"Embedding cache: {len(texts) - len(misses)} hits, {len(misses)} misses")
+        return [vector.tolist() for vector in cached]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.model.embed_query(text)
@@ -7,7 +7,6 @@ from pathlib import Path
 import logging
 from rouge_score import rouge_scorer
 
-from .rag import rag_system
 from .memory import ChatMemoryManager
 
 logger = logging.getLogger(__name__)
@@ -49,6 +48,9 @@ class EvaluationRunner:
     
     async def run_evaluation(self) -> Dict[str, Any]:
         """Run evaluation on all test cases."""
+        # Imported here so the scoring helpers work without building the RAG system
+        from .rag import rag_system
+        
         test_cases = self.load_test_cases()
         
         if not test_cases:
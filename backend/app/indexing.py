@@ -0,0 +1,160 @@
+"""Process-pool indexing engine for yeest.xyz backend.
+
+Chunking and embedding are CPU-bound Python and hold the GIL, which starves
+every other request in the same uvicorn worker. With INDEXING_WORKERS > 0
+they run in a pool of spawned processes instead, each loading the embedding
+model once. Document texts reach the workers through one shared-memory
+block per batch. Workers return chunk offsets and vectors as NumPy arrays,
+and the chunks are rebuilt as ChunkRecords over the original documents.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import List, Optional, Tuple
+import logging
+
+import numpy as np
+from .config import config
+from .records import DocumentRecord, ChunkRecord
+
+logger = logging.getLogger(__name__)
+
+# ─── Worker side ───────────────────────────────────────
+
+_worker_embeddings = None
+
+def _init_worker(torch_threads: int) -> None:
+    """Load the embedding model once per worker process."""
+    global _worker_embeddings
+    try:
+        import torch
+
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+    from .llm import get_embeddings
+
+    _worker_embeddings = get_embeddings()
+
+def _chunk_and_embed(
+    shm_name: str,
+    spans: List[Tuple[int, int]]
+) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+    """Chunk and embed the documents at the given byte spans of a shared block.
+
+    Returns:
+        Per chunk: index of its document within this job, (start, end)
+        character offsets into that document, and the chunk embeddings
+    """
+    from .utils import chunk_spans, get_text_splitter
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        texts = [bytes(shm.buf[start:end]).decode("utf-8") for start, end in spans]
+    finally:
+        shm.close()
+
+    splitter = get_text_splitter()
+    owners, offsets, pieces = [], [], []
+    for i, text in enumerate(texts):
+        for start, end in chunk_spans(text, splitter):
+            owners.append(i)
+            offsets.append((start, end))
+            pieces.append(text[start:end])
+    if not pieces:
+        return np.empty(0, dtype=np.int32), np.empty((0, 2), dtype=np.int64), None
+    vectors = np.asarray(_worker_embeddings.embed_documents(pieces), dtype=np.float32)
+    return np.asarray(owners, dtype=np.int32), np.asarray(offsets, dtype=np.int64), vectors
+
+# ─── Main process side ─────────────────────────────────
+
+def _partition(sizes: List[int], parts: int) -> List[Tuple[int, int]]:
+    """Split items into at most `parts` contiguous (start, end) runs of similar total size."""
+    total = sum(sizes)
+    runs, start, acc = [], 0, 0
+    for i, size in enumerate(sizes):
+        acc += size
+        if acc >= total * (len(runs) + 1) / parts and i + 1 < len(sizes):
+            runs.append((start, i + 1))
+            start = i + 1
+    runs.append((start, len(sizes)))
+    return [run for run in runs if run[0] < run[1]]
+
+class IndexingEngine:
+    """Pool of embedding worker processes, started on first use."""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # Spawned, not forked: the parent's torch threads and sockets don't survive a fork
+                torch_threads = max(1, (os.cpu_count() or 1) // self.workers)
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(torch_threads,)
+                )
+                logger.info(f"Started {self.workers} indexing workers")
+            return self._pool
+
+    def chunk_and_embed(self, documents: List[DocumentRecord]) -> Tuple[List[ChunkRecord], Optional[np.ndarray]]:
+        """Chunk and embed documents across the worker pool.
+
+        Returns chunks in the same order as utils.chunk_documents, with
+        their embeddings.
+        """
+        encoded = [document.text.encode("utf-8") for document in documents]
+        total = sum(len(data) for data in encoded)
+        if not total:
+            return [], None
+
+        shm = shared_memory.SharedMemory(create=True, size=total)
+        try:
+            spans, position = [], 0
+            for data in encoded:
+                shm.buf[position:position + len(data)] = data
+                spans.append((position, position + len(data)))
+                position += len(data)
+
+            runs = _partition([len(data) for data in encoded], self.workers)
+            pool = self._get_pool()
+            futures = [pool.submit(_chunk_and_embed, shm.name, spans[start:end]) for start, end in runs]
+            results = [future.result() for future in futures]
+        except BrokenProcessPool:
+            with self._lock:
+                self._pool = None
+            raise
+        finally:
+            shm.close()
+            shm.unlink()
+
+        chunks, vectors = [], []
+        for (start, _), (owners, offsets, run_vectors) in zip(runs, results):
+            if run_vectors is None:
+                continue
+            chunks.extend(
+                ChunkRecord(documents[start + owner], int(begin), int(end))
+                for owner, (begin, end) in zip(owners.tolist(), offsets.tolist())
+            )
+            vectors.append(run_vectors)
+        if not chunks:
+            return [], None
+        return chunks, np.concatenate(vectors)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+# Global indexing engine (None runs chunking and embedding in-process)
+indexing_engine = IndexingEngine(config.INDEXING_WORKERS) if config.INDEXING_WORKERS > 0 else None
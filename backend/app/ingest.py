@@ -0,0 +1,213 @@
+"""Background ingestion of news and Reddit for yeest.xyz backend.
+
+Periodically pulls new items for the configured topics and subreddits and
+indexes them ahead of time. Each feed keeps a since-cursor so only items newer
+than the last run are requested. The freshness index records when each source
+was last ingested, which lets the answer path skip live fetches while the
+local copy is recent.
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import logging
+
+from .config import config
+from .records import DocumentRecord
+from .retrievers import retrieve_news_since, retrieve_subreddit_new
+from .retrievers.news import parse_published_at
+
+logger = logging.getLogger(__name__)
+
+# How many ingested URLs to remember for de-duplication
+MAX_SEEN_URLS = 5000
+
+class FreshnessIndex:
+    """Persistent ingestion state: feed cursors, last run per source and seen URLs."""
+
+    def __init__(self, path: str = config.INGEST_STATE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._state: Dict[str, Any] = {"cursors": {}, "last_ingested": {}, "seen_urls": []}
+        self._mtime = 0.0
+        self._reload()
+
+    def _reload(self) -> None:
+        """Re-read the state file if another process updated it."""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime <= self._mtime:
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._state.update(json.load(f))
+            self._mtime = mtime
+        except Exception as e:
+            logger.error(f"Error loading ingest state from {self.path}: {e}")
+
+    def save(self) -> None:
+        """Write the state atomically."""
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._state["seen_urls"] = self._state["seen_urls"][-MAX_SEEN_URLS:]
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._state, f)
+            os.replace(tmp_path, self.path)
+            self._mtime = os.path.getmtime(self.path)
+
+    def get_cursor(self, feed: str) -> Any:
+        return self._state["cursors"].get(feed)
+
+    def set_cursor(self, feed: str, value: Any) -> None:
+        self._state["cursors"][feed] = value
+
+    def filter_unseen(self, documents: List[DocumentRecord]) -> List[DocumentRecord]:
+        """Drop documents whose URL was already ingested (or repeats within the batch)."""
+        seen = set(self._state["seen_urls"])
+        fresh = []
+        for doc in documents:
+            if doc.url in seen:
+                continue
+            seen.add(doc.url)
+            fresh.append(doc)
+        return fresh
+
+    def remember(self, documents: List[DocumentRecord]) -> None:
+        """Record documents as ingested so later runs skip their URLs."""
+        self._state["seen_urls"].extend(doc.url for doc in documents)
+
+    def mark_ingested(self, source: str) -> None:
+        self._state["last_ingested"][source] = time.time()
+
+    def is_fresh(self, source: str) -> bool:
+        """Whether `source` was ingested within the last two intervals."""
+        if not config.INGEST_ENABLED:
+            return False
+        self._reload()
+        last = self._state["last_ingested"].get(source)
+        return last is not None and time.time() - last < 2 * config.INGEST_INTERVAL_SECONDS
+
+class BackgroundIngestor:
+    """Thread that keeps the vector store topped up with recent news and Reddit posts."""
+
+    def __init__(self, freshness: FreshnessIndex):
+        self.freshness = freshness
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock_file = None
+
+    def start(self, index_documents: Callable[[List[DocumentRecord]], None]) -> None:
+        """Start ingesting in the background unless another worker already is."""
+        if self._thread is not None or not self._acquire_leader_lock():
+            return
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(index_documents,),
+            name="ingestor",
+            daemon=True
+        )
+        self._thread.start()
+        logger.info(
+            f"Background ingestion started for topics {config.INGEST_TOPICS} "
+            f"and subreddits {config.INGEST_SUBREDDITS}"
+        )
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _acquire_leader_lock(self) -> bool:
+        """Make sure only one worker process ingests."""
+        import fcntl
+
+        os.makedirs(os.path.dirname(self.freshness.path) or ".", exist_ok=True)
+        self._lock_file = open(f"{self.freshness.path}.lock", 'w')
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            self._lock_file.close()
+            self._lock_file = None
+            return False
+
+    def _run(self, index_documents: Callable[[List[DocumentRecord]], None]) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_once(index_documents)
+            except Exception as e:
+                logger.error(f"Error during background ingestion: {e}")
+            self._stop.wait(config.INGEST_INTERVAL_SECONDS)
+
+    def run_once(self, index_documents: Callable[[List[DocumentRecord]], None]) -> int:
+        """Fetch everything new since the last run and index it.
+
+        Cursors, seen URLs and freshness only move once the documents are
+        indexed; a feed whose poll failed keeps its cursor and is retried next
+        run, and its source isn't marked fresh.
+        """
+        documents: List[DocumentRecord] = []
+        cursors: Dict[str, Any] = {}
+        fresh_sources: List[str] = []
+
+        feeds = []
+        if config.INGEST_TOPICS and config.NEWSAPI_KEY:
+            feeds.append(("news", [(f"news:{t}", self._poll_news, t) for t in config.INGEST_TOPICS]))
+        if config.INGEST_SUBREDDITS and config.REDDIT_CLIENT_ID:
+            feeds.append(("reddit", [(f"reddit:{s}", self._poll_subreddit, s) for s in config.INGEST_SUBREDDITS]))
+
+        for source, source_feeds in feeds:
+            failed = False
+            for feed, poll, name in source_feeds:
+                try:
+                    docs, cursor = poll(feed, name)
+                except Exception as e:
+                    logger.error(f"Error polling {feed}, keeping its cursor: {e}")
+                    failed = True
+                    continue
+                documents.extend(docs)
+                if cursor is not None:
+                    cursors[feed] = cursor
+            if not failed:
+                fresh_sources.append(source)
+
+        documents = self.freshness.filter_unseen(documents)
+        if documents:
+            index_documents(documents)
+
+        self.freshness.remember(documents)
+        for feed, cursor in cursors.items():
+            self.freshness.set_cursor(feed, cursor)
+        for source in fresh_sources:
+            self.freshness.mark_ingested(source)
+        self.freshness.save()
+
+        logger.info(f"Background ingestion indexed {len(documents)} new documents")
+        return len(documents)
+
+    def _news_since(self, feed: str) -> datetime:
+        """Where a news feed resumes; a missing or unreadable cursor starts a day back."""
+        cursor = self.freshness.get_cursor(feed)
+        if cursor:
+            try:
+                # Same-second articles are re-requested and dropped by URL
+                return parse_published_at(cursor)
+            except (TypeError, ValueError):
+                logger.warning(f"Ignoring unreadable cursor {cursor!r} for {feed}")
+        # NewsAPI's free tier only reaches back a limited window, so cap the first pull
+        return datetime.utcnow() - timedelta(days=1)
+
+    def _poll_news(self, feed: str, topic: str) -> Tuple[List[DocumentRecord], Optional[str]]:
+        docs, newest = retrieve_news_since(topic, self._news_since(feed), max_pages=config.INGEST_MAX_PAGES)
+        return docs, newest.strftime("%Y-%m-%dT%H:%M:%SZ") if newest else None
+
+    def _poll_subreddit(self, feed: str, subreddit: str) -> Tuple[List[DocumentRecord], Optional[str]]:
+        return retrieve_subreddit_new(subreddit, before=self.freshness.get_cursor(feed), limit=100)
+
+# Global ingestion state and worker
+freshness_index = FreshnessIndex()
+ingestor = BackgroundIngestor(freshness_index)
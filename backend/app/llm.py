@@ -1,26 +1,296 @@
 """LLM factory module for yeest.xyz backend."""
 
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+import logging
+
+import groq
 from langchain_groq import ChatGroq
 from langchain.embeddings import HuggingFaceEmbeddings
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatResult
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.pydantic_v1 import validator
 from .config import config
+from .embedding_cache import CachedEmbeddings, EmbeddingCache
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean "try the next tier" rather than "the request is bad"
+RETRYABLE_ERRORS = (
+    TimeoutError,
+    asyncio.TimeoutError,
+    groq.APITimeoutError,
+    groq.APIConnectionError,
+    groq.RateLimitError,
+    groq.InternalServerError,
+)
+
+class LatencyTracker:
+    """Rolling window of call latencies for one model."""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
 
-def get_llm() -> ChatGroq:
-    """Get configured GROQ LLM instance."""
+    def percentile(self, pct: float) -> Optional[float]:
+        """Latency at `pct`, or None until enough samples have been seen."""
+        with self._lock:
+            if pct <= 0 or len(self._samples) < config.LLM_HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+        return ordered[index]
+
+_trackers: Dict[str, LatencyTracker] = {}
+# Every attempt's timeout is taken when a thread starts it and ends by its
+# tier's deadline, and attempts that only get a thread after it are skipped
+_executor = ThreadPoolExecutor(
+    max_workers=config.MAX_CONCURRENT_LLM_CALLS * 4,
+    thread_name_prefix="llm"
+)
+
+def _tracker(model_name: str) -> LatencyTracker:
+    return _trackers.setdefault(model_name, LatencyTracker())
+
+@lru_cache(maxsize=None)
+def get_groq_client(model_name: str) -> ChatGroq:
+    """Get the shared ChatGroq client for a model.
+
+    One instance per model means one HTTP connection pool per model, reused
+    by every request. Retries are left to the tiering in TieredChatModel.
+    """
     return ChatGroq(
         groq_api_key=config.GROQ_API_KEY,
-        model_name=config.GROQ_MODEL_NAME,
+        model_name=model_name,
         temperature=0.1,
         max_tokens=2048,
-        timeout=60,
-        max_retries=2
+        timeout=config.LLM_DEADLINE_SECONDS,
+        max_retries=0
     )
 
-def get_embeddings():
-    """Get embeddings model for vector store."""
+class TieredChatModel(BaseChatModel):
+    """Chat model that hedges slow calls and falls back to faster Groq models.
+
+    Each tier gets its own deadline, and all tiers together share the
+    LLM_BUDGET_SECONDS budget. A duplicate request is sent once a call
+    outlives the model's LLM_HEDGE_PERCENTILE latency, and the first answer
+    wins. Timeouts, rate limits and server errors move on to the next tier.
+    """
+
+    model_names: List[str]
+    deadline: float = config.LLM_DEADLINE_SECONDS
+    budget: float = config.LLM_BUDGET_SECONDS
+    hedge_percentile: float = config.LLM_HEDGE_PERCENTILE
+
+    @validator("model_names")
+    def _require_model(cls, model_names: List[str]) -> List[str]:
+        if not model_names:
+            raise ValueError("TieredChatModel needs at least one model")
+        return model_names
+
+    @property
+    def _llm_type(self) -> str:
+        return "groq-tiered"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_names": self.model_names, "deadline": self.deadline}
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        start = time.monotonic()
+        last_error: Optional[BaseException] = None
+        for model_name in self.model_names:
+            deadline = min(self.deadline, self.budget - (time.monotonic() - start))
+            if deadline <= 0:
+                break
+            try:
+                return self._hedged_call(model_name, messages, stop, deadline, **kwargs)
+            except RETRYABLE_ERRORS as e:
+                logger.warning(f"LLM tier {model_name} failed ({type(e).__name__}), trying next tier")
+                last_error = e
+        raise last_error or TimeoutError(f"No LLM tier answered within {self.budget}s")
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        start = time.monotonic()
+        last_error: Optional[BaseException] = None
+        for model_name in self.model_names:
+            deadline = min(self.deadline, self.budget - (time.monotonic() - start))
+            if deadline <= 0:
+                break
+            try:
+                return await self._ahedged_call(model_name, messages, stop, deadline, **kwargs)
+            except RETRYABLE_ERRORS as e:
+                logger.warning(f"LLM tier {model_name} failed ({type(e).__name__}), trying next tier")
+                last_error = e
+        raise last_error or asyncio.TimeoutError(f"No LLM tier answered within {self.budget}s")
+
+    def _hedge_after(self, model_name: str, deadline: float) -> Optional[float]:
+        hedge_after = _tracker(model_name).percentile(self.hedge_percentile)
+        if hedge_after is None or hedge_after >= deadline:
+            return None
+        return hedge_after
+
+    def _hedged_call(
+        self,
+        model_name: str,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]],
+        deadline: float,
+        **kwargs: Any
+    ) -> ChatResult:
+        """Call one model from a worker thread, hedging once if it runs long.
+
+        Threads can't be cancelled, so each request is given an HTTP timeout,
+        measured from when a thread picks it up, that ends with the deadline;
+        losing attempts free their thread by then.
+        """
+        client = get_groq_client(model_name)
+        hedge_after = self._hedge_after(model_name, deadline)
+        start = time.monotonic()
+
+        def attempt():
+            # Waiting for a pool thread uses up the deadline too
+            remaining = deadline - (time.monotonic() - start)
+            if remaining <= 0:
+                raise TimeoutError(f"{model_name} attempt waited past its deadline for a thread")
+            return client._generate(messages, stop, None, timeout=remaining, **kwargs)
+
+        def submit():
+            return _executor.submit(attempt)
+
+        pending = {submit()}
+        hedged = False
+        last_error: Optional[BaseException] = None
+
+        while pending:
+            remaining = deadline - (time.monotonic() - start)
+            if remaining <= 0:
+                break
+            timeout = remaining
+            if not hedged and hedge_after is not None:
+                timeout = max(0.0, min(remaining, hedge_after - (time.monotonic() - start)))
+
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    _tracker(model_name).record(time.monotonic() - start)
+                    return future.result()
+                last_error = future.exception()
+
+            if not done and not hedged and hedge_after is not None:
+                logger.info(f"Hedging {model_name} call after {hedge_after:.2f}s")
+                pending.add(submit())
+                hedged = True
+
+        # Attempts still queued for a thread never start
+        for future in pending:
+            future.cancel()
+        if last_error is not None and not pending:
+            raise last_error
+        raise TimeoutError(f"{model_name} did not answer within {deadline:.1f}s")
+
+    async def _ahedged_call(
+        self,
+        model_name: str,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]],
+        deadline: float,
+        **kwargs: Any
+    ) -> ChatResult:
+        """Async counterpart of _hedged_call on the event loop; losing attempts are cancelled."""
+        client = get_groq_client(model_name)
+        hedge_after = self._hedge_after(model_name, deadline)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        pending = {asyncio.ensure_future(client._agenerate(messages, stop, None, **kwargs))}
+        hedged = False
+        last_error: Optional[BaseException] = None
+
+        try:
+            while pending:
+                remaining = deadline - (loop.time() - start)
+                if remaining <= 0:
+                    break
+                timeout = remaining
+                if not hedged and hedge_after is not None:
+                    timeout = max(0.0, min(remaining, hedge_after - (loop.time() - start)))
+
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        _tracker(model_name).record(loop.time() - start)
+                        return task.result()
+                    last_error = task.exception()
+
+                if not done and not hedged and hedge_after is not None:
+                    logger.info(f"Hedging {model_name} call after {hedge_after:.2f}s")
+                    pending.add(asyncio.ensure_future(client._agenerate(messages, stop, None, **kwargs)))
+                    hedged = True
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if last_error is not None and not pending:
+            raise last_error
+        raise asyncio.TimeoutError(f"{model_name} did not answer within {deadline:.1f}s")
+
+@lru_cache(maxsize=None)
+def get_llm(purpose: str = "chat") -> TieredChatModel:
+    """Get the shared LLM for a purpose.
+
+    "chat" answers questions with the configured model and falls back to the
+    faster one; "summary" routes memory summarization to the cheaper model.
+    """
+    if purpose == "summary":
+        primary = config.GROQ_SUMMARY_MODEL_NAME
+    else:
+        primary = config.GROQ_MODEL_NAME
+
+    model_names = [primary]
+    if config.GROQ_FALLBACK_MODEL_NAME and config.GROQ_FALLBACK_MODEL_NAME != primary:
+        model_names.append(config.GROQ_FALLBACK_MODEL_NAME)
+
+    return TieredChatModel(model_names=model_names)
+
+def load_embedding_model() -> HuggingFaceEmbeddings:
+    """Load the sentence-transformer embedding model."""
     # Using HuggingFace embeddings as a free alternative
     # since GROQ doesn't provide embeddings API
     return HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2",
+        model_name=config.EMBEDDING_MODEL_NAME,
         model_kwargs={'device': 'cpu'},
         encode_kwargs={'normalize_embeddings': True}
     )
+
+@lru_cache(maxsize=None)
+def get_embeddings():
+    """Get embeddings model for vector store (one shared instance per process).
+
+    Chunk embeddings go through the on-disk cache when EMBEDDING_CACHE_PATH is set.
+    """
+    model = load_embedding_model()
+    if config.EMBEDDING_CACHE_PATH:
+        return CachedEmbeddings(model, EmbeddingCache(config.EMBEDDING_CACHE_PATH))
+    return model
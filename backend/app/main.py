@@ -1,15 +1,24 @@
 """Main FastAPI application for yeest.xyz backend."""
 
 from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Dict, Any, Optional, Tuple
 import logging
 import traceback
+import uuid
 
 from .config import config
 from .rag import rag_system
-from .memory import ChatMemoryManager
+from .memory import ChatMemoryManager, get_session_memory
+from .admission import admission, coalesce_key, Overloaded
+from .ingest import ingestor
+from .indexing import indexing_engine
+from .working_set import StaticRetriever, expand_follow_up, get_working_set, drop_working_set
+from .admin import router as admin_router
+from .profiling import ProfilingMiddleware, profiled
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -34,6 +43,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.include_router(admin_router)
+
+# Per-request profiling; not installed at all unless enabled
+if config.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
 # Global memory manager (in production, this should be session-based)
 memory_manager = ChatMemoryManager()
 
@@ -46,11 +61,65 @@ class ChatRequest(BaseModel):
     """Chat request model."""
     question: str
     history: Optional[List[ChatMessage]] = []
+    session_id: Optional[str] = None
+
+class SourceMetadata(BaseModel):
+    """Where a source came from; only the fields the client displays."""
+    source: str = "unknown"
+    title: Optional[str] = None
+    url: Optional[str] = None
+
+class SourceInfo(BaseModel):
+    """A source excerpt used for an answer."""
+    content: str
+    metadata: SourceMetadata
+
+    @classmethod
+    def from_document(cls, doc: Any, max_chars: int = 200) -> "SourceInfo":
+        """Build a trimmed source entry from a retrieved LangChain Document."""
+        content = doc.page_content
+        if len(content) > max_chars:
+            content = content[:max_chars] + "..."
+        return cls(
+            content=content,
+            metadata=SourceMetadata(
+                source=doc.metadata.get("source", "unknown"),
+                title=doc.metadata.get("title"),
+                url=doc.metadata.get("url")
+            )
+        )
 
 class ChatResponse(BaseModel):
     """Chat response model."""
     answer: str
-    sources: Optional[List[Dict[str, Any]]] = []
+    sources: Optional[List[SourceInfo]] = []
+
+class BatchChatRequest(BaseModel):
+    """Batch chat request model."""
+    questions: List[str]
+    # Chunks retrieved per question (defaults to RAG_K)
+    k: Optional[int] = Field(None, ge=1)
+
+class BatchChatResult(BaseModel):
+    """One NDJSON line of a batch response."""
+    index: int
+    question: str
+    answer: Optional[str] = None
+    sources: List[SourceInfo] = []
+    error: Optional[str] = None
+
+@app.on_event("startup")
+async def start_background_ingestion():
+    """Start the news/Reddit ingestor when enabled."""
+    if config.INGEST_ENABLED:
+        ingestor.start(rag_system.index_documents)
+
+@app.on_event("shutdown")
+async def stop_background_ingestion():
+    """Stop the ingestor thread and the indexing workers."""
+    ingestor.stop()
+    if indexing_engine is not None:
+        indexing_engine.shutdown()
 
 @app.get("/")
 async def root():
@@ -62,6 +131,61 @@ async def health_check():
     """Health check endpoint."""
     return {"status": "healthy"}
 
+def answer_question(question: str, retriever: Optional[Any] = None) -> ChatResponse:
+    """Run the RAG chain over the vector store, or over `retriever` when given."""
+    # Get the RAG chain
+    rag_chain = rag_system.get_rag_chain(retriever=retriever)
+
+    # Run the chain
+    with admission.llm_slots:
+        result = rag_chain({"query": question})
+
+    answer = result["result"]
+    source_documents = result.get("source_documents", [])
+
+    # Log what sources were actually used in the answer
+    logger.info(f"Sources used in answer: {[doc.metadata.get('title', 'no title')[:30] for doc in source_documents]}")
+    
+    # Format sources
+    sources = [SourceInfo.from_document(doc) for doc in source_documents]
+    
+    logger.info(f"Generated answer with {len(sources)} sources")
+    
+    return ChatResponse(
+        answer=answer,
+        sources=sources
+    )
+
+@profiled
+def run_pipeline(question: str, query_vector: Optional[Any] = None) -> Tuple[ChatResponse, List[Any], Optional[Any]]:
+    """Fetch, index and answer a question; shared by coalesced requests.
+    
+    Also returns the indexed chunks and their embeddings for session working sets.
+    """
+    # Fetch fresh documents and index them
+    logger.info(f"Processing question: {question}")
+    indexed = rag_system.fetch_and_index(question, query_vector)
+    logger.info(f"Total documents retrieved: {len(indexed.documents)}")
+
+    # Log document sources for debugging
+    for doc in indexed.documents[:3]:  # Log first 3 documents
+        logger.info(f"Document source: {doc.source}, title: {(doc.title or 'no title')[:50]}")
+
+    return answer_question(question), indexed.chunks, indexed.vectors
+
+@profiled
+def answer_from_working_set(question: str, hits: List[Tuple[Any, float]]) -> ChatResponse:
+    """Answer a follow-up from chunks already in the session's working set."""
+    retriever = StaticRetriever(documents=[doc for doc, _ in hits])
+    return answer_question(question, retriever)
+
+def previous_user_question(history: Optional[List[ChatMessage]]) -> Optional[str]:
+    """The last user message in the request history, if any."""
+    for message in reversed(history or []):
+        if message.role == "user" and message.content:
+            return message.content
+    return None
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     """
@@ -71,63 +195,106 @@ async def chat(request: ChatRequest):
     with sources from Wikipedia, news, and Reddit.
     """
     try:
+        memory = get_session_memory(request.session_id) if request.session_id else memory_manager
+        
         # Load conversation history into memory
         if request.history:
             history_dicts = [{"role": msg.role, "content": msg.content} for msg in request.history]
-            memory_manager.load_from_history(history_dicts)
-        
-        # Fetch fresh documents and index them
-        logger.info(f"Processing question: {request.question}")
-        documents = rag_system.fetch_and_index_documents(request.question)
-        logger.info(f"Total documents retrieved: {len(documents)}")
-
-        # Log document sources for debugging
-        for doc in documents[:3]:  # Log first 3 documents
-            logger.info(f"Document source: {doc.metadata.get('source', 'unknown')}, title: {doc.metadata.get('title', 'no title')[:50]}")
-
-        # Get the RAG chain
-        rag_chain = rag_system.get_rag_chain()
-
-        # Run the chain
-        result = rag_chain({"query": request.question})
-
-        answer = result["result"]
-        source_documents = result.get("source_documents", [])
-
-        # Log what sources were actually used in the answer
-        logger.info(f"Sources used in answer: {[doc.metadata.get('title', 'no title')[:30] for doc in source_documents]}")
+            await run_in_threadpool(profiled(memory.load_from_history), history_dicts)
         
-        # Format sources
-        sources = []
-        for doc in source_documents:
-            source_info = {
-                "content": doc.page_content[:200] + "..." if len(doc.page_content) > 200 else doc.page_content,
-                "metadata": doc.metadata
-            }
-            sources.append(source_info)
+        working_set = get_working_set(request.session_id) if request.session_id else None
+        response = None
+        query_vector = None
         
-        # Add to memory
-        memory_manager.add_message(request.question, answer)
+        # A follow-up well covered by the last turns' chunks skips fetching entirely
+        if working_set is not None and len(working_set):
+            query_vector = await run_in_threadpool(rag_system.embed_query, request.question)
+            hits = working_set.search(query_vector, config.RAG_K)
+            if working_set.covers(hits):
+                logger.info("Answering from the session working set")
+                response = await admission.run(
+                    f"{request.session_id}:{coalesce_key(request.question)}",
+                    answer_from_working_set, request.question, hits
+                )
         
-
+        if response is None:
+            # Follow-ups make poor search queries on their own; only sessions
+            # are rewritten, so plain clients always search for what they sent
+            previous = None
+            if working_set is not None:
+                previous = working_set.last_query or previous_user_question(request.history)
+            query = expand_follow_up(request.question, previous)
+            if query != request.question:
+                query_vector = None
+            
+            # Identical in-flight questions share a single pipeline execution
+            response, chunks, vectors = await admission.run(coalesce_key(query), run_pipeline, query, query_vector)
+            if working_set is not None:
+                working_set.add(chunks, vectors)
+                working_set.last_query = query
         
-        logger.info(f"Generated answer with {len(sources)} sources")
+        # Add to memory
+        await run_in_threadpool(profiled(memory.add_message), request.question, response.answer)
         
-        return ChatResponse(
-            answer=answer,
-            sources=sources
-        )
+        return response
         
+    except Overloaded as e:
+        logger.warning(f"Shedding chat request: {e.detail}")
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers={"Retry-After": "5"})
     except Exception as e:
         logger.error(f"Error processing chat request: {e}")
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@app.post("/chat/batch")
+async def chat_batch(request: BatchChatRequest):
+    """
+    Batch chat endpoint for offline jobs.
+    
+    Fetching, indexing and embedding are shared across the batch. Answers
+    stream back as NDJSON, one line per question in completion order; each
+    line carries the question's index in the request.
+    """
+    if not request.questions:
+        raise HTTPException(status_code=400, detail="No questions given")
+    if len(request.questions) > config.BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {config.BATCH_MAX_QUESTIONS} questions per batch"
+        )
+    
+    try:
+        # The whole batch's retrieval takes one pipeline slot
+        contexts = await admission.run(f"batch:{uuid.uuid4()}", rag_system.retrieve_batch, request.questions, request.k)
+    except Overloaded as e:
+        logger.warning(f"Shedding batch request: {e.detail}")
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers={"Retry-After": "5"})
+    except Exception as e:
+        logger.error(f"Error retrieving for batch request: {e}")
+        logger.error(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    
+    async def stream():
+        async for result in rag_system.generate_answers(request.questions, contexts):
+            line = BatchChatResult(
+                index=result.index,
+                question=result.question,
+                answer=result.answer,
+                sources=[SourceInfo.from_document(doc) for doc in result.sources],
+                error=result.error
+            )
+            yield line.model_dump_json(exclude_none=True) + "\n"
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
 @app.post("/clear-memory")
-async def clear_memory():
+async def clear_memory(session_id: Optional[str] = None):
     """Clear conversation memory."""
     try:
-        memory_manager.clear()
+        memory = get_session_memory(session_id) if session_id else memory_manager
+        memory.clear()
+        if session_id:
+            drop_working_set(session_id)
         return {"message": "Memory cleared successfully"}
     except Exception as e:
         logger.error(f"Error clearing memory: {e}")
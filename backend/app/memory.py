@@ -1,24 +1,60 @@
 """Memory management for yeest.xyz backend."""
 
-from typing import List, Dict, Any
-from langchain.memory import ConversationBufferMemory, ConversationSummaryMemory
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
+from langchain.memory import ConversationBufferMemory, ConversationSummaryMemory, RedisChatMessageHistory
 from langchain.memory.combined import CombinedMemory
 from langchain.schema import BaseMessage
 from .config import config
 from .llm import get_llm
+from .admission import admission
+
+@lru_cache(maxsize=None)
+def get_redis():
+    """Get the shared Redis client (one connection pool per process)."""
+    import redis
+
+    return redis.from_url(config.REDIS_URL)
+
+class SharedRedisChatMessageHistory(RedisChatMessageHistory):
+    """RedisChatMessageHistory on the shared client instead of a new pool per session."""
+
+    def __init__(self, session_id: str, client: Any, key_prefix: str, ttl: Optional[int] = None):
+        self.redis_client = client
+        self.session_id = session_id
+        self.key_prefix = key_prefix
+        self.ttl = ttl
 
 class ChatMemoryManager:
     """Manages chat memory with buffer and summary components."""
     
-    def __init__(self):
-        self.llm = get_llm()
+    def __init__(self, session_id: Optional[str] = None):
+        # Summarization goes to the cheaper summary model
+        self.llm = get_llm("summary")
+        self.session_id = session_id
+        self._redis = None
         
         # Buffer memory for recent conversations
+        buffer_kwargs = {}
+        if session_id and config.REDIS_URL:
+            # Keep the session outside the process so any worker can serve it
+            self._redis = get_redis()
+            buffer_kwargs["chat_memory"] = SharedRedisChatMessageHistory(
+                session_id=session_id,
+                client=self._redis,
+                key_prefix="yeest:history:",
+                ttl=config.SESSION_TTL_SECONDS
+            )
+        
         self.buffer_memory = ConversationBufferMemory(
             memory_key="chat_history",
             return_messages=True,
             k=config.MEMORY_BUFFER_SIZE,
-            input_key="question" 
+            input_key="question",
+            **buffer_kwargs
         )
         
         # Summary memory for older conversations
@@ -30,21 +66,36 @@ class ChatMemoryManager:
             input_key="question" 
         )
         
+        if self._redis is not None:
+            self.summary_memory.buffer = (self._redis.get(self._summary_key) or b"").decode("utf-8")
+        
         # Combined memory
         self.combined_memory = CombinedMemory(
             memories=[self.buffer_memory, self.summary_memory]
         )
     
+    @property
+    def _summary_key(self) -> str:
+        return f"yeest:summary:{self.session_id}"
+    
+    def _save_summary(self) -> None:
+        """Write the running summary back to Redis for session-backed memory."""
+        if self._redis is not None:
+            self._redis.set(self._summary_key, self.summary_memory.buffer, ex=config.SESSION_TTL_SECONDS)
+    
     def add_message(self, human_input: str, ai_output: str) -> None:
         """Add a conversation turn to memory."""
         self.buffer_memory.save_context(
             {"question": human_input},
             {"output": ai_output}
         )
-        self.summary_memory.save_context(
-            {"question": human_input},
-            {"output": ai_output}
-        )
+        # Summarizing is an LLM call, so it takes one of the shared LLM slots
+        with admission.llm_slots:
+            self.summary_memory.save_context(
+                {"question": human_input},
+                {"output": ai_output}
+            )
+        self._save_summary()
     
     def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
         """Load memory variables for the conversation."""
@@ -54,6 +105,8 @@ class ChatMemoryManager:
         """Clear all memory."""
         self.buffer_memory.clear()
         self.summary_memory.clear()
+        if self._redis is not None:
+            self._redis.delete(self._summary_key)
     
     def get_conversation_history(self) -> List[BaseMessage]:
         """Get the conversation history as messages."""
@@ -78,3 +131,34 @@ class ChatMemoryManager:
                 
                 if assistant_content:
                     self.add_message(user_content, assistant_content)
+
+
+# Per-session managers for when no shared session store is configured,
+# least recently used first, with the time each was last used
+_local_sessions: "OrderedDict[str, Tuple[ChatMemoryManager, float]]" = OrderedDict()
+_local_sessions_lock = threading.Lock()
+
+def get_session_memory(session_id: str) -> ChatMemoryManager:
+    """Get the memory manager for a session.
+    
+    With REDIS_URL set the session lives in Redis and any worker can load it;
+    otherwise sessions are kept in this process, at most MAX_LOCAL_SESSIONS of
+    them, each dropped after SESSION_TTL_SECONDS without use.
+    """
+    if config.REDIS_URL:
+        return ChatMemoryManager(session_id=session_id)
+    
+    now = time.monotonic()
+    with _local_sessions_lock:
+        entry = _local_sessions.pop(session_id, None)
+        manager = entry[0] if entry and now - entry[1] < config.SESSION_TTL_SECONDS else None
+        if manager is None:
+            manager = ChatMemoryManager(session_id=session_id)
+        _local_sessions[session_id] = (manager, now)
+        
+        while _local_sessions:
+            oldest_id, (_, last_used) = next(iter(_local_sessions.items()))
+            if len(_local_sessions) <= config.MAX_LOCAL_SESSIONS and now - last_used < config.SESSION_TTL_SECONDS:
+                break
+            del _local_sessions[oldest_id]
+        return manager
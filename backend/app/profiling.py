@@ -0,0 +1,320 @@
+"""Per-request sampling profiler for yeest.xyz backend.
+
+With PROFILING_ENABLED set, a request is profiled when it carries
+`X-Profile: 1` together with a valid X-Admin-Token, or when it is picked at
+the current sample rate (PROFILE_SAMPLE_RATE, adjustable at runtime from the
+admin API). A sampler thread then records the stacks of every thread
+working on that request via sys._current_frames(). Profiles are stored per
+request ID in PROFILE_DIR as collapsed stacks and converted to speedscope
+JSON on download.
+
+The pipeline runs in worker threads. Functions decorated with @profiled
+attach their thread to the request's profile, which they find through a
+context variable that asyncio.to_thread carries over. Only those threads are
+sampled: the event loop thread serves every concurrent request, so its
+stacks can't be told apart per request. A request coalesced into another's
+execution records the ID of the profile that ran it. With profiling
+disabled the middleware isn't installed and @profiled costs one context
+variable lookup.
+"""
+
+import asyncio
+import contextvars
+import functools
+import hmac
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+import logging
+
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+_current: contextvars.ContextVar = contextvars.ContextVar("yeest_profile", default=None)
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    marker = "site-packages" + os.sep
+    if marker in filename:
+        filename = filename.split(marker, 1)[1]
+    else:
+        filename = os.path.basename(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+def _is_idle(frame) -> bool:
+    """Whether a thread is parked in the event loop's selector."""
+    return frame.f_code.co_name in ("select", "poll") and frame.f_code.co_filename.endswith("selectors.py")
+
+class Profile:
+    """Stack samples for one request."""
+
+    def __init__(self, method: str, path: str):
+        self.id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self.started_at = time.time()
+        self.duration_ms = 0.0
+        self.status: Optional[int] = None
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        # Set when another request's execution answered this one
+        self.coalesced = False
+        self.coalesced_into: Optional[str] = None
+        self._threads: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def attach(self, ident: Optional[int] = None) -> None:
+        ident = ident or threading.get_ident()
+        with self._lock:
+            self._threads[ident] = self._threads.get(ident, 0) + 1
+
+    def detach(self, ident: Optional[int] = None) -> None:
+        ident = ident or threading.get_ident()
+        with self._lock:
+            if self._threads.get(ident, 0) <= 1:
+                self._threads.pop(ident, None)
+            else:
+                self._threads[ident] -= 1
+
+    def sample(self, frames: Dict[int, Any], names: Dict[int, str]) -> None:
+        with self._lock:
+            threads = list(self._threads)
+        for ident in threads:
+            frame = frames.get(ident)
+            if frame is None or _is_idle(frame):
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.append(f"thread {names.get(ident, ident)}")
+            self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+
+    def metadata(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms, 1),
+            "samples": self.samples,
+            "interval_ms": config.PROFILE_INTERVAL_MS,
+            "coalesced_into": self.coalesced_into if self.coalesced else None,
+            "note": self.note(),
+        }
+
+    def note(self) -> Optional[str]:
+        if not self.coalesced:
+            return None
+        if self.coalesced_into:
+            return f"Coalesced into the execution profiled as {self.coalesced_into}; its samples are there"
+        return "Coalesced into the execution of a request that wasn't profiled"
+
+class Profiler:
+    """Starts, samples and stores request profiles."""
+
+    def __init__(self, directory: str = config.PROFILE_DIR, sample_rate: float = config.PROFILE_SAMPLE_RATE):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self._active: List[Profile] = []
+        self._lock = threading.Lock()
+        # Held for a whole sampling round, so a finished profile is never written to mid-store
+        self._sampling = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def should_profile(self, headers: Dict[bytes, bytes]) -> bool:
+        if headers.get(b"x-profile") == b"1":
+            token = headers.get(b"x-admin-token", b"").decode("latin-1")
+            if config.ADMIN_TOKEN and hmac.compare_digest(token, config.ADMIN_TOKEN):
+                return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self, method: str, path: str) -> Profile:
+        profile = Profile(method, path)
+        with self._lock:
+            self._active.append(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="yeest-profiler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return profile
+
+    def finish(self, profile: Profile) -> None:
+        profile.duration_ms = (time.time() - profile.started_at) * 1000
+        with self._sampling, self._lock:
+            self._active.remove(profile)
+            if not self._active:
+                self._wake.clear()
+        try:
+            self._store(profile)
+        except Exception as e:
+            logger.error(f"Error storing profile {profile.id}: {e}")
+
+    def _run(self) -> None:
+        interval = config.PROFILE_INTERVAL_MS / 1000
+        while True:
+            self._wake.wait()
+            with self._sampling:
+                with self._lock:
+                    active = list(self._active)
+                if active:
+                    frames = sys._current_frames()
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                    for profile in active:
+                        profile.sample(frames, names)
+                    del frames
+            time.sleep(interval)
+
+    def _store(self, profile: Profile) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, f"{profile.id}.collapsed"), 'w', encoding='utf-8') as f:
+            f.writelines(f"{stack} {count}\n" for stack, count in profile.stacks.most_common())
+        with open(os.path.join(self.directory, f"{profile.id}.json"), 'w', encoding='utf-8') as f:
+            json.dump(profile.metadata(), f)
+        logger.info(f"Stored profile {profile.id} for {profile.method} {profile.path} ({profile.samples} samples)")
+        self._prune()
+
+    def _prune(self) -> None:
+        profiles = self.list_profiles()
+        for meta in profiles[config.PROFILE_MAX_STORED:]:
+            for ext in ("json", "collapsed"):
+                try:
+                    os.unlink(os.path.join(self.directory, f"{meta['id']}.{ext}"))
+                except OSError:
+                    pass
+
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        """Stored profile metadata, newest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                try:
+                    with open(os.path.join(self.directory, name), 'r', encoding='utf-8') as f:
+                        profiles.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        return sorted(profiles, key=lambda meta: meta["started_at"], reverse=True)
+
+    def collapsed_path(self, profile_id: str) -> Optional[str]:
+        # IDs are hex; anything else can't name a stored profile
+        if not profile_id.isalnum():
+            return None
+        path = os.path.join(self.directory, f"{profile_id}.collapsed")
+        return path if os.path.exists(path) else None
+
+def to_speedscope(collapsed: str, name: str, interval_ms: float) -> Dict[str, Any]:
+    """Convert collapsed stacks ("a;b;c count" lines) to a speedscope sampled profile."""
+    frames: List[Dict[str, str]] = []
+    index: Dict[str, int] = {}
+    samples, weights = [], []
+    for line in collapsed.splitlines():
+        stack, _, count = line.rpartition(" ")
+        if not stack:
+            continue
+        sample = []
+        for label in stack.split(";"):
+            if label not in index:
+                index[label] = len(frames)
+                frames.append({"name": label})
+            sample.append(index[label])
+        samples.append(sample)
+        weights.append(int(count) * interval_ms)
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": "yeest.xyz",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights,
+        }],
+    }
+
+def current_profile_id() -> Optional[str]:
+    """ID of the profile of the request being served, if it is profiled."""
+    profile = _current.get()
+    return profile.id if profile is not None else None
+
+def mark_coalesced(into: Optional[str]) -> None:
+    """Record on the current request's profile that another execution served it."""
+    profile = _current.get()
+    if profile is not None:
+        profile.coalesced = True
+        profile.coalesced_into = into
+
+def profiled(func: Callable) -> Callable:
+    """Attach the calling thread to the current request's profile while func runs."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return func(*args, **kwargs)
+        profile.attach()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.detach()
+    return wrapper
+
+def propagate(func: Callable) -> Callable:
+    """Carry the current profile into threads that don't copy context (e.g. executors)."""
+    profile = _current.get()
+    if profile is None:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _current.set(profile)
+        try:
+            return profiled(func)(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return wrapper
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles selected requests."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith("/admin"):
+            return await self.app(scope, receive, send)
+        if not profiler.should_profile(dict(scope["headers"])):
+            return await self.app(scope, receive, send)
+
+        profile = profiler.start(scope["method"], scope["path"])
+        token = _current.set(profile)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile.id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _current.reset(token)
+            await asyncio.to_thread(profiler.finish, profile)
+
+# Global profiler instance
+profiler = Profiler()
@@ -0,0 +1,21 @@
+"""Prompt templates for yeest.xyz backend."""
+
+from langchain.prompts import PromptTemplate
+
+# Custom prompt template
+PROMPT_TEMPLATE = """Use context as a source to know about things that you don't know.
+                            If the users asks a generic question, something on which you have been trained on and don't really require much context, then answer it yourself.
+                            Otherwise, decide if the context provided is relevant to query being asked, if not relevant, just say that you don't know. 
+                            Don't mention anything about context.
+        
+        Context:
+        {context}
+        
+        Question: {question}
+        
+        Answer: """
+
+PROMPT = PromptTemplate(
+    template=PROMPT_TEMPLATE,
+    input_variables=["context", "question"]
+)
@@ -0,0 +1,426 @@
+"""Quantized vector store for yeest.xyz backend.
+
+Keeps only int8 codes (one byte per dimension plus a per-vector scale) in
+memory. Full-precision float32 vectors stay on disk and are memory-mapped.
+Search is two-stage: an approximate pass over the int8 codes picks
+k * QUANTIZED_RESCORE_FACTOR candidates, which are then rescored exactly
+against their float32 vectors.
+
+Files in the store directory:
+    codes.i8       int8 codes, one row per chunk
+    scales.f32     per-row dequantization scale
+    vectors.f32    float32 vectors, read only for rescoring
+    sources.u8     per-row source id, for filtering before ranking
+    records.jsonl  chunk text and metadata (including the row's id), one JSON line per row
+    offsets.i64    byte offset of each row's line in records.jsonl
+    meta.json      dimension and source names
+"""
+
+import json
+import os
+import shutil
+import threading
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import logging
+
+import numpy as np
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from .config import config
+from .utils import maximal_marginal_relevance
+
+logger = logging.getLogger(__name__)
+
+# Rows scored per block in the int8 pass, bounding the float32 scratch space
+SCAN_BLOCK_ROWS = 65536
+# Smallest in-memory capacity; it doubles from there as rows are added
+MIN_CAPACITY_ROWS = 1024
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-vector int8 quantization: x ≈ codes * scale."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+class QuantizedVectorIndex:
+    """Append-only int8 index with full-precision rescoring from disk.
+
+    The in-memory arrays are preallocated and doubled when full, so adding
+    rows costs amortized O(rows added) rather than a copy of the whole index.
+    Rows whose metadata carries an id already in the index are skipped, also
+    across restarts, so stable passage IDs are stored once.
+    """
+
+    def __init__(self, path: str, dim: Optional[int] = None):
+        self.path = path
+        self.dim = dim
+        self._lock = threading.RLock()
+        os.makedirs(path, exist_ok=True)
+        self._load()
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _load(self) -> None:
+        meta_path = self._file("meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            self.dim = meta["dim"]
+            self._source_ids: Dict[str, int] = {name: i for i, name in enumerate(meta["sources"])}
+        else:
+            self._source_ids = {}
+
+        # The offsets file is written last, so its length is the committed row count
+        offsets = self._file("offsets.i64")
+        self._offsets = np.fromfile(offsets, dtype=np.int64) if os.path.exists(offsets) else np.empty(0, dtype=np.int64)
+        rows = self._rows = len(self._offsets)
+        self._truncate_tails(rows)
+        self._ids = self._load_ids(rows)
+
+        if rows:
+            self._codes = np.fromfile(self._file("codes.i8"), dtype=np.int8, count=rows * self.dim).reshape(rows, self.dim)
+            self._scales = np.fromfile(self._file("scales.f32"), dtype=np.float32, count=rows)
+            self._sources = np.fromfile(self._file("sources.u8"), dtype=np.uint8, count=rows)
+        else:
+            self._codes = np.empty((0, self.dim or 0), dtype=np.int8)
+            self._scales = np.empty(0, dtype=np.float32)
+            self._sources = np.empty(0, dtype=np.uint8)
+        self._map_vectors()
+
+    # Views of the filled rows; a view taken before an add never sees later rows
+    @property
+    def codes(self) -> np.ndarray:
+        return self._codes[:self._rows]
+
+    @property
+    def scales(self) -> np.ndarray:
+        return self._scales[:self._rows]
+
+    @property
+    def sources(self) -> np.ndarray:
+        return self._sources[:self._rows]
+
+    @property
+    def offsets(self) -> np.ndarray:
+        return self._offsets[:self._rows]
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes of in-memory arrays held, spare capacity included."""
+        return self._codes.nbytes + self._scales.nbytes + self._sources.nbytes + self._offsets.nbytes
+
+    def _reserve(self, rows: int) -> None:
+        """Make room for `rows` rows, at least doubling the capacity when it grows."""
+        capacity = len(self._scales)
+        if rows <= capacity:
+            return
+        capacity = max(rows, 2 * capacity, MIN_CAPACITY_ROWS)
+
+        def grown(array: np.ndarray) -> np.ndarray:
+            bigger = np.empty((capacity,) + array.shape[1:], dtype=array.dtype)
+            bigger[:self._rows] = array[:self._rows]
+            return bigger
+
+        self._codes = grown(self._codes.reshape(-1, self.dim))
+        self._scales = grown(self._scales)
+        self._sources = grown(self._sources)
+        self._offsets = grown(self._offsets)
+
+    def _load_ids(self, rows: int) -> set:
+        """IDs of the committed rows, read from records.jsonl."""
+        ids = set()
+        path = self._file("records.jsonl")
+        if rows and os.path.exists(path):
+            with open(path, 'rb') as f:
+                for _, line in zip(range(rows), f):
+                    row_id = json.loads(line)["metadata"].get("id")
+                    if row_id is not None:
+                        ids.add(row_id)
+        return ids
+
+    def _truncate_tails(self, rows: int) -> None:
+        """Drop partial rows left behind by an interrupted add."""
+        row_bytes = {
+            "codes.i8": self.dim or 0,
+            "scales.f32": 4,
+            "vectors.f32": 4 * (self.dim or 0),
+            "sources.u8": 1,
+        }
+        for name, size in row_bytes.items():
+            path = self._file(name)
+            if os.path.exists(path) and os.path.getsize(path) > rows * size:
+                with open(path, 'r+b') as f:
+                    f.truncate(rows * size)
+
+    def _save_meta(self) -> None:
+        with open(self._file("meta.json"), 'w', encoding='utf-8') as f:
+            json.dump({"dim": self.dim, "sources": list(self._source_ids)}, f)
+
+    def _map_vectors(self) -> None:
+        rows = self._rows
+        self.vectors = (
+            np.memmap(self._file("vectors.f32"), dtype=np.float32, mode='r', shape=(rows, self.dim))
+            if rows else None
+        )
+
+    def _source_id(self, source: str) -> int:
+        if source not in self._source_ids:
+            if len(self._source_ids) >= 255:
+                raise ValueError("Quantized store supports at most 255 distinct sources")
+            self._source_ids[source] = len(self._source_ids)
+            self._save_meta()
+        return self._source_ids[source]
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def add(self, texts: List[str], vectors: np.ndarray, metadatas: List[Dict[str, Any]]) -> None:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        codes, scales = quantize_int8(vectors)
+        with self._lock:
+            # Skip IDs already stored, or repeated within this batch
+            new_ids = set()
+            keep = []
+            for i, metadata in enumerate(metadatas):
+                row_id = metadata.get("id")
+                if row_id is None or (row_id not in self._ids and row_id not in new_ids):
+                    keep.append(i)
+                    if row_id is not None:
+                        new_ids.add(row_id)
+            if not keep:
+                return
+            if len(keep) < len(texts):
+                texts = [texts[i] for i in keep]
+                metadatas = [metadatas[i] for i in keep]
+                vectors, codes, scales = vectors[keep], codes[keep], scales[keep]
+
+            if not self.dim:
+                self.dim = vectors.shape[1]
+                self._save_meta()
+            sources = np.array([self._source_id(m.get("source", "")) for m in metadatas], dtype=np.uint8)
+            with open(self._file("records.jsonl"), 'ab') as f:
+                start = f.tell()
+                lines = [
+                    (json.dumps({"text": text, "metadata": metadata}) + "\n").encode("utf-8")
+                    for text, metadata in zip(texts, metadatas)
+                ]
+                offsets = start + np.cumsum([0] + [len(line) for line in lines[:-1]], dtype=np.int64)
+                f.write(b"".join(lines))
+            with open(self._file("vectors.f32"), 'ab') as f:
+                f.write(vectors.tobytes())
+            with open(self._file("codes.i8"), 'ab') as f:
+                f.write(codes.tobytes())
+            with open(self._file("scales.f32"), 'ab') as f:
+                f.write(scales.tobytes())
+            with open(self._file("sources.u8"), 'ab') as f:
+                f.write(sources.tobytes())
+            # Written last: a row only exists once its offset does
+            with open(self._file("offsets.i64"), 'ab') as f:
+                f.write(offsets.tobytes())
+
+            # Fill spare capacity in place, then publish the new row count
+            start, end = self._rows, self._rows + len(vectors)
+            self._reserve(end)
+            self._codes[start:end] = codes
+            self._scales[start:end] = scales
+            self._sources[start:end] = sources
+            self._offsets[start:end] = offsets
+            self._rows = end
+            self._ids.update(new_ids)
+            self._map_vectors()
+
+    def record(self, row: int) -> Tuple[str, Dict[str, Any]]:
+        """Text and metadata of a row, read from disk."""
+        with open(self._file("records.jsonl"), 'rb') as f:
+            f.seek(int(self.offsets[row]))
+            entry = json.loads(f.readline())
+        return entry["text"], entry["metadata"]
+
+    def search(
+        self,
+        query_vector: np.ndarray,
+        k: int,
+        filter: Optional[Dict[str, Any]] = None,
+        rescore_factor: int = config.QUANTIZED_RESCORE_FACTOR
+    ) -> List[Tuple[int, float]]:
+        """Top-k rows as (row, cosine similarity), best first."""
+        with self._lock:
+            rows = len(self)
+            codes, scales, sources, vectors = self.codes, self.scales, self.sources, self.vectors
+        if not rows:
+            return []
+
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        mask = None
+        if filter:
+            unsupported = set(filter) - {"source"}
+            if unsupported:
+                raise ValueError(f"Quantized store can only filter on 'source', not {sorted(unsupported)}")
+            source_id = self._source_ids.get(filter["source"])
+            if source_id is None:
+                return []
+            mask = sources[:rows] == source_id
+
+        # Stage 1: approximate scores from the int8 codes, a block at a time
+        approx = np.empty(rows, dtype=np.float32)
+        for start in range(0, rows, SCAN_BLOCK_ROWS):
+            block = codes[start:start + SCAN_BLOCK_ROWS].astype(np.float32)
+            approx[start:start + len(block)] = (block @ query_vector) * scales[start:start + len(block)]
+        if mask is not None:
+            approx[~mask] = -np.inf
+
+        available = rows if mask is None else int(mask.sum())
+        k = min(k, available)
+        if k <= 0:
+            return []
+        candidates = min(available, k * max(1, rescore_factor))
+        top = np.argpartition(-approx, candidates - 1)[:candidates]
+
+        # Stage 2: exact rescoring of the candidates from the float32 vectors
+        top.sort()
+        exact = np.asarray(vectors[top]) @ query_vector
+        best = np.argsort(-exact)[:k]
+        return [(int(top[i]), float(exact[i])) for i in best]
+
+    def delete(self) -> None:
+        with self._lock:
+            shutil.rmtree(self.path, ignore_errors=True)
+            os.makedirs(self.path, exist_ok=True)
+            self._load()
+
+class QuantizedVectorStore(VectorStore):
+    """LangChain vector store over a QuantizedVectorIndex."""
+
+    def __init__(self, persist_directory: str, embedding_function: Embeddings):
+        self._embedding_function = embedding_function
+        self._index = QuantizedVectorIndex(os.path.join(persist_directory, "quantized"))
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding_function
+
+    def add_embeddings(
+        self,
+        texts: List[str],
+        embeddings: np.ndarray,
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        ids: Optional[List[str]] = None
+    ) -> List[str]:
+        """Add texts whose embeddings are already computed."""
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        self._index.add(texts, embeddings, [dict(m, id=i) for m, i in zip(metadatas, ids)])
+        return ids
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        **kwargs: Any
+    ) -> List[str]:
+        texts = list(texts)
+        vectors = np.asarray(self._embedding_function.embed_documents(texts), dtype=np.float32)
+        return self.add_embeddings(texts, vectors, metadatas)
+
+    def _documents(self, hits: List[Tuple[int, float]]) -> List[Tuple[Document, float]]:
+        results = []
+        for row, similarity in hits:
+            text, metadata = self._index.record(row)
+            metadata.pop("id", None)
+            # Squared L2 between normalized vectors, matching Chroma's scores
+            results.append((Document(page_content=text, metadata=metadata), 2 - 2 * similarity))
+        return results
+
+    def similarity_search_by_vector_with_relevance_scores(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self._documents(self._index.search(np.asarray(embedding, dtype=np.float32), k, filter))
+
+    def similarity_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_relevance_scores(embedding, k, filter)]
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        embedding = self._embedding_function.embed_query(query)
+        return self.similarity_search_by_vector_with_relevance_scores(embedding, k, filter)
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def max_marginal_relevance_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> List[Document]:
+        query_vector = np.asarray(embedding, dtype=np.float32)
+        hits = self._index.search(query_vector, max(k, fetch_k), filter)
+        if not hits:
+            return []
+        candidates = np.asarray(self._index.vectors[[row for row, _ in hits]])
+        picked = maximal_marginal_relevance(query_vector, candidates, k, lambda_mult)
+        return [doc for doc, _ in self._documents([hits[i] for i in picked])]
+    
+    def max_marginal_relevance_search(
+        self,
+        query: str,
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> List[Document]:
+        embedding = self._embedding_function.embed_query(query)
+        return self.max_marginal_relevance_search_by_vector(embedding, k, fetch_k, lambda_mult, filter)
+    
+    def _select_relevance_score_fn(self):
+        # Scores are squared L2 between normalized vectors: 2 - 2 * cosine
+        return lambda distance: 1.0 - distance / 2
+
+    def persist(self) -> None:
+        """Rows are written through on add; nothing is buffered."""
+
+    def delete_collection(self) -> None:
+        self._index.delete()
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        persist_directory: str = config.VECTOR_STORE_PATH,
+        **kwargs: Any
+    ) -> "QuantizedVectorStore":
+        store = cls(persist_directory=persist_directory, embedding_function=embedding)
+        store.add_texts(texts, metadatas)
+        return store
@@ -1,39 +1,172 @@
 """RAG (Retrieval-Augmented Generation) module for yeest.xyz backend."""
 
+import asyncio
 import os
-from typing import List, Optional
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
 from langchain.vectorstores import Chroma
-from langchain.schema import Document
+from langchain.schema import BaseRetriever, Document
+from langchain_core.vectorstores import VectorStore
 from langchain.chains import RetrievalQA
-from langchain.prompts import PromptTemplate
 from .config import config
+from .prompts import PROMPT
 from .llm import get_llm, get_embeddings
 from .utils import chunk_documents
+from .records import DocumentRecord, ChunkRecord, EmbeddedPassage
+from .admission import admission, coalesce_key
+from .indexing import indexing_engine
+from .ingest import freshness_index
+from .quantized_store import QuantizedVectorStore
+from .snapshot import export_snapshot, import_at_startup
+from .profiling import profiled, propagate
 from .retrievers import retrieve_wikipedia, retrieve_news, retrieve_reddit
 import logging
 
 logger = logging.getLogger(__name__)
 
+class IndexResult(NamedTuple):
+    """What one fetch produced: the documents, their chunks and chunk embeddings."""
+    documents: List[DocumentRecord]
+    chunks: List[ChunkRecord]
+    vectors: Optional[np.ndarray]
+
+class BatchAnswer(NamedTuple):
+    """One answer from a batch, tagged with the question's position in it."""
+    index: int
+    question: str
+    answer: Optional[str]
+    sources: List[Document]
+    error: Optional[str] = None
+
+class ChromaVectorStore(Chroma):
+    """Chroma that also takes texts whose embeddings are already computed."""
+    
+    def add_embeddings(
+        self,
+        texts: List[str],
+        embeddings: np.ndarray,
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        ids: Optional[List[str]] = None
+    ) -> List[str]:
+        """Add texts with precomputed embeddings (the counterpart of add_texts).
+        
+        Texts given an existing ID replace it rather than being added twice.
+        """
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        self._collection.upsert(
+            ids=ids,
+            embeddings=np.asarray(embeddings, dtype=np.float32).tolist(),
+            metadatas=metadatas,
+            documents=texts
+        )
+        return ids
+
 class RAGSystem:
     """RAG system for yeest.xyz."""
     
     def __init__(self):
+        # A baked-in snapshot has to land before the index and caches are opened
+        import_at_startup()
         self.llm = get_llm()
         self.embeddings = get_embeddings()
         self.vector_store = self._init_vector_store()
+        # Held while writing to the index so snapshots see whole batches
+        self.index_lock = threading.Lock()
+        # Passages with stable IDs (e.g. local Wikipedia rows) already in the store
+        self._stored_passages: set = set()
         
-    def _init_vector_store(self) -> Chroma:
+    def _init_vector_store(self) -> VectorStore:
         """Initialize the vector store."""
+        if config.VECTOR_STORE_BACKEND == "quantized":
+            # Compact int8 codes in memory, float32 vectors memory-mapped for rescoring
+            if config.WEB_CONCURRENCY > 1:
+                logger.warning("The quantized vector store is per-process; run it with a single worker")
+            os.makedirs(config.VECTOR_STORE_PATH, exist_ok=True)
+            return QuantizedVectorStore(
+                persist_directory=config.VECTOR_STORE_PATH,
+                embedding_function=self.embeddings
+            )
+        
+        if config.CHROMA_SERVER_HOST:
+            # Client/server mode: a single Chroma server owns the index and
+            # every worker talks to it, so workers never share SQLite files.
+            import chromadb
+            
+            client = chromadb.HttpClient(
+                host=config.CHROMA_SERVER_HOST,
+                port=config.CHROMA_SERVER_PORT
+            )
+            return ChromaVectorStore(
+                client=client,
+                embedding_function=self.embeddings
+            )
+        
+        if config.WEB_CONCURRENCY > 1:
+            logger.warning(
+                "Running several workers against an embedded Chroma store; "
+                "set CHROMA_SERVER_HOST to use a shared Chroma server"
+            )
+        
         # Ensure the directory exists
         os.makedirs(config.VECTOR_STORE_PATH, exist_ok=True)
         
-        return Chroma(
+        return ChromaVectorStore(
             persist_directory=config.VECTOR_STORE_PATH,
             embedding_function=self.embeddings
         )
     
-    def fetch_and_index_documents(self, query: str) -> List[Document]:
+    @profiled
+    def embed_query(self, text: str) -> np.ndarray:
+        """Embed a query as a normalized float32 vector."""
+        return np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+    
+    def _locally_covered_sources(self, query: str, query_embedding: Optional[np.ndarray] = None) -> List[str]:
+        """Sources whose background-ingested items already cover the query.
+        
+        A source counts as covered when it was ingested recently and its
+        closest indexed item is similar enough to the query.
+        """
+        fresh_sources = [s for s in ("news", "reddit") if freshness_index.is_fresh(s)]
+        if not fresh_sources:
+            return []
+        
+        covered = []
+        if query_embedding is None:
+            query_embedding = self.embed_query(query)
+        for source in fresh_sources:
+            try:
+                hits = self.vector_store.similarity_search_by_vector_with_relevance_scores(
+                    query_embedding.tolist(), k=1, filter={"source": source}
+                )
+            except Exception as e:
+                logger.error(f"Error checking local {source} coverage: {e}")
+                continue
+            # Chroma returns squared L2 distances; embeddings are normalized
+            if hits and 1 - hits[0][1] / 2 >= config.FRESHNESS_MIN_SIMILARITY:
+                covered.append(source)
+        return covered
+    
+    def fetch_and_index_documents(self, query: str) -> List[DocumentRecord]:
         """Fetch documents from all sources and index them."""
+        return self.fetch_and_index(query).documents
+    
+    def fetch_and_index(self, query: str, query_embedding: Optional[np.ndarray] = None) -> IndexResult:
+        """Fetch documents from all sources and index them, keeping the chunk embeddings."""
+        covered = self._locally_covered_sources(query, query_embedding)
+        if covered:
+            logger.info(f"Serving {covered} from the locally ingested index")
+        
+        all_documents = self.fetch_documents(query, skip_sources=covered)
+        chunks, vectors = self.index_documents(all_documents)
+        
+        return IndexResult(all_documents, chunks, vectors)
+    
+    def fetch_documents(self, query: str, skip_sources: Sequence[str] = ()) -> List[DocumentRecord]:
+        """Fetch documents for a query from every upstream source not skipped."""
         all_documents = []
         
         # Fetch from Wikipedia
@@ -45,70 +178,127 @@ class RAGSystem:
             logger.error(f"Error fetching Wikipedia documents: {e}")
         
         # Fetch from News
-        try:
-            news_docs = retrieve_news(query)
-            all_documents.extend(news_docs)
-            logger.info(f"Retrieved {len(news_docs)} news documents")
-        except Exception as e:
-            logger.error(f"Error fetching news documents: {e}")
+        if "news" not in skip_sources:
+            try:
+                news_docs = retrieve_news(query)
+                all_documents.extend(news_docs)
+                logger.info(f"Retrieved {len(news_docs)} news documents")
+            except Exception as e:
+                logger.error(f"Error fetching news documents: {e}")
         
         # Fetch from Reddit
-        try:
-            reddit_docs = retrieve_reddit(query)
-            all_documents.extend(reddit_docs)
-            logger.info(f"Retrieved {len(reddit_docs)} Reddit documents")
-        except Exception as e:
-            logger.error(f"Error fetching Reddit documents: {e}")
-        
-        if all_documents:
-            self.index_documents(all_documents)
+        if "reddit" not in skip_sources:
+            try:
+                reddit_docs = retrieve_reddit(query)
+                all_documents.extend(reddit_docs)
+                logger.info(f"Retrieved {len(reddit_docs)} Reddit documents")
+            except Exception as e:
+                logger.error(f"Error fetching Reddit documents: {e}")
         
         return all_documents
     
-    def index_documents(self, documents: List[Document]) -> None:
-        """Chunk and index documents in the vector store."""
-        if not documents:
-            return
+    def index_documents(self, documents: List[DocumentRecord]) -> Tuple[List[ChunkRecord], Optional[np.ndarray]]:
+        """Chunk and index documents in the vector store.
         
-        # Chunk the documents
-        chunked_docs = chunk_documents(documents)
+        Returns the chunks and their embeddings so callers can reuse them
+        without embedding again.
+        """
+        if not documents:
+            return [], None
         
-        # Add to vector store
-        self.vector_store.add_documents(chunked_docs)
+        # Chunk and embed once here (CPU-bound, so cap concurrent batches) and
+        # hand the vectors to the store rather than letting it embed again
+        with admission.embedding_slots:
+            chunks, vectors = self._chunk_and_embed(documents)
+        if not chunks:
+            return [], None
         
-        # Persist the vector store
-        self.vector_store.persist()
+        with self.index_lock:
+            self._add_embedded(chunks, vectors)
+            
+            # Persist the vector store (the Chroma server persists on its own)
+            if not config.CHROMA_SERVER_HOST:
+                self.vector_store.persist()
         
-        logger.info(f"Indexed {len(chunked_docs)} document chunks")
+        logger.info(f"Indexed {len(chunks)} document chunks")
+        return chunks, vectors
     
-    def get_rag_chain(self, k: int = None) -> RetrievalQA:
-        """Get the RAG chain for question answering."""
-        if k is None:
-            k = config.RAG_K
+    def _chunk_and_embed(self, documents: List[DocumentRecord]) -> Tuple[List[ChunkRecord], Optional[np.ndarray]]:
+        """Chunk and embed documents, in the indexing worker pool when one is configured.
         
-        # Create retriever
-        retriever = self.vector_store.as_retriever(
-            search_type="similarity",
-            search_kwargs={"k": k}
-        )
+        Passages that come with a stored embedding are used as one chunk each.
+        """
+        passages = [doc for doc in documents if isinstance(doc, EmbeddedPassage)]
+        documents = [doc for doc in documents if not isinstance(doc, EmbeddedPassage)]
+        chunks, vectors = self._chunk_and_embed_text(documents) if documents else ([], None)
+        if not passages:
+            return chunks, vectors
         
-        # Custom prompt template
-        prompt_template = """Use context as a source to know about things that you don't know.
-                            If the users asks a generic question, something on which you have been trained on and don't really require much context, then answer it yourself.
-                            Otherwise, decide if the context provided is relevant to query being asked, if not relevant, just say that you don't know. 
-                            Don't mention anything about context.
+        passage_chunks = [ChunkRecord(doc, 0, len(doc.text)) for doc in passages]
+        passage_vectors = np.vstack([doc.vector for doc in passages]).astype(np.float32, copy=False)
+        if vectors is None:
+            return passage_chunks, passage_vectors
+        return chunks + passage_chunks, np.vstack([vectors, passage_vectors])
+    
+    def _chunk_and_embed_text(self, documents: List[DocumentRecord]) -> Tuple[List[ChunkRecord], Optional[np.ndarray]]:
+        if indexing_engine is not None:
+            try:
+                return indexing_engine.chunk_and_embed(documents)
+            except Exception as e:
+                logger.error(f"Indexing workers failed, chunking in-process: {e}")
         
-        Context:
-        {context}
+        chunks = chunk_documents(documents)
+        if not chunks:
+            return [], None
+        vectors = np.asarray(
+            self.embeddings.embed_documents([chunk.text for chunk in chunks]),
+            dtype=np.float32
+        )
+        return chunks, vectors
+    
+    def _add_embedded(self, chunks: List[ChunkRecord], vectors: np.ndarray) -> None:
+        """Add chunks with precomputed embeddings to the vector store.
         
-        Question: {question}
+        Passages with a stable ID are added once per store, however often they're
+        fetched: this process skips those it has stored, and the stores dedupe
+        by ID across restarts (Chroma upserts, the quantized store skips known IDs).
+        """
+        keep = [
+            i for i, chunk in enumerate(chunks)
+            if not isinstance(chunk.parent, EmbeddedPassage) or chunk.parent.chunk_id not in self._stored_passages
+        ]
+        if not keep:
+            return
+        chunks = [chunks[i] for i in keep]
+        ids = [
+            chunk.parent.chunk_id if isinstance(chunk.parent, EmbeddedPassage) else str(uuid.uuid4())
+            for chunk in chunks
+        ]
+        # Plain strings and dicts only at the store boundary
+        self.vector_store.add_embeddings(
+            [chunk.text for chunk in chunks],
+            vectors[keep],
+            [chunk.parent.metadata for chunk in chunks],
+            ids=ids
+        )
+        self._stored_passages.update(
+            chunk.parent.chunk_id for chunk in chunks if isinstance(chunk.parent, EmbeddedPassage)
+        )
+    
+    def get_rag_chain(self, k: int = None, retriever: Optional[BaseRetriever] = None) -> RetrievalQA:
+        """Get the RAG chain for question answering.
         
-        Answer: """
+        Retrieves from the vector store unless another retriever is given.
+        """
+        if k is None:
+            k = config.RAG_K
         
-        PROMPT = PromptTemplate(
-            template=prompt_template,
-            input_variables=["context", "question"]
-        )
+        # Create retriever
+        if retriever is None:
+            retriever = self.vector_store.as_retriever(
+                search_type=config.RAG_SEARCH_TYPE,
+                search_kwargs={"k": k}
+            )
         
         # Create the RetrievalQA chain
         chain = RetrievalQA.from_chain_type(
@@ -121,6 +311,132 @@ class RAGSystem:
         
         return chain
     
+    @profiled
+    def retrieve_batch(self, questions: List[str], k: Optional[int] = None) -> List[List[Document]]:
+        """Retrieve context for many questions with shared fetching and embedding.
+        
+        Each distinct question is fetched once, documents returned for several
+        questions are indexed once, every new chunk is embedded in one pass,
+        and all questions are scored against the batch's chunks with a single
+        matrix multiply.
+        
+        Args:
+            questions: Questions to retrieve for
+            k: Chunks per question (defaults to RAG_K)
+            
+        Returns:
+            The top-k chunks for each question, in input order
+        """
+        if k is None:
+            k = config.RAG_K
+        if k < 1:
+            raise ValueError(f"k must be at least 1, got {k}")
+        keys = [coalesce_key(question) for question in questions]
+        queries = {}
+        for key, question in zip(keys, questions):
+            queries.setdefault(key, question)
+        
+        with ThreadPoolExecutor(max_workers=config.BATCH_FETCH_CONCURRENCY) as pool:
+            fetched = list(pool.map(propagate(self.fetch_documents), queries.values()))
+        
+        documents, seen = [], set()
+        for batch in fetched:
+            for document in batch:
+                identity = (document.source, document.url or document.text)
+                if identity not in seen:
+                    seen.add(identity)
+                    documents.append(document)
+        logger.info(f"Batch of {len(questions)} questions fetched {len(documents)} distinct documents")
+        
+        chunks, vectors = self.index_documents(documents)
+        if not chunks:
+            return [[] for _ in questions]
+        
+        with admission.embedding_slots:
+            # Queries go through embed_query so they stay out of the document embedding cache
+            query_vectors = np.asarray(
+                [self.embeddings.embed_query(query) for query in queries.values()], dtype=np.float32
+            )
+        
+        # Embeddings are normalized, so the product is cosine similarity
+        scores = query_vectors @ vectors.T
+        top = min(k, len(chunks))
+        best = np.argpartition(-scores, top - 1, axis=1)[:, :top]
+        order = np.argsort(-np.take_along_axis(scores, best, axis=1), axis=1)
+        best = np.take_along_axis(best, order, axis=1)
+        
+        by_key = {
+            key: [chunks[i].to_document() for i in row]
+            for key, row in zip(queries, best.tolist())
+        }
+        return [by_key[key] for key in keys]
+    
+    async def generate_answers(
+        self,
+        questions: List[str],
+        contexts: List[List[Document]],
+        concurrency: Optional[int] = None
+    ) -> AsyncIterator[BatchAnswer]:
+        """Answer questions over their retrieved context, yielding answers as they complete.
+        
+        At most `concurrency` LLM calls from this batch run at once (defaults to
+        BATCH_LLM_CONCURRENCY), and they also count against the shared LLM slots.
+        """
+        semaphore = asyncio.Semaphore(concurrency or config.BATCH_LLM_CONCURRENCY)
+        shared: Dict[str, asyncio.Task] = {}
+        
+        async def generate(question: str, documents: List[Document]) -> str:
+            prompt = PROMPT.format(
+                context="\n\n".join(doc.page_content for doc in documents),
+                question=question
+            )
+            async with semaphore, admission.llm_slot():
+                message = await self.llm.ainvoke(prompt)
+            return message.content
+        
+        async def answer(index: int, question: str, documents: List[Document]) -> BatchAnswer:
+            # Repeated questions share one LLM call
+            key = coalesce_key(question)
+            if key not in shared:
+                shared[key] = asyncio.create_task(generate(question, documents))
+            try:
+                return BatchAnswer(index, question, await shared[key], documents)
+            except Exception as e:
+                logger.error(f"Error answering batch question {index}: {e}")
+                return BatchAnswer(index, question, None, documents, str(e))
+        
+        tasks = [
+            asyncio.create_task(answer(i, question, documents))
+            for i, (question, documents) in enumerate(zip(questions, contexts))
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # The consumer went away (e.g. the client disconnected)
+            for task in [*tasks, *shared.values()]:
+                task.cancel()
+    
+    async def answer_batch(self, questions: List[str], k: Optional[int] = None) -> AsyncIterator[BatchAnswer]:
+        """Retrieve for and answer a batch of questions, yielding answers as they complete."""
+        contexts = await asyncio.to_thread(self.retrieve_batch, questions, k)
+        async for result in self.generate_answers(questions, contexts):
+            yield result
+    
+    @contextmanager
+    def _persisted_index(self) -> Iterator[None]:
+        """Hold the index write lock with everything flushed to disk."""
+        with self.index_lock:
+            self.vector_store.persist()
+            yield
+    
+    def export_snapshot(self, path: str) -> dict:
+        """Write a snapshot of the index and caches without pausing reads.
+
+        Writes are paused only while the files are copied aside.
+        """
+        return export_snapshot(path, lock=self._persisted_index())
+    
     def clear_vector_store(self) -> None:
         """Clear the vector store."""
         try:
@@ -128,6 +444,7 @@ class RAGSystem:
             self.vector_store.delete_collection()
             # Reinitialize
             self.vector_store = self._init_vector_store()
+            self._stored_passages.clear()
             logger.info("Vector store cleared")
         except Exception as e:
             logger.error(f"Error clearing vector store: {e}")
@@ -0,0 +1,92 @@
+"""Compact internal records for fetched documents and their chunks.
+
+Retrievers produce DocumentRecords and chunking produces ChunkRecords that
+point into their parent's text instead of copying it. Metadata lives once per
+document, with the repeated strings interned. LangChain Documents are only
+built at the vector store boundary via `to_document()`.
+"""
+
+import sys
+from typing import Any, Dict, Optional
+from langchain.schema import Document
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if isinstance(value, str) else value
+
+class DocumentRecord:
+    """A fetched document: its text plus metadata shared by all of its chunks."""
+
+    __slots__ = ("text", "source", "title", "url", "query", "extra")
+
+    def __init__(
+        self,
+        text: str,
+        source: str,
+        title: Optional[str] = None,
+        url: Optional[str] = None,
+        query: Optional[str] = None,
+        extra: Optional[Dict[str, Any]] = None
+    ):
+        self.text = text
+        self.source = _intern(source)
+        self.title = title
+        self.url = _intern(url)
+        self.query = _intern(query)
+        # Source-specific fields (published_at, subreddit, ...), rarely present
+        self.extra = extra
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """Metadata as a flat dict, without empty values (Chroma rejects None)."""
+        metadata = {
+            "source": self.source,
+            "title": self.title,
+            "url": self.url,
+            "query": self.query,
+        }
+        if self.extra:
+            metadata.update(self.extra)
+        return {key: value for key, value in metadata.items() if value is not None}
+
+    def to_document(self) -> Document:
+        return Document(page_content=self.text, metadata=self.metadata)
+
+    def __repr__(self) -> str:
+        return f"DocumentRecord(source={self.source!r}, title={self.title!r}, chars={len(self.text)})"
+
+class EmbeddedPassage(DocumentRecord):
+    """A passage that is already a single chunk with a stored embedding.
+
+    Indexing uses `vector` as is rather than chunking and embedding the text
+    again; `chunk_id` identifies the passage so it is stored only once.
+    """
+
+    __slots__ = ("vector", "chunk_id")
+
+    def __init__(self, text: str, source: str, vector: Any, chunk_id: str, **kwargs: Any):
+        super().__init__(text, source, **kwargs)
+        self.vector = vector
+        self.chunk_id = chunk_id
+
+class ChunkRecord:
+    """A chunk stored as a [start, end) slice of its parent document's text."""
+
+    __slots__ = ("parent", "start", "end")
+
+    def __init__(self, parent: DocumentRecord, start: int, end: int):
+        self.parent = parent
+        self.start = start
+        self.end = end
+
+    @property
+    def text(self) -> str:
+        return self.parent.text[self.start:self.end]
+
+    def to_document(self) -> Document:
+        return Document(page_content=self.text, metadata=self.parent.metadata)
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def __repr__(self) -> str:
+        return f"ChunkRecord({self.parent.title!r}, {self.start}:{self.end})"
@@ -1,7 +1,7 @@
 """Retrievers package for yeest.xyz backend."""
 
 from .wiki import retrieve_wikipedia
-from .news import retrieve_news
-from .reddit import retrieve_reddit
+from .news import retrieve_news, retrieve_news_since
+from .reddit import retrieve_reddit, retrieve_subreddit_new
 
-__all__ = ["retrieve_wikipedia", "retrieve_news", "retrieve_reddit"]
+__all__ = ["retrieve_wikipedia", "retrieve_news", "retrieve_news_since", "retrieve_reddit", "retrieve_subreddit_new"]
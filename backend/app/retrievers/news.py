@@ -1,19 +1,48 @@
 """News retriever for yeest.xyz backend."""
 
-from typing import List, Optional
-from datetime import datetime, timedelta
-from langchain.schema import Document
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
 import logging
 from ..config import config
+from ..records import DocumentRecord
 
 logger = logging.getLogger(__name__)
 
+# NewsAPI's largest page
+NEWS_PAGE_SIZE = 100
+
+def parse_published_at(value: str) -> datetime:
+    """Parse a NewsAPI publishedAt (with or without fractional seconds) as naive UTC."""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def _article_to_record(article: Dict[str, Any], query: str) -> Optional[DocumentRecord]:
+    """Convert an article to a document record, or None if it has no content."""
+    # Skip articles without content
+    if not article.get('content') or article['content'] == '[Removed]':
+        return None
+    
+    return DocumentRecord(
+        text=f"{article['title']}\n\n{article['description']}\n\n{article['content']}",
+        source="news",
+        title=article['title'],
+        url=article['url'],
+        query=query,
+        extra={
+            "published_at": article['publishedAt'],
+            "source_name": article['source']['name']
+        }
+    )
+
 def retrieve_news(
     query: str, 
     from_date: Optional[datetime] = None, 
     to_date: Optional[datetime] = None,
-    max_results: int = 5
-) -> List[Document]:
+    max_results: int = 5,
+    sort_by: str = 'relevancy'
+) -> List[DocumentRecord]:
     """
     Retrieve news articles based on query.
     
@@ -22,9 +51,10 @@ def retrieve_news(
         from_date: Start date for news search
         to_date: End date for news search
         max_results: Maximum number of articles to retrieve
+        sort_by: NewsAPI ordering ('relevancy' or 'publishedAt')
         
     Returns:
-        List of LangChain Documents
+        List of document records
     """
     documents = []
     
@@ -39,39 +69,25 @@ def retrieve_news(
         
         # Set default date range if not provided
         if not to_date:
-            to_date = datetime.now()
+            to_date = datetime.utcnow()
         if not from_date:
             from_date = to_date - timedelta(days=7)
         
         # Search for news articles
         articles = newsapi.get_everything(
             q=query,
-            from_param=from_date.strftime('%Y-%m-%d'),
-            to=to_date.strftime('%Y-%m-%d'),
+            from_param=from_date.strftime('%Y-%m-%dT%H:%M:%S'),
+            to=to_date.strftime('%Y-%m-%dT%H:%M:%S'),
             language='en',
-            sort_by='relevancy',
+            sort_by=sort_by,
             page_size=max_results
         )
         
         if articles['status'] == 'ok':
             for article in articles['articles']:
-                # Skip articles without content
-                if not article.get('content') or article['content'] == '[Removed]':
-                    continue
-                
-                # Create document with metadata
-                doc = Document(
-                    page_content=f"{article['title']}\n\n{article['description']}\n\n{article['content']}",
-                    metadata={
-                        "source": "news",
-                        "title": article['title'],
-                        "url": article['url'],
-                        "published_at": article['publishedAt'],
-                        "source_name": article['source']['name'],
-                        "query": query
-                    }
-                )
-                documents.append(doc)
+                doc = _article_to_record(article, query)
+                if doc is not None:
+                    documents.append(doc)
         
     except ImportError:
         logger.warning("newsapi-python not installed, skipping news retrieval")
@@ -79,3 +95,70 @@ def retrieve_news(
         logger.error(f"Error retrieving news for query '{query}': {e}")
     
     return documents
+
+def retrieve_news_since(query: str, since: datetime, max_pages: int = 5) -> Tuple[List[DocumentRecord], Optional[datetime]]:
+    """
+    Retrieve every news article published since a point in time.
+    
+    Unlike retrieve_news, errors on the first page are raised so callers can
+    tell a failed poll from a quiet one. An error on a later page (e.g. the
+    developer plan's 100-result cap) keeps the articles already fetched.
+    
+    Args:
+        query: Search query
+        since: Naive UTC time of the oldest article wanted
+        max_pages: Maximum number of 100-article pages to request
+        
+    Returns:
+        Document records and the newest publishedAt seen, including
+        articles skipped for having no content (None if there were none)
+    """
+    from newsapi import NewsApiClient
+    
+    newsapi = NewsApiClient(api_key=config.NEWSAPI_KEY)
+    documents: List[DocumentRecord] = []
+    newest: Optional[datetime] = None
+    to_date = datetime.utcnow()
+    
+    for page in range(1, max_pages + 1):
+        try:
+            articles = newsapi.get_everything(
+                q=query,
+                from_param=since.strftime('%Y-%m-%dT%H:%M:%S'),
+                to=to_date.strftime('%Y-%m-%dT%H:%M:%S'),
+                language='en',
+                sort_by='publishedAt',
+                page_size=NEWS_PAGE_SIZE,
+                page=page
+            )
+            if articles['status'] != 'ok':
+                raise RuntimeError(f"NewsAPI error for '{query}': {articles.get('message')}")
+        except Exception as e:
+            if page == 1:
+                raise
+            # Pages are newest first, so what was fetched is the newest slice
+            logger.warning(
+                f"Stopped paging news for '{query}' at page {page} ({e}); the oldest were skipped. "
+                f"Shorten INGEST_INTERVAL_SECONDS if this repeats"
+            )
+            break
+        
+        for article in articles['articles']:
+            try:
+                published = parse_published_at(article['publishedAt'])
+                newest = published if newest is None else max(newest, published)
+            except (KeyError, TypeError, ValueError):
+                logger.warning(f"Unparseable publishedAt for {article.get('url')}: {article.get('publishedAt')!r}")
+            doc = _article_to_record(article, query)
+            if doc is not None:
+                documents.append(doc)
+        
+        if page * NEWS_PAGE_SIZE >= articles['totalResults'] or len(articles['articles']) < NEWS_PAGE_SIZE:
+            break
+    else:
+        logger.warning(
+            f"More than {max_pages * NEWS_PAGE_SIZE} new articles for '{query}'; the oldest were skipped. "
+            f"Shorten INGEST_INTERVAL_SECONDS or raise INGEST_MAX_PAGES"
+        )
+    
+    return documents, newest
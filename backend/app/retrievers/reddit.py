@@ -1,13 +1,45 @@
 """Reddit retriever for yeest.xyz backend."""
 
-from typing import List
-from langchain.schema import Document
+from typing import List, Optional, Tuple
 import logging
 from ..config import config
+from ..records import DocumentRecord
 
 logger = logging.getLogger(__name__)
 
-def retrieve_reddit(query: str, limit: int = 5) -> List[Document]:
+def _get_reddit():
+    """Create an authenticated PRAW client."""
+    import praw
+    
+    return praw.Reddit(
+        client_id=config.REDDIT_CLIENT_ID,
+        client_secret=config.REDDIT_CLIENT_SECRET,
+        username=config.REDDIT_USERNAME,           
+        password=config.REDDIT_PASSWORD,  
+        user_agent=config.REDDIT_USER_AGENT
+    )
+
+def _submission_to_record(submission, query: str) -> Optional[DocumentRecord]:
+    """Convert a submission to a document record, or None if it has no text."""
+    # Skip posts without content
+    if not submission.selftext or submission.selftext == '[removed]':
+        return None
+    
+    return DocumentRecord(
+        text=f"{submission.title}\n\n{submission.selftext}",
+        source="reddit",
+        title=submission.title,
+        url=f"https://reddit.com{submission.permalink}",
+        query=query,
+        extra={
+            "subreddit": submission.subreddit.display_name,
+            "score": submission.score,
+            "created_utc": submission.created_utc,
+            "fullname": submission.name
+        }
+    )
+
+def retrieve_reddit(query: str, limit: int = 5) -> List[DocumentRecord]:
     """
     Retrieve Reddit posts based on query.
     
@@ -16,7 +48,7 @@ def retrieve_reddit(query: str, limit: int = 5) -> List[Document]:
         limit: Maximum number of posts to retrieve
         
     Returns:
-        List of LangChain Documents
+        List of document records
     """
     documents = []
     
@@ -25,37 +57,13 @@ def retrieve_reddit(query: str, limit: int = 5) -> List[Document]:
         return documents
     
     try:
-        import praw
-        
-        reddit = praw.Reddit(
-            client_id=config.REDDIT_CLIENT_ID,
-            client_secret=config.REDDIT_CLIENT_SECRET,
-            username=config.REDDIT_USERNAME,           
-            password=config.REDDIT_PASSWORD,  
-            user_agent=config.REDDIT_USER_AGENT
-        )
-        
+        reddit = _get_reddit()
         
         # Search for relevant posts
         for submission in reddit.subreddit("all").search(query, limit=limit):
-            # Skip posts without content
-            if not submission.selftext or submission.selftext == '[removed]':
-                continue
-            
-            # Create document with metadata
-            doc = Document(
-                page_content=f"{submission.title}\n\n{submission.selftext}",
-                metadata={
-                    "source": "reddit",
-                    "title": submission.title,
-                    "url": f"https://reddit.com{submission.permalink}",
-                    "subreddit": submission.subreddit.display_name,
-                    "score": submission.score,
-                    "created_utc": submission.created_utc,
-                    "query": query
-                }
-            )
-            documents.append(doc)
+            doc = _submission_to_record(submission, query)
+            if doc is not None:
+                documents.append(doc)
             
     except ImportError:
         logger.warning("praw not installed, skipping Reddit retrieval")
@@ -63,3 +71,34 @@ def retrieve_reddit(query: str, limit: int = 5) -> List[Document]:
         logger.error(f"Error retrieving Reddit posts for query '{query}': {e}")
     
     return documents
+
+def retrieve_subreddit_new(subreddit: str, before: Optional[str] = None, limit: int = 25) -> Tuple[List[DocumentRecord], Optional[str]]:
+    """
+    Retrieve the newest posts of a subreddit.
+    
+    Unlike retrieve_reddit, errors are raised so callers can tell a failed
+    poll from a quiet one.
+    
+    Args:
+        subreddit: Subreddit name without the r/ prefix
+        before: Fullname of the newest post already seen; only newer posts are returned
+        limit: Maximum number of posts to retrieve
+        
+    Returns:
+        Document records newest first, and the fullname of the newest post in
+        the listing, including link posts that have no record (None if empty)
+    """
+    reddit = _get_reddit()
+    params = {"before": before} if before else {}
+    documents = []
+    newest = None
+    
+    for submission in reddit.subreddit(subreddit).new(limit=limit, params=params):
+        # Listings come newest first
+        if newest is None:
+            newest = submission.name
+        doc = _submission_to_record(submission, f"r/{subreddit}")
+        if doc is not None:
+            documents.append(doc)
+    
+    return documents, newest
@@ -2,24 +2,88 @@
 
 import wikipedia
 from typing import List, Optional
-from langchain.schema import Document
 import logging
+from ..config import config
+from ..records import DocumentRecord, EmbeddedPassage
 
 logger = logging.getLogger(__name__)
 
-def retrieve_wikipedia(query: str, max_results: int = 3) -> List[Document]:
+def _page_to_record(page, query: str) -> DocumentRecord:
+    """Convert a Wikipedia page to a document record."""
+    return DocumentRecord(
+        text=page.content,
+        source="wikipedia",
+        title=page.title,
+        url=page.url,
+        query=query
+    )
+
+def retrieve_local_wikipedia(query: str, max_results: int = 3, chunks_per_article: int = 3) -> List[DocumentRecord]:
+    """
+    Retrieve Wikipedia passages from the prebuilt local corpus.
+    
+    Args:
+        query: Search query
+        max_results: Maximum number of articles to return passages from
+        chunks_per_article: Best-matching passages to keep per article
+        
+    Returns:
+        One EmbeddedPassage per passage, carrying its stored embedding so it
+        is indexed without being chunked or embedded again
+    """
+    import numpy as np
+    from ..llm import get_embeddings
+    from ..wiki_corpus import get_local_wiki_index
+    
+    index = get_local_wiki_index()
+    query_vector = np.asarray(get_embeddings().embed_query(query), dtype=np.float32)
+    
+    # Hits come best first; keep the best passages of the best articles
+    per_article = {}
+    passages = []
+    for hit in index.search(query_vector, max_results * chunks_per_article * 2):
+        if hit.title not in per_article:
+            if len(per_article) >= max_results:
+                continue
+            per_article[hit.title] = 0
+        if per_article[hit.title] < chunks_per_article:
+            per_article[hit.title] += 1
+            passages.append(EmbeddedPassage(
+                text=hit.text,
+                source="wikipedia",
+                vector=index.vector(hit.row),
+                chunk_id=f"wiki:{hit.row}",
+                title=hit.title,
+                url=hit.url,
+                query=query
+            ))
+    
+    return passages
+
+def retrieve_wikipedia(query: str, max_results: int = 3) -> List[DocumentRecord]:
     """
     Retrieve Wikipedia articles based on query.
     
+    Uses the local corpus when WIKI_CORPUS_PATH is configured and falls back
+    to the Wikipedia API when it has nothing.
+    
     Args:
         query: Search query
         max_results: Maximum number of articles to retrieve
         
     Returns:
-        List of LangChain Documents
+        List of document records
     """
     documents = []
     
+    if config.WIKI_CORPUS_PATH:
+        try:
+            documents = retrieve_local_wikipedia(query, max_results)
+            if documents:
+                return documents
+        except Exception as e:
+            logger.error(f"Error searching local Wikipedia corpus for query '{query}': {e}")
+    
     try:
         # Search for relevant Wikipedia pages
         search_results = wikipedia.search(query, results=max_results)
@@ -28,33 +92,13 @@ def retrieve_wikipedia(query: str, max_results: int = 3) -> List[Document]:
             try:
                 # Get the page content
                 page = wikipedia.page(title)
-                
-                # Create document with metadata
-                doc = Document(
-                    page_content=page.content,
-                    metadata={
-                        "source": "wikipedia",
-                        "title": page.title,
-                        "url": page.url,
-                        "query": query
-                    }
-                )
-                documents.append(doc)
+                documents.append(_page_to_record(page, query))
                 
             except wikipedia.exceptions.DisambiguationError as e:
                 # Handle disambiguation by taking the first option
                 try:
                     page = wikipedia.page(e.options[0])
-                    doc = Document(
-                        page_content=page.content,
-                        metadata={
-                            "source": "wikipedia",
-                            "title": page.title,
-                            "url": page.url,
-                            "query": query
-                        }
-                    )
-                    documents.append(doc)
+                    documents.append(_page_to_record(page, query))
                 except Exception as inner_e:
                     logger.warning(f"Failed to retrieve disambiguation page {e.options[0]}: {inner_e}")
                     
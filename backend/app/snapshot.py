@@ -0,0 +1,373 @@
+"""Index snapshots for yeest.xyz backend.
+
+A snapshot is a single file holding everything a fresh instance needs to
+answer from a warm index: the vector index, the embedding cache and the
+retrieval state (ingestion cursors and seen URLs).
+
+File layout:
+    8 bytes    magic b"YEESTSNP"
+    uint32     format version
+    uint32     manifest length
+    32 bytes   SHA-256 of the manifest
+    manifest   JSON: creation time, embedding model, vector store backend
+               and, per part, its group, relative path, offset, length and SHA-256
+    parts      raw file contents, each starting on a page boundary
+
+Parts are stored uncompressed and page-aligned, so importing is a checksum
+pass plus a copy out of a memory map; nothing is deserialized.
+
+Usage:
+    python -m app.snapshot export snapshot.yeest
+    python -m app.snapshot verify snapshot.yeest
+    python -m app.snapshot import snapshot.yeest [--force]
+"""
+
+import argparse
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import time
+from typing import Any, ContextManager, Dict, List, Optional, Tuple
+import logging
+
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"YEESTSNP"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sII32s")
+PAGE_SIZE = mmap.PAGESIZE
+COPY_BLOCK = 16 * 1024 * 1024
+
+# Written into the vector store directory after an import; never exported
+MARKER_FILE = ".snapshot"
+# Serializes imports between worker processes starting at the same time
+LOCK_FILE = ".snapshot.lock"
+# Imports are staged inside the vector store directory, which may be a mount point
+STAGING_DIR = ".importing"
+PREVIOUS_DIR = ".previous"
+SKIPPED = {MARKER_FILE, LOCK_FILE, STAGING_DIR, PREVIOUS_DIR}
+
+class SnapshotError(Exception):
+    """The snapshot is unreadable, corrupt or doesn't fit this deployment."""
+
+def default_targets() -> Dict[str, Optional[str]]:
+    """Where each part group lives in this deployment."""
+    return {
+        "vector_index": config.VECTOR_STORE_PATH,
+        "embedding_cache": config.EMBEDDING_CACHE_PATH,
+        "retrieval_state": config.INGEST_STATE_PATH,
+    }
+
+def _collect_files(targets: Dict[str, Optional[str]]) -> List[Tuple[str, str, str]]:
+    """(group, relative path, absolute path) of every file to export."""
+    single_files = {
+        os.path.abspath(path) for group, path in targets.items()
+        if group != "vector_index" and path
+    }
+    files = []
+    root = targets.get("vector_index")
+    if root and os.path.isdir(root):
+        for dirpath, dirnames, filenames in os.walk(root):
+            if dirpath == root:
+                dirnames[:] = [d for d in dirnames if d not in SKIPPED]
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                # Other groups may live inside the vector store directory
+                if filename in SKIPPED or filename.endswith(".tmp") or os.path.abspath(path) in single_files:
+                    continue
+                files.append(("vector_index", os.path.relpath(path, root), path))
+    for group, path in targets.items():
+        if group != "vector_index" and path and os.path.isfile(path):
+            files.append((group, os.path.basename(path), path))
+    return files
+
+def _align(offset: int) -> int:
+    return -(-offset // PAGE_SIZE) * PAGE_SIZE
+
+def export_snapshot(
+    out_path: str,
+    targets: Optional[Dict[str, Optional[str]]] = None,
+    lock: Optional[ContextManager] = None
+) -> Dict[str, Any]:
+    """Write a snapshot of the configured index state to out_path.
+
+    Args:
+        out_path: Snapshot file to write
+        targets: Source per part group (defaults to the configured paths)
+        lock: Index write lock; when given, the files are copied aside while it
+            is held and the snapshot is written from the copies after releasing it
+
+    Returns:
+        The snapshot manifest
+    """
+    if config.CHROMA_SERVER_HOST:
+        raise SnapshotError("The index lives on the Chroma server; snapshot its volume instead")
+    targets = targets or default_targets()
+    if lock is None:
+        return _write_snapshot(out_path, _collect_files(targets))
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(out_path))) as copies:
+        with lock:
+            files = []
+            for i, (group, rel, path) in enumerate(_collect_files(targets)):
+                copy = os.path.join(copies, str(i))
+                shutil.copyfile(path, copy)
+                files.append((group, rel, copy))
+        return _write_snapshot(out_path, files)
+
+def _write_snapshot(out_path: str, files: List[Tuple[str, str, str]]) -> Dict[str, Any]:
+    # Sizes are fixed up front; the manifest is rewritten once checksums are known
+    parts = [
+        {"group": group, "path": rel, "length": os.path.getsize(path)}
+        for group, rel, path in files
+    ]
+    manifest = {
+        "created_at": time.time(),
+        "embedding_model": config.EMBEDDING_MODEL_NAME,
+        "vector_store_backend": config.VECTOR_STORE_BACKEND,
+        "parts": parts,
+    }
+    # Reserve room for the offsets and hex digests added below
+    reserved = len(json.dumps(manifest)) + len(parts) * 128
+    offset = _align(HEADER.size + reserved)
+    for part in parts:
+        part["offset"] = offset
+        offset = _align(offset + part["length"])
+
+    tmp_path = f"{out_path}.tmp"
+    with open(tmp_path, 'wb') as out:
+        for part, (_, _, path) in zip(parts, files):
+            out.seek(part["offset"])
+            digest = hashlib.sha256()
+            remaining = part["length"]
+            with open(path, 'rb') as f:
+                # Copy only the length recorded above; a file growing meanwhile is cut there
+                while remaining:
+                    block = f.read(min(COPY_BLOCK, remaining))
+                    if not block:
+                        raise SnapshotError(f"{path} shrank while it was being exported")
+                    digest.update(block)
+                    out.write(block)
+                    remaining -= len(block)
+            part["sha256"] = digest.hexdigest()
+
+        encoded = json.dumps(manifest).encode("utf-8")
+        if HEADER.size + len(encoded) > (parts[0]["offset"] if parts else offset):
+            raise SnapshotError("Snapshot manifest outgrew its reserved space")
+        out.seek(0)
+        out.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(encoded), hashlib.sha256(encoded).digest()))
+        out.write(encoded)
+        out.truncate(max(offset, HEADER.size + len(encoded)))
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(tmp_path, out_path)
+
+    total = sum(part["length"] for part in parts)
+    logger.info(f"Exported snapshot with {len(parts)} parts ({total / 2**20:.1f} MiB) to {out_path}")
+    return manifest
+
+def _check_size(path: str) -> None:
+    # mmap can't map an empty file, so catch short files before opening them
+    if os.path.getsize(path) < HEADER.size:
+        raise SnapshotError("File is too short to be a snapshot")
+
+def read_manifest(snapshot: mmap.mmap) -> Dict[str, Any]:
+    magic, version, length, digest = HEADER.unpack_from(snapshot, 0)
+    if magic != MAGIC:
+        raise SnapshotError("Not a yeest snapshot")
+    if version != FORMAT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot version {version} (expected {FORMAT_VERSION})")
+    encoded = snapshot[HEADER.size:HEADER.size + length]
+    if hashlib.sha256(encoded).digest() != digest:
+        raise SnapshotError("Snapshot manifest checksum mismatch")
+    return json.loads(encoded)
+
+def _verify_parts(snapshot: mmap.mmap, manifest: Dict[str, Any]) -> None:
+    for part in manifest["parts"]:
+        end = part["offset"] + part["length"]
+        if end > len(snapshot):
+            raise SnapshotError(f"Snapshot is truncated inside {part['group']}/{part['path']}")
+        digest = hashlib.sha256()
+        for start in range(part["offset"], end, COPY_BLOCK):
+            digest.update(snapshot[start:min(start + COPY_BLOCK, end)])
+        if digest.hexdigest() != part["sha256"]:
+            raise SnapshotError(f"Checksum mismatch in {part['group']}/{part['path']}")
+
+def verify_snapshot(path: str) -> Dict[str, Any]:
+    """Check a snapshot's header and every part checksum.
+
+    Returns:
+        The snapshot manifest
+    """
+    _check_size(path)
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as snapshot:
+        manifest = read_manifest(snapshot)
+        _verify_parts(snapshot, manifest)
+    return manifest
+
+def _write_part(snapshot: mmap.mmap, part: Dict[str, Any], dest: str) -> None:
+    os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+    with open(dest, 'wb') as f:
+        end = part["offset"] + part["length"]
+        for start in range(part["offset"], end, COPY_BLOCK):
+            f.write(snapshot[start:min(start + COPY_BLOCK, end)])
+
+def _manifest_id(path: str) -> str:
+    _check_size(path)
+    with open(path, 'rb') as f:
+        return HEADER.unpack(f.read(HEADER.size))[3].hex()
+
+def _swap_contents(root: str, staging: str, keep: set) -> None:
+    """Replace the entries of root with those of staging, leaving root itself in place."""
+    previous = os.path.join(root, PREVIOUS_DIR)
+    shutil.rmtree(previous, ignore_errors=True)
+    os.mkdir(previous)
+    for name in os.listdir(root):
+        if name not in SKIPPED and os.path.join(root, name) not in keep:
+            os.replace(os.path.join(root, name), os.path.join(previous, name))
+    for name in os.listdir(staging):
+        os.replace(os.path.join(staging, name), os.path.join(root, name))
+    shutil.rmtree(previous, ignore_errors=True)
+    os.rmdir(staging)
+
+def import_snapshot(
+    path: str,
+    targets: Optional[Dict[str, Optional[str]]] = None,
+    force: bool = False
+) -> bool:
+    """Replace the local index state with a snapshot's contents.
+
+    Must run before the vector store and embedding cache are opened. The
+    vector index is extracted into a staging directory inside its target and
+    the target's contents are swapped for it, so the target may be a mount
+    point. Concurrent imports of the same snapshot run once.
+
+    Args:
+        path: Snapshot file
+        targets: Destination per part group (defaults to the configured paths)
+        force: Import even if this snapshot was already imported
+
+    Returns:
+        True if the snapshot was imported, False if it was already in place
+    """
+    targets = targets or default_targets()
+    vector_root = targets["vector_index"]
+    os.makedirs(vector_root, exist_ok=True)
+    with open(os.path.join(vector_root, LOCK_FILE), 'w') as lock:
+        # Other workers block here and then find the marker already written
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            return _import_locked(path, targets, vector_root, force)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def _import_locked(path: str, targets: Dict[str, Optional[str]], vector_root: str, force: bool) -> bool:
+    marker = os.path.join(vector_root, MARKER_FILE)
+    snapshot_id = _manifest_id(path)
+    if not force and os.path.exists(marker):
+        with open(marker, 'r', encoding='utf-8') as f:
+            if f.read().strip() == snapshot_id:
+                logger.info(f"Snapshot {path} is already imported")
+                return False
+
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as snapshot:
+        manifest = read_manifest(snapshot)
+        if manifest["embedding_model"] != config.EMBEDDING_MODEL_NAME:
+            raise SnapshotError(
+                f"Snapshot was built with {manifest['embedding_model']}, not {config.EMBEDDING_MODEL_NAME}"
+            )
+        if manifest["vector_store_backend"] != config.VECTOR_STORE_BACKEND:
+            raise SnapshotError(
+                f"Snapshot holds a {manifest['vector_store_backend']} index, "
+                f"but VECTOR_STORE_BACKEND is {config.VECTOR_STORE_BACKEND}"
+            )
+        _verify_parts(snapshot, manifest)
+
+        staging = os.path.join(vector_root, STAGING_DIR)
+        shutil.rmtree(staging, ignore_errors=True)
+        os.mkdir(staging)
+        for part in manifest["parts"]:
+            if part["group"] == "vector_index":
+                _write_part(snapshot, part, os.path.join(staging, part["path"]))
+
+        # Files of other groups kept in the vector store directory stay put
+        keep = {
+            os.path.join(vector_root, os.path.basename(dest))
+            for group, dest in targets.items()
+            if group != "vector_index" and dest and os.path.dirname(os.path.abspath(dest)) == os.path.abspath(vector_root)
+        }
+        _swap_contents(vector_root, staging, keep)
+
+        for part in manifest["parts"]:
+            if part["group"] == "vector_index":
+                continue
+            dest = targets.get(part["group"])
+            if not dest:
+                logger.info(f"Skipping snapshot part {part['group']}: not configured here")
+                continue
+            _write_part(snapshot, part, f"{dest}.tmp")
+            os.replace(f"{dest}.tmp", dest)
+
+    # Written last, so an interrupted import is retried on the next start
+    with open(f"{marker}.tmp", 'w', encoding='utf-8') as f:
+        f.write(snapshot_id)
+    os.replace(f"{marker}.tmp", marker)
+    logger.info(f"Imported snapshot {path} ({len(manifest['parts'])} parts)")
+    return True
+
+def import_at_startup() -> None:
+    """Import SNAPSHOT_PATH if it is set, present and not yet imported."""
+    if not config.SNAPSHOT_PATH or not os.path.exists(config.SNAPSHOT_PATH):
+        return
+    if config.CHROMA_SERVER_HOST:
+        logger.warning("SNAPSHOT_PATH is ignored when the index lives on a Chroma server")
+        return
+    try:
+        if import_snapshot(config.SNAPSHOT_PATH):
+            from .ingest import freshness_index
+
+            freshness_index._reload()
+    except SnapshotError as e:
+        logger.error(f"Not importing snapshot {config.SNAPSHOT_PATH}: {e}")
+    except OSError as e:
+        # Start on the existing index rather than not at all
+        logger.error(
+            f"Could not import snapshot {config.SNAPSHOT_PATH} into {config.VECTOR_STORE_PATH} "
+            f"(is it writable by this user?): {e}"
+        )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export, verify or import an index snapshot")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="Write a snapshot of the configured index")
+    export.add_argument("path")
+    verify = sub.add_parser("verify", help="Check a snapshot's checksums")
+    verify.add_argument("path")
+    load = sub.add_parser("import", help="Replace the configured index with a snapshot")
+    load.add_argument("path")
+    load.add_argument("--force", action="store_true", help="Import even if already imported")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "export":
+        manifest = export_snapshot(args.path)
+    elif args.command == "verify":
+        manifest = verify_snapshot(args.path)
+    else:
+        import_snapshot(args.path, force=args.force)
+        manifest = verify_snapshot(args.path)
+    print(json.dumps({
+        "embedding_model": manifest["embedding_model"],
+        "vector_store_backend": manifest["vector_store_backend"],
+        "parts": [f"{p['group']}/{p['path']} ({p['length']} bytes)" for p in manifest["parts"]],
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""Chunking and retrieval auto-tuner for yeest.xyz backend.
+
+Sweeps chunk size, chunk overlap, k, search type (similarity or MMR) and
+vector store (float32 or int8) over the EvaluationRunner dataset and
+measures, per configuration:
+    context_rougeL   ROUGE-L recall of the reference answer in the retrieved context
+    answer_rougeL    ROUGE-L F1 of the generated answer (only with --answers)
+    index_seconds    chunking plus embedding time for the whole corpus
+    search_ms        median search latency per question
+    index_mb         in-memory index size (vectors or int8 codes, plus chunk text)
+    prompt_tokens    mean prompt size, counted with the embedding model's tokenizer
+
+Upstream documents come from a cache recorded once, so sweeps run offline.
+Generated answers are cached by prompt, so configurations that yield the
+same prompt share one LLM call. Chunk embeddings are memoized across
+configurations with their measured cost, so index_seconds is what a cold
+index would take.
+
+Usage:
+    python -m app.tuner record                      # fetch upstream documents (online)
+    python -m app.tuner sweep                       # offline sweep
+    python -m app.tuner sweep --answers --ks 3 5    # also score generated answers
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import logging
+
+import numpy as np
+from .config import config
+from .eval_runner import EvaluationRunner, create_sample_test_dataset
+from .prompts import PROMPT
+from .quantized_store import QuantizedVectorIndex
+from .records import DocumentRecord
+from .utils import chunk_spans, get_text_splitter, maximal_marginal_relevance
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GRID = {
+    "chunk_size": [250, 500, 1000],
+    "chunk_overlap": [0, 50, 100],
+    "k": [3, 5, 8],
+    "search_type": ["similarity", "mmr"],
+    "store": ["float32", "int8"],
+}
+
+# Candidates considered by MMR per result, as in LangChain's default fetch_k=20 for k=5
+MMR_FETCH_FACTOR = 4
+
+# Lower is better for every metric except quality
+COST_METRICS = ("index_seconds", "search_ms", "index_mb", "prompt_tokens")
+
+class UpstreamCache:
+    """Recorded upstream documents per query, and generated answers per prompt."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._data: Dict[str, Dict[str, Any]] = {"documents": {}, "answers": {}}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self._data.update(json.load(f))
+
+    def documents(self, query: str) -> Optional[List[DocumentRecord]]:
+        entries = self._data["documents"].get(query)
+        if entries is None:
+            return None
+        return [DocumentRecord(**entry) for entry in entries]
+
+    def set_documents(self, query: str, documents: List[DocumentRecord]) -> None:
+        self._data["documents"][query] = [
+            {slot: getattr(doc, slot) for slot in DocumentRecord.__slots__}
+            for doc in documents
+        ]
+
+    def answer(self, prompt: str) -> Optional[str]:
+        return self._data["answers"].get(hashlib.sha1(prompt.encode("utf-8")).hexdigest())
+
+    def set_answer(self, prompt: str, answer: str) -> None:
+        self._data["answers"][hashlib.sha1(prompt.encode("utf-8")).hexdigest()] = answer
+
+    def save(self) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+class MemoEmbedder:
+    """Embeds each distinct text once and remembers what it cost."""
+
+    def __init__(self, model):
+        self.model = model
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._seconds: Dict[str, float] = {}
+
+    def embed(self, texts: List[str]) -> Tuple[np.ndarray, float]:
+        """Vectors for texts, plus the time embedding all of them from scratch took."""
+        missing = list(dict.fromkeys(t for t in texts if t not in self._vectors))
+        if missing:
+            start = time.perf_counter()
+            vectors = np.asarray(self.model.embed_documents(missing), dtype=np.float32)
+            per_text = (time.perf_counter() - start) / len(missing)
+            for text, vector in zip(missing, vectors):
+                self._vectors[text] = vector
+                self._seconds[text] = per_text
+        return np.stack([self._vectors[t] for t in texts]), sum(self._seconds[t] for t in texts)
+
+def count_tokens(model, text: str) -> int:
+    tokenizer = getattr(getattr(model, "client", None), "tokenizer", None)
+    if tokenizer is None:
+        return len(text) // 4
+    return len(tokenizer(text, add_special_tokens=False)["input_ids"])
+
+def record(runner: EvaluationRunner, cache: UpstreamCache, refresh: bool = False) -> int:
+    """Fetch and cache upstream documents for every eval question."""
+    from .rag import rag_system
+
+    fetched = 0
+    for case in runner.load_test_cases():
+        query = case["query"]
+        if not refresh and cache.documents(query) is not None:
+            continue
+        cache.set_documents(query, rag_system.fetch_documents(query))
+        fetched += 1
+        logger.info(f"Recorded upstream documents for {query!r}")
+    cache.save()
+    return fetched
+
+class _Index:
+    """One sweep index over the corpus chunks, float32 or int8."""
+
+    def __init__(self, store: str, vectors: np.ndarray, texts: List[str], workdir: str):
+        self.store = store
+        self.vectors = vectors
+        text_bytes = sum(len(t.encode("utf-8")) for t in texts)
+        if store == "int8":
+            self.quantized = QuantizedVectorIndex(workdir)
+            self.quantized.add(texts, vectors, [{"source": "tuner"} for _ in texts])
+            self.bytes = self.quantized.nbytes + text_bytes
+        else:
+            self.bytes = vectors.nbytes + text_bytes
+
+    def search(self, query: np.ndarray, k: int, search_type: str) -> List[int]:
+        fetch = k * MMR_FETCH_FACTOR if search_type == "mmr" else k
+        if self.store == "int8":
+            rows = [row for row, _ in self.quantized.search(query, fetch)]
+        else:
+            scores = self.vectors @ query
+            fetch = min(fetch, len(scores))
+            top = np.argpartition(-scores, fetch - 1)[:fetch]
+            rows = top[np.argsort(-scores[top])].tolist()
+        if search_type == "mmr":
+            picked = maximal_marginal_relevance(query, self.vectors[rows], k)
+            rows = [rows[i] for i in picked]
+        return rows
+
+def sweep(
+    runner: EvaluationRunner,
+    cache: UpstreamCache,
+    grid: Dict[str, Sequence[Any]],
+    answers: bool = False,
+    embedding_model=None
+) -> List[Dict[str, Any]]:
+    """Evaluate every configuration in the grid.
+
+    Returns:
+        One result per configuration: its settings and measured metrics
+    """
+    cases = [case for case in runner.load_test_cases() if cache.documents(case["query"]) is not None]
+    if not cases:
+        raise ValueError("No cached upstream documents; run `python -m app.tuner record` first")
+
+    # One corpus for all questions, like the shared vector store
+    corpus, seen = [], set()
+    for case in cases:
+        for doc in cache.documents(case["query"]):
+            if (doc.source, doc.url or doc.text) not in seen:
+                seen.add((doc.source, doc.url or doc.text))
+                corpus.append(doc)
+
+    if embedding_model is None:
+        from .llm import load_embedding_model
+
+        embedding_model = load_embedding_model()
+    embedder = MemoEmbedder(embedding_model)
+    queries, _ = embedder.embed([case["query"] for case in cases])
+    llm = None
+    if answers:
+        from .llm import get_llm
+
+        llm = get_llm()
+
+    results = []
+    for chunk_size, overlap in itertools.product(grid["chunk_size"], grid["chunk_overlap"]):
+        if overlap >= chunk_size:
+            continue
+        splitter = get_text_splitter(chunk_size, overlap)
+        start = time.perf_counter()
+        texts = [doc.text[s:e] for doc in corpus for s, e in chunk_spans(doc.text, splitter)]
+        chunk_seconds = time.perf_counter() - start
+        if not texts:
+            continue
+        vectors, embed_seconds = embedder.embed(texts)
+        logger.info(f"chunk_size={chunk_size} overlap={overlap}: {len(texts)} chunks")
+
+        for store in grid["store"]:
+            with tempfile.TemporaryDirectory() as workdir:
+                index = _Index(store, vectors, texts, workdir)
+                for k, search_type in itertools.product(grid["k"], grid["search_type"]):
+                    metrics = {"context_rougeL": [], "answer_rougeL": [], "search_ms": [], "prompt_tokens": []}
+                    for case, query in zip(cases, queries):
+                        begin = time.perf_counter()
+                        rows = index.search(query, k, search_type)
+                        metrics["search_ms"].append((time.perf_counter() - begin) * 1000)
+
+                        context = "\n\n".join(texts[row] for row in rows)
+                        prompt = PROMPT.format(context=context, question=case["query"])
+                        metrics["prompt_tokens"].append(count_tokens(embedding_model, prompt))
+                        reference = case["reference_answer"]
+                        metrics["context_rougeL"].append(runner.rouge_scorer.score(reference, context)["rougeL"].recall)
+                        if llm is not None:
+                            answer = cache.answer(prompt)
+                            if answer is None:
+                                answer = llm.invoke(prompt).content
+                                cache.set_answer(prompt, answer)
+                            metrics["answer_rougeL"].append(runner.evaluate_answer(answer, reference)["rougeL_f"])
+
+                    result = {
+                        "chunk_size": chunk_size,
+                        "chunk_overlap": overlap,
+                        "k": k,
+                        "search_type": search_type,
+                        "store": store,
+                        "chunks": len(texts),
+                        "context_rougeL": float(np.mean(metrics["context_rougeL"])),
+                        "index_seconds": chunk_seconds + embed_seconds,
+                        "search_ms": float(np.median(metrics["search_ms"])),
+                        "index_mb": index.bytes / 2**20,
+                        "prompt_tokens": float(np.mean(metrics["prompt_tokens"])),
+                    }
+                    if metrics["answer_rougeL"]:
+                        result["answer_rougeL"] = float(np.mean(metrics["answer_rougeL"]))
+                    results.append(result)
+    if answers:
+        cache.save()
+    return results
+
+def quality(result: Dict[str, Any]) -> float:
+    return result.get("answer_rougeL", result["context_rougeL"])
+
+def pareto_front(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Results no other result beats on quality and every cost at once."""
+    def dominates(a, b):
+        no_worse = quality(a) >= quality(b) and all(a[m] <= b[m] for m in COST_METRICS)
+        better = quality(a) > quality(b) or any(a[m] < b[m] for m in COST_METRICS)
+        return no_worse and better
+
+    return [r for r in results if not any(dominates(other, r) for other in results)]
+
+def recommend(front: List[Dict[str, Any]], tolerance: float = 0.01) -> Dict[str, Any]:
+    """The cheapest prompt on the front whose quality is within `tolerance` of the best."""
+    best = max(quality(r) for r in front)
+    candidates = [r for r in front if quality(r) >= best - tolerance]
+    return min(candidates, key=lambda r: (r["prompt_tokens"], r["index_seconds"], r["search_ms"]))
+
+def as_env(result: Dict[str, Any]) -> Dict[str, str]:
+    """The recommended configuration as environment variables."""
+    return {
+        "CHUNK_SIZE": str(result["chunk_size"]),
+        "CHUNK_OVERLAP": str(result["chunk_overlap"]),
+        "RAG_K": str(result["k"]),
+        "RAG_SEARCH_TYPE": result["search_type"],
+        "VECTOR_STORE_BACKEND": "quantized" if result["store"] == "int8" else "chroma",
+    }
+
+def main() -> None:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--dataset", default="tests/eval_dataset.jsonl")
+    common.add_argument("--cache", default="tuning_cache.json", help="Recorded upstream documents and answers")
+    parser = argparse.ArgumentParser(description="Tune chunking and retrieval settings on the eval dataset")
+    sub = parser.add_subparsers(dest="command", required=True)
+    record_parser = sub.add_parser("record", parents=[common], help="Fetch and cache upstream documents")
+    record_parser.add_argument("--refresh", action="store_true", help="Re-fetch questions already cached")
+    sweep_parser = sub.add_parser("sweep", parents=[common], help="Evaluate the configuration grid offline")
+    sweep_parser.add_argument("--chunk-sizes", type=int, nargs="+", default=DEFAULT_GRID["chunk_size"])
+    sweep_parser.add_argument("--overlaps", type=int, nargs="+", default=DEFAULT_GRID["chunk_overlap"])
+    sweep_parser.add_argument("--ks", type=int, nargs="+", default=DEFAULT_GRID["k"])
+    sweep_parser.add_argument("--search-types", nargs="+", default=DEFAULT_GRID["search_type"], choices=["similarity", "mmr"])
+    sweep_parser.add_argument("--stores", nargs="+", default=DEFAULT_GRID["store"], choices=["float32", "int8"])
+    sweep_parser.add_argument("--answers", action="store_true", help="Generate answers with the LLM and score them")
+    sweep_parser.add_argument("--tolerance", type=float, default=0.01, help="Quality given up for a cheaper config")
+    sweep_parser.add_argument("--out", default="tuning_results.json")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.dataset == "tests/eval_dataset.jsonl" and not os.path.exists(args.dataset):
+        create_sample_test_dataset()
+    runner = EvaluationRunner(args.dataset)
+    cache = UpstreamCache(args.cache)
+    if args.command == "record":
+        print(f"Recorded {record(runner, cache, args.refresh)} questions into {args.cache}")
+        return
+
+    grid = {
+        "chunk_size": args.chunk_sizes,
+        "chunk_overlap": args.overlaps,
+        "k": args.ks,
+        "search_type": args.search_types,
+        "store": args.stores,
+    }
+    results = sweep(runner, cache, grid, answers=args.answers)
+    front = sorted(pareto_front(results), key=quality, reverse=True)
+    best = recommend(front, args.tolerance)
+    current = {"CHUNK_SIZE": config.CHUNK_SIZE, "CHUNK_OVERLAP": config.CHUNK_OVERLAP, "RAG_K": config.RAG_K}
+
+    print(f"\n{len(results)} configurations, {len(front)} on the Pareto front (current: {current})\n")
+    print(f"{'size':>5} {'overlap':>7} {'k':>3} {'search':>10} {'store':>7} {'quality':>8} "
+          f"{'index s':>8} {'search ms':>9} {'index MB':>9} {'tokens':>7}")
+    for r in front:
+        print(f"{r['chunk_size']:>5} {r['chunk_overlap']:>7} {r['k']:>3} {r['search_type']:>10} {r['store']:>7} "
+              f"{quality(r):>8.3f} {r['index_seconds']:>8.2f} {r['search_ms']:>9.3f} {r['index_mb']:>9.2f} "
+              f"{r['prompt_tokens']:>7.0f}")
+    print("\nRecommended:")
+    for key, value in as_env(best).items():
+        print(f"{key}={value}")
+
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump({"results": results, "pareto_front": front, "recommended": as_env(best)}, f, indent=2)
+    print(f"\nFull results saved to {args.out}")
+
+if __name__ == "__main__":
+    main()
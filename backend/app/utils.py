@@ -1,23 +1,74 @@
 """Utility functions for yeest.xyz backend."""
 
-from typing import List
+from typing import List, Optional, Tuple
+import numpy as np
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
 from .config import config
+from .records import DocumentRecord, ChunkRecord
 
-def get_text_splitter() -> RecursiveCharacterTextSplitter:
-    """Get configured text splitter for chunking documents."""
+def get_text_splitter(
+    chunk_size: Optional[int] = None,
+    chunk_overlap: Optional[int] = None
+) -> RecursiveCharacterTextSplitter:
+    """Get text splitter for chunking documents (configured sizes unless overridden)."""
     return RecursiveCharacterTextSplitter(
-        chunk_size=config.CHUNK_SIZE,
-        chunk_overlap=config.CHUNK_OVERLAP,
+        chunk_size=chunk_size or config.CHUNK_SIZE,
+        chunk_overlap=config.CHUNK_OVERLAP if chunk_overlap is None else chunk_overlap,
         length_function=len,
         separators=["\n\n", "\n", " ", ""]
     )
 
-def chunk_documents(documents: List[Document]) -> List[Document]:
-    """Chunk documents using the configured text splitter."""
+def chunk_spans(
+    text: str,
+    text_splitter: Optional[RecursiveCharacterTextSplitter] = None
+) -> List[Tuple[int, int]]:
+    """Split text into chunks, returned as (start, end) offsets into it."""
+    text_splitter = text_splitter or get_text_splitter()
+    spans = []
+    index = -1
+    for piece in text_splitter.split_text(text):
+        # Same offset search the splitter uses for add_start_index
+        index = text.find(piece, index + 1)
+        if index < 0:
+            index = text.find(piece)
+        spans.append((index, index + len(piece)))
+    return spans
+
+def chunk_documents(documents: List[DocumentRecord]) -> List[ChunkRecord]:
+    """Chunk documents using the configured text splitter.
+    
+    Chunks are offsets into their parent's text rather than copies of it.
+    """
     text_splitter = get_text_splitter()
-    return text_splitter.split_documents(documents)
+    return [
+        ChunkRecord(document, start, end)
+        for document in documents
+        for start, end in chunk_spans(document.text, text_splitter)
+    ]
+
+def maximal_marginal_relevance(
+    query_vector: np.ndarray,
+    candidates: np.ndarray,
+    k: int,
+    lambda_mult: float = 0.5
+) -> List[int]:
+    """Pick k candidate rows balancing similarity to the query against redundancy.
+    
+    Vectors are assumed normalized, so dot products are cosine similarities.
+    """
+    if not len(candidates):
+        return []
+    relevance = candidates @ query_vector
+    selected = [int(np.argmax(relevance))]
+    redundancy = candidates @ candidates[selected[0]]
+    while len(selected) < min(k, len(candidates)):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        redundancy = np.maximum(redundancy, candidates @ candidates[best])
+    return selected
 
 def format_docs(docs: List[Document]) -> str:
     """Format documents for RAG context."""
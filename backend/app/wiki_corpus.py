@@ -0,0 +1,518 @@
+"""Offline local Wikipedia corpus for yeest.xyz backend.
+
+Builds a local, memory-mapped vector index from a Wikipedia dump (or any
+subset of it) so that Wikipedia hits can be served without network calls.
+
+Index layout (all in one directory):
+    manifest.json   articles (id, content hash, row range), row count, dead rows
+    vectors.f32     float32 chunk embeddings, one row per chunk
+    chunks.i64      per row: text start, text end, article id
+    texts.bin       UTF-8 chunk texts, back to back
+    ivf.*           inverted file over the vectors (large corpora only)
+
+Builds are incremental and resumable: unchanged articles are skipped, changed
+ones have their old rows marked dead and new rows appended, articles missing
+from a refreshed dump are tombstoned, and the manifest is committed after
+every batch so an interrupted build picks up where it stopped.
+
+Search on a large corpus goes through an inverted file: the vectors are
+clustered with spherical k-means, and a query only scores the rows of its
+WIKI_CORPUS_NPROBE nearest clusters instead of the whole memmap. New rows are
+assigned to the existing clusters, which are retrained once the corpus has
+doubled since they were trained.
+
+Usage:
+    python -m app.wiki_corpus build --source enwiki-pages-articles.xml.bz2 --out ./wiki_corpus
+    python -m app.wiki_corpus build --source subset.jsonl --out ./wiki_corpus --workers 8
+    python -m app.wiki_corpus search --out ./wiki_corpus "history of the printing press"
+"""
+
+import argparse
+import bz2
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import threading
+import xml.etree.ElementTree as ET
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+import logging
+
+import numpy as np
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+VECTORS = "vectors.f32"
+CHUNKS = "chunks.i64"
+TEXTS = "texts.bin"
+IVF_CENTROIDS = "ivf_centroids.f32"
+IVF_ASSIGN = "ivf_assign.i32"
+IVF_ORDER = "ivf_order.i64"
+IVF_OFFSETS = "ivf_offsets.i64"
+
+# Below this many rows a full scan is already fast and clustering isn't worth it
+IVF_MIN_ROWS = 100_000
+# Rows scored per block when scanning or assigning, to bound temporary memory
+BLOCK_ROWS = 65_536
+
+# ─── Dump reading ──────────────────────────────────────
+
+_TEMPLATE = re.compile(r"\{\{[^{}]*\}\}")
+_REF = re.compile(r"<ref[^>/]*/>|<ref[^>]*>.*?</ref>", re.DOTALL)
+_TAG = re.compile(r"<[^>]+>")
+_LINK = re.compile(r"\[\[(?:[^|\]]*\|)?([^\]]*)\]\]")
+_EXTERNAL_LINK = re.compile(r"\[https?://[^\s\]]+\s?([^\]]*)\]")
+_TABLE = re.compile(r"\{\|.*?\|\}", re.DOTALL)
+_HEADING = re.compile(r"^=+\s*(.*?)\s*=+\s*$", re.MULTILINE)
+_FORMATTING = re.compile(r"'{2,}")
+
+def strip_wikitext(text: str) -> str:
+    """Reduce wikitext to plain prose (a cheap approximation of the rendered page)."""
+    text = _REF.sub("", text)
+    # Templates nest, so peel them from the inside out
+    previous = None
+    while previous != text:
+        previous = text
+        text = _TEMPLATE.sub("", text)
+    text = _TABLE.sub("", text)
+    text = re.sub(r"\[\[(?:File|Image|Category):[^\]]*\]\]", "", text)
+    text = _LINK.sub(r"\1", text)
+    text = _EXTERNAL_LINK.sub(r"\1", text)
+    text = _TAG.sub("", text)
+    text = _HEADING.sub(r"\1", text)
+    text = _FORMATTING.sub("", text)
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+def _title_url(title: str) -> str:
+    return f"https://en.wikipedia.org/wiki/{title.replace(' ', '_')}"
+
+def iter_articles(source: str, titles: Optional[set] = None) -> Iterator[Tuple[str, str, str]]:
+    """Yield (title, url, text) from a MediaWiki XML dump (optionally .bz2) or a JSONL file.
+
+    JSONL lines need "title" and "text" and may carry "url".
+    """
+    if source.endswith(".jsonl"):
+        with open(source, 'r', encoding='utf-8') as f:
+            for line in f:
+                article = json.loads(line)
+                if titles is None or article["title"] in titles:
+                    yield article["title"], article.get("url") or _title_url(article["title"]), article["text"]
+        return
+
+    opener = bz2.open if source.endswith(".bz2") else open
+    with opener(source, 'rb') as f:
+        root = None
+        title, namespace, redirect, text = None, None, False, None
+        for event, elem in ET.iterparse(f, events=("start", "end")):
+            if root is None:
+                root = elem
+            if event == "start":
+                continue
+            tag = elem.tag.rsplit("}", 1)[-1]
+            if tag == "title":
+                title = elem.text
+            elif tag == "ns":
+                namespace = elem.text
+            elif tag == "redirect":
+                redirect = True
+            elif tag == "text":
+                text = elem.text or ""
+            elif tag == "page":
+                if namespace == "0" and not redirect and title and (titles is None or title in titles):
+                    cleaned = strip_wikitext(text or "")
+                    if cleaned:
+                        yield title, _title_url(title), cleaned
+                title, namespace, redirect, text = None, None, False, None
+                # Pages are independent, so free the parsed tree as we go
+                root.clear()
+
+def _content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+# ─── Parallel chunk + embed workers ────────────────────
+
+_worker_embeddings = None
+
+def _init_worker() -> None:
+    """Load the embedding model once per worker process."""
+    global _worker_embeddings
+    try:
+        import torch
+
+        # Parallelism comes from the processes; keep each one single-threaded
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+    from .llm import load_embedding_model
+
+    # Bypass the embedding cache: corpus chunks are embedded exactly once
+    _worker_embeddings = load_embedding_model()
+
+def _embed_articles(batch: List[Tuple[str, str, str, str]]) -> List[Tuple[str, str, str, List[str], np.ndarray]]:
+    """Chunk and embed a batch of (title, url, text, hash) articles."""
+    from .utils import get_text_splitter
+
+    if _worker_embeddings is None:
+        _init_worker()
+
+    splitter = get_text_splitter()
+    results = []
+    for title, url, text, digest in batch:
+        pieces = splitter.split_text(text)
+        if not pieces:
+            continue
+        vectors = np.asarray(_worker_embeddings.embed_documents(pieces), dtype=np.float32)
+        results.append((title, url, digest, pieces, vectors))
+    return results
+
+# ─── Index building ────────────────────────────────────
+
+def _load_manifest(out_dir: str) -> Dict[str, Any]:
+    path = os.path.join(out_dir, MANIFEST)
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {"dim": None, "rows": 0, "text_bytes": 0, "next_id": 0, "articles": {}, "dead": [], "ivf": None}
+
+def _commit_manifest(out_dir: str, manifest: Dict[str, Any]) -> None:
+    path = os.path.join(out_dir, MANIFEST)
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(f"{path}.tmp", path)
+
+def _truncate_to_manifest(out_dir: str, manifest: Dict[str, Any]) -> None:
+    """Drop rows written after the last committed batch (an interrupted build)."""
+    dim = manifest["dim"] or 0
+    sizes = {
+        VECTORS: manifest["rows"] * dim * 4,
+        CHUNKS: manifest["rows"] * 3 * 8,
+        TEXTS: manifest["text_bytes"],
+        IVF_ASSIGN: (manifest.get("ivf") or {}).get("assigned_rows", 0) * 4,
+    }
+    for name, size in sizes.items():
+        path = os.path.join(out_dir, name)
+        if os.path.exists(path) and os.path.getsize(path) > size:
+            with open(path, 'r+b') as f:
+                f.truncate(size)
+
+def _open_pool(workers: Optional[int]):
+    """A spawn pool of embedding workers, or None to embed in this process (workers=0)."""
+    if workers == 0:
+        return None
+    return multiprocessing.get_context("spawn").Pool(workers or os.cpu_count(), initializer=_init_worker)
+
+def build_index(
+    source: str,
+    out_dir: str,
+    workers: Optional[int] = None,
+    titles: Optional[set] = None,
+    batch_articles: int = 256
+) -> Dict[str, int]:
+    """Build or refresh the local index from `source`. Returns counts of what changed.
+
+    Articles already indexed (within `titles`, when given) that the source no
+    longer contains are tombstoned once the whole source has been read.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = _load_manifest(out_dir)
+    manifest.setdefault("ivf", None)
+    _truncate_to_manifest(out_dir, manifest)
+    articles = manifest["articles"]
+    stats = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0, "chunks": 0}
+    present = set()
+
+    def pending_batches() -> Iterator[List[Tuple[str, str, str, str]]]:
+        batch = []
+        for title, url, text in iter_articles(source, titles):
+            present.add(title)
+            digest = _content_hash(text)
+            if articles.get(title, {}).get("hash") == digest:
+                stats["unchanged"] += 1
+                continue
+            batch.append((title, url, text, digest))
+            if len(batch) >= batch_articles:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def split(batch: List[Any]) -> List[List[Any]]:
+        # Small tasks keep every worker busy even when article sizes vary a lot
+        return [batch[i:i + 8] for i in range(0, len(batch), 8)]
+
+    pool = _open_pool(workers)
+    try:
+        with open(os.path.join(out_dir, VECTORS), 'ab') as vectors_file, \
+             open(os.path.join(out_dir, CHUNKS), 'ab') as chunks_file, \
+             open(os.path.join(out_dir, TEXTS), 'ab') as texts_file:
+
+            for batch in pending_batches():
+                tasks = split(batch)
+                embedded = pool.imap_unordered(_embed_articles, tasks) if pool else map(_embed_articles, tasks)
+                for results in embedded:
+                    for title, url, digest, pieces, vectors in results:
+                        manifest["dim"] = manifest["dim"] or int(vectors.shape[1])
+                        previous = articles.get(title)
+                        if previous:
+                            # The old version stays on disk but is never returned again
+                            manifest["dead"].append(previous["rows"])
+                            stats["updated"] += 1
+                        else:
+                            stats["added"] += 1
+
+                        article_id = previous["id"] if previous else manifest["next_id"]
+                        if not previous:
+                            manifest["next_id"] += 1
+
+                        table = np.empty((len(pieces), 3), dtype=np.int64)
+                        for i, piece in enumerate(pieces):
+                            encoded = piece.encode("utf-8")
+                            table[i] = (manifest["text_bytes"], manifest["text_bytes"] + len(encoded), article_id)
+                            texts_file.write(encoded)
+                            manifest["text_bytes"] += len(encoded)
+
+                        vectors_file.write(vectors.tobytes())
+                        chunks_file.write(table.tobytes())
+                        start = manifest["rows"]
+                        manifest["rows"] += len(pieces)
+                        articles[title] = {"id": article_id, "hash": digest, "url": url, "rows": [start, manifest["rows"]]}
+                        stats["chunks"] += len(pieces)
+
+                # Make the batch durable before recording it in the manifest
+                for f in (vectors_file, chunks_file, texts_file):
+                    f.flush()
+                    os.fsync(f.fileno())
+                _commit_manifest(out_dir, manifest)
+                logger.info(f"Committed batch: {stats}")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    # The whole source was read, so anything in scope it didn't contain is gone
+    for title in [t for t in articles if t not in present and (titles is None or t in titles)]:
+        manifest["dead"].append(articles.pop(title)["rows"])
+        stats["removed"] += 1
+    if stats["removed"]:
+        _commit_manifest(out_dir, manifest)
+        logger.info(f"Tombstoned {stats['removed']} articles missing from {source}")
+
+    _update_ivf(out_dir, manifest)
+    return stats
+
+# ─── Inverted file ─────────────────────────────────────
+
+def _nearest_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Cluster of each row (vectors and centroids are normalized)."""
+    assign = np.empty(len(vectors), dtype=np.int32)
+    # About 64 MB of scores at a time, however many clusters there are
+    step = max(1, (1 << 24) // len(centroids))
+    for start in range(0, len(vectors), step):
+        block = np.asarray(vectors[start:start + step], dtype=np.float32)
+        assign[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assign
+
+def train_centroids(vectors: np.ndarray, nlist: int, iterations: int = 10, sample_size: int = 100_000, seed: int = 0) -> np.ndarray:
+    """Spherical k-means centroids from a sample of the rows."""
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(len(vectors), min(len(vectors), max(sample_size, nlist)), replace=False))
+    sample = np.asarray(vectors[rows], dtype=np.float32)
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = _nearest_centroids(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        empty = ~sums.any(axis=1)
+        # Reseed empty clusters with random rows so every list gets used
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()), replace=False)]
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+    return centroids.astype(np.float32)
+
+def _update_ivf(out_dir: str, manifest: Dict[str, Any]) -> None:
+    """Assign new rows to clusters, retraining when the corpus has doubled, and rewrite the lists."""
+    rows, dim = manifest["rows"], manifest["dim"]
+    ivf = manifest.get("ivf")
+    if rows < IVF_MIN_ROWS:
+        return
+
+    vectors = np.memmap(os.path.join(out_dir, VECTORS), dtype=np.float32, mode='r', shape=(rows, dim))
+    assign_path = os.path.join(out_dir, IVF_ASSIGN)
+    if ivf is None or rows >= 2 * ivf["trained_rows"]:
+        nlist = max(1, int(2 * np.sqrt(rows)))
+        logger.info(f"Training {nlist} clusters over {rows} rows")
+        centroids = train_centroids(vectors, nlist)
+        # Drop the old inverted file first, so an interrupted rewrite is retrained next build
+        manifest["ivf"] = None
+        _commit_manifest(out_dir, manifest)
+        _write_atomic(os.path.join(out_dir, IVF_CENTROIDS), centroids.tobytes())
+        _write_atomic(assign_path, b"")
+        ivf = {"nlist": nlist, "trained_rows": rows, "assigned_rows": 0}
+    else:
+        centroids = np.fromfile(os.path.join(out_dir, IVF_CENTROIDS), dtype=np.float32).reshape(ivf["nlist"], dim)
+
+    with open(assign_path, 'ab') as f:
+        for start in range(ivf["assigned_rows"], rows, BLOCK_ROWS):
+            f.write(_nearest_centroids(vectors[start:start + BLOCK_ROWS], centroids).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    ivf["assigned_rows"] = rows
+
+    # Row ids grouped by cluster (ascending within each, so probes read the memmap in order)
+    assign = np.fromfile(assign_path, dtype=np.int32)
+    order = np.argsort(assign, kind="stable").astype(np.int64)
+    offsets = np.searchsorted(assign[order], np.arange(ivf["nlist"] + 1)).astype(np.int64)
+    _write_atomic(os.path.join(out_dir, IVF_ORDER), order.tobytes())
+    _write_atomic(os.path.join(out_dir, IVF_OFFSETS), offsets.tobytes())
+
+    manifest["ivf"] = ivf
+    _commit_manifest(out_dir, manifest)
+    logger.info(f"Inverted file covers {rows} rows in {ivf['nlist']} clusters")
+
+def _write_atomic(path: str, data: bytes) -> None:
+    with open(f"{path}.tmp", 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(f"{path}.tmp", path)
+
+# ─── Serving ───────────────────────────────────────────
+
+class WikiHit(NamedTuple):
+    """One search result: a live chunk and its similarity to the query."""
+    title: str
+    url: str
+    text: str
+    score: float
+    row: int
+
+class LocalWikiIndex:
+    """Read-only, memory-mapped view of a built corpus."""
+
+    def __init__(self, path: str, nprobe: int = config.WIKI_CORPUS_NPROBE):
+        manifest = _load_manifest(path)
+        if not manifest["rows"]:
+            raise ValueError(f"No local Wikipedia index found at {path}")
+
+        rows, dim = manifest["rows"], manifest["dim"]
+        self.vectors = np.memmap(os.path.join(path, VECTORS), dtype=np.float32, mode='r', shape=(rows, dim))
+        self.chunks = np.memmap(os.path.join(path, CHUNKS), dtype=np.int64, mode='r', shape=(rows, 3))
+        self.texts = np.memmap(os.path.join(path, TEXTS), dtype=np.uint8, mode='r')
+
+        self.live = np.ones(rows, dtype=bool)
+        for start, end in manifest["dead"]:
+            self.live[start:end] = False
+
+        self.articles: Dict[int, Tuple[str, str]] = {
+            entry["id"]: (title, entry["url"]) for title, entry in manifest["articles"].items()
+        }
+
+        self.nprobe = nprobe
+        self.centroids: Optional[np.ndarray] = None
+        # Rows past the inverted file (an interrupted build) are scanned directly
+        self.clustered_rows = 0
+        ivf = manifest.get("ivf")
+        if ivf:
+            self.centroids = np.fromfile(os.path.join(path, IVF_CENTROIDS), dtype=np.float32).reshape(ivf["nlist"], dim)
+            self.order = np.memmap(os.path.join(path, IVF_ORDER), dtype=np.int64, mode='r')
+            self.offsets = np.fromfile(os.path.join(path, IVF_OFFSETS), dtype=np.int64)
+            self.clustered_rows = min(ivf["assigned_rows"], rows)
+
+    def chunk_text(self, row: int) -> str:
+        start, end, _ = self.chunks[row]
+        return bytes(self.texts[start:end]).decode("utf-8")
+
+    def vector(self, row: int) -> np.ndarray:
+        return np.array(self.vectors[row])
+
+    def _candidates(self, query_vector: np.ndarray) -> np.ndarray:
+        """Rows worth scoring: the nearest clusters' lists plus any unclustered tail."""
+        tail = np.arange(self.clustered_rows, len(self.vectors), dtype=np.int64)
+        if self.centroids is None:
+            return tail
+        nprobe = min(self.nprobe, len(self.centroids))
+        probes = np.argpartition(-(self.centroids @ query_vector), nprobe - 1)[:nprobe]
+        lists = [self.order[self.offsets[c]:self.offsets[c + 1]] for c in np.sort(probes)]
+        return np.concatenate(lists + [tail])
+
+    def search(self, query_vector: np.ndarray, k: int) -> List[WikiHit]:
+        """Top-k live chunks, best first."""
+        if self.centroids is None:
+            # Small corpus: score everything, a block at a time
+            rows = np.arange(len(self.vectors), dtype=np.int64)
+            scores = np.concatenate([
+                self.vectors[start:start + BLOCK_ROWS] @ query_vector
+                for start in range(0, len(self.vectors), BLOCK_ROWS)
+            ])
+        else:
+            rows = np.sort(self._candidates(query_vector))
+            scores = self.vectors[rows] @ query_vector
+
+        keep = self.live[rows]
+        rows, scores = rows[keep], scores[keep]
+        k = min(k, len(rows))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        hits = []
+        for i in top:
+            row = int(rows[i])
+            title, url = self.articles[int(self.chunks[row][2])]
+            hits.append(WikiHit(title, url, self.chunk_text(row), float(scores[i]), row))
+        return hits
+
+_local_index: Optional[LocalWikiIndex] = None
+_local_index_lock = threading.Lock()
+
+def get_local_wiki_index() -> Optional[LocalWikiIndex]:
+    """The configured local index, opened on first use; None when not configured."""
+    global _local_index
+    if not config.WIKI_CORPUS_PATH:
+        return None
+    with _local_index_lock:
+        if _local_index is None:
+            _local_index = LocalWikiIndex(config.WIKI_CORPUS_PATH)
+        return _local_index
+
+# ─── CLI ───────────────────────────────────────────────
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build and query the local Wikipedia corpus")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Build or incrementally refresh the index")
+    build.add_argument("--source", required=True, help="pages-articles XML dump (.xml/.xml.bz2) or JSONL file")
+    build.add_argument("--out", default=config.WIKI_CORPUS_PATH or "./wiki_corpus")
+    build.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores, 0 embeds in-process)")
+    build.add_argument("--titles", help="File with one article title per line to restrict the build to")
+    build.add_argument("--batch-articles", type=int, default=256)
+
+    search = subparsers.add_parser("search", help="Query a built index")
+    search.add_argument("--out", default=config.WIKI_CORPUS_PATH or "./wiki_corpus")
+    search.add_argument("-k", type=int, default=config.RAG_K)
+    search.add_argument("query")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "build":
+        titles = None
+        if args.titles:
+            with open(args.titles, 'r', encoding='utf-8') as f:
+                titles = {line.strip() for line in f if line.strip()}
+        stats = build_index(args.source, args.out, args.workers, titles, args.batch_articles)
+        print(json.dumps(stats, indent=2))
+    else:
+        from .llm import get_embeddings
+
+        index = LocalWikiIndex(args.out)
+        query_vector = np.asarray(get_embeddings().embed_query(args.query), dtype=np.float32)
+        for hit in index.search(query_vector, args.k):
+            print(f"{hit.score:.3f}  {hit.title}  {hit.url}\n    {hit.text[:160]!r}")
+
+if __name__ == "__main__":
+    main()
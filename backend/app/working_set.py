@@ -0,0 +1,131 @@
+"""Per-session working set of recently retrieved chunks for yeest.xyz backend.
+
+Follow-up questions usually concern documents fetched a turn or two earlier.
+Each session keeps the chunk texts and embeddings from its recent turns so
+that a follow-up which is well covered by them can be answered without any
+upstream fetch or re-embedding.
+
+Working sets live in the worker process that served the turn. With several
+workers a follow-up only hits when it lands on the same worker (e.g. behind
+session-affine load balancing); otherwise it is answered the regular way.
+"""
+
+import re
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain.schema import Document, BaseRetriever
+from .config import config
+from .records import ChunkRecord
+
+# Openers that only make sense as a continuation of the previous turn
+FOLLOW_UP_OPENERS = ("and ", "what about ", "how about ", "tell me more", "what else")
+# Personal pronouns that point back at the previous turn's subject
+FOLLOW_UP_PRONOUNS = {"it", "its", "they", "their", "them", "he", "him", "his", "she", "her"}
+
+def is_follow_up(question: str) -> bool:
+    """Whether a question clearly leans on the previous turn for its subject.
+
+    That is a continuation opener, or a personal pronoun in a question that
+    names nothing of its own (no capitalized word after the first).
+    """
+    stripped = question.strip()
+    if stripped.lower().startswith(FOLLOW_UP_OPENERS):
+        return True
+    words = re.findall(r"[A-Za-z']+", stripped)
+    if not {word.lower() for word in words} & FOLLOW_UP_PRONOUNS:
+        return False
+    return not any(word[0].isupper() for word in words[1:])
+
+def expand_follow_up(question: str, previous_question: Optional[str]) -> str:
+    """Turn a follow-up into a standalone search query using the previous question.
+
+    "and what about its population?" after "What is the capital of France?"
+    becomes "What is the capital of France? and what about its population?".
+    Standalone questions are returned unchanged.
+    """
+    if previous_question and is_follow_up(question):
+        return f"{previous_question} {question}"
+    return question
+
+class WorkingSet:
+    """Chunk texts and their embeddings from a session's most recent turns.
+
+    Only each chunk's own text is kept, never its parent page, so a working
+    set costs a few turns of chunks however long the fetched pages were.
+    """
+
+    def __init__(self, max_turns: int = config.WORKING_SET_TURNS):
+        self._turns = deque(maxlen=max_turns)
+        self._lock = threading.Lock()
+        self.last_query: Optional[str] = None
+
+    def __len__(self) -> int:
+        return sum(len(texts) for texts, _, _ in self._turns)
+
+    def add(self, chunks: List[ChunkRecord], vectors: Optional[np.ndarray]) -> None:
+        """Remember one turn's chunks; the oldest turn drops out when full."""
+        if vectors is None or not len(chunks):
+            return
+        # One metadata dict per parent document, shared by its chunks
+        metadata: Dict[int, Dict[str, Any]] = {}
+        for chunk in chunks:
+            if id(chunk.parent) not in metadata:
+                metadata[id(chunk.parent)] = chunk.parent.metadata
+        turn = (
+            [chunk.text for chunk in chunks],
+            [metadata[id(chunk.parent)] for chunk in chunks],
+            vectors
+        )
+        with self._lock:
+            self._turns.append(turn)
+
+    def search(self, query_vector: np.ndarray, k: int) -> List[Tuple[Document, float]]:
+        """Top-k chunks by cosine similarity (embeddings are normalized)."""
+        with self._lock:
+            turns = list(self._turns)
+        if not turns:
+            return []
+
+        texts = [text for turn_texts, _, _ in turns for text in turn_texts]
+        metadatas = [meta for _, turn_metadatas, _ in turns for meta in turn_metadatas]
+        scores = np.vstack([vectors for _, _, vectors in turns]) @ query_vector
+        k = min(k, len(texts))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(Document(page_content=texts[i], metadata=metadatas[i]), float(scores[i])) for i in top]
+
+    def covers(self, hits: List[Tuple[Document, float]]) -> bool:
+        """Whether enough chunks are similar enough to answer without fetching."""
+        strong = [score for _, score in hits if score >= config.WORKING_SET_MIN_SIMILARITY]
+        return len(strong) >= config.WORKING_SET_MIN_HITS
+
+class StaticRetriever(BaseRetriever):
+    """Retriever that returns a fixed set of already-selected documents."""
+
+    documents: List[Document]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: Any) -> List[Document]:
+        return self.documents
+
+# Working sets of recently active sessions, least recently used evicted first
+_working_sets: "OrderedDict[str, WorkingSet]" = OrderedDict()
+_working_sets_lock = threading.Lock()
+
+def get_working_set(session_id: str) -> WorkingSet:
+    """Get (or create) the working set for a session."""
+    with _working_sets_lock:
+        working_set = _working_sets.pop(session_id, None)
+        if working_set is None:
+            working_set = WorkingSet()
+        _working_sets[session_id] = working_set
+        while len(_working_sets) > config.WORKING_SET_MAX_SESSIONS:
+            _working_sets.popitem(last=False)
+        return working_set
+
+def drop_working_set(session_id: str) -> None:
+    """Forget a session's working set."""
+    with _working_sets_lock:
+        _working_sets.pop(session_id, None)
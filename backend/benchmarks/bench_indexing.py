@@ -0,0 +1,86 @@
+"""Benchmark in-process indexing against the indexing worker pool.
+
+Chunks and embeds the same documents in-process and with each requested
+pool size. Reports chunks per second and the worst event-loop stall seen
+by a 10 ms ticker running alongside, which is what other requests in the
+same web worker would feel.
+
+Usage:
+    python benchmarks/bench_indexing.py --workers 0 2 4 --documents 48
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.indexing import IndexingEngine
+from app.llm import get_embeddings
+from app.records import DocumentRecord
+from app.utils import chunk_documents
+
+TICK_SECONDS = 0.01
+
+def sample_documents(count: int, path: str = None) -> list:
+    if path:
+        with open(path, 'r', encoding='utf-8') as f:
+            texts = [block.strip() for block in f.read().split("\n\n") if block.strip()]
+    else:
+        sentence = "The printing press spread literacy across Europe within a few decades of its invention. "
+        texts = [f"Article {i}. " + sentence * 120 for i in range(count)]
+    return [DocumentRecord(texts[i % len(texts)], "bench", title=f"doc {i}") for i in range(count)]
+
+def in_process(documents: list) -> int:
+    chunks = chunk_documents(documents)
+    get_embeddings().embed_documents([chunk.text for chunk in chunks])
+    return len(chunks)
+
+async def measure(run, documents: list) -> tuple:
+    """Run indexing off the loop and track the longest gap between ticks."""
+    worst = 0.0
+    done = False
+
+    async def ticker():
+        nonlocal worst
+        last = time.perf_counter()
+        while not done:
+            await asyncio.sleep(TICK_SECONDS)
+            now = time.perf_counter()
+            worst = max(worst, now - last - TICK_SECONDS)
+            last = now
+
+    task = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    count = await asyncio.to_thread(run, documents)
+    elapsed = time.perf_counter() - start
+    done = True
+    await task
+    return count, elapsed, worst
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 2, 4])
+    parser.add_argument("--documents", type=int, default=48)
+    parser.add_argument("--text-file", help="Use blank-line separated documents from this file")
+    args = parser.parse_args()
+
+    documents = sample_documents(args.documents, args.text_file)
+    print(f"{'workers':>8} {'chunks/s':>10} {'max loop stall ms':>18}")
+    for workers in args.workers:
+        if workers == 0:
+            in_process(documents[:2])  # load the model outside the timing
+            run = in_process
+        else:
+            engine = IndexingEngine(workers)
+            engine.chunk_and_embed(documents[:workers])  # start and warm the workers
+            run = lambda docs: len(engine.chunk_and_embed(docs)[0])
+        count, elapsed, worst = asyncio.run(measure(run, documents))
+        print(f"{workers:>8} {count / elapsed:>10.1f} {worst * 1000:>18.1f}")
+        if workers:
+            engine.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Benchmark the quantized vector store against full-precision float search.
+
+Reports measured memory per million chunks, recall@RAG_K against exact
+float32 search and query latency for:
+    float32   exact brute-force search over float32 vectors
+    chroma    the current Chroma store (HNSW over float32), when installed
+    int8      QuantizedVectorIndex two-stage search
+
+Memory is the growth in this process's resident set while each store is
+built and queried (Linux /proc/self/statm), so it includes Chroma's HNSW
+graph and the int8 index's spare capacity; the int8 row also shows the exact
+bytes of its in-memory arrays.
+
+Vectors are synthetic, clustered and normalized like sentence embeddings by
+default; pass --embed-file with one text per line to use real embeddings.
+
+Usage:
+    python benchmarks/bench_quantized.py --chunks 200000 --queries 200
+"""
+
+import argparse
+import gc
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.config import config
+from app.quantized_store import QuantizedVectorIndex
+
+def synthetic_vectors(count: int, dim: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    """Normalized vectors scattered around random topic centers."""
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, count)] + 0.6 * rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def embedded_vectors(path: str) -> np.ndarray:
+    from app.llm import get_embeddings
+
+    with open(path, 'r', encoding='utf-8') as f:
+        texts = [line.strip() for line in f if line.strip()]
+    return np.asarray(get_embeddings().embed_documents(texts), dtype=np.float32)
+
+def rss_bytes() -> int:
+    """Current resident set size (peak RSS where /proc isn't available)."""
+    try:
+        with open("/proc/self/statm", 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def resident_growth(baseline: int) -> int:
+    gc.collect()
+    return max(0, rss_bytes() - baseline)
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    scores = queries @ vectors.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+def recall(found: list, truth: np.ndarray) -> float:
+    return float(np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)]))
+
+def timed(search, queries: np.ndarray) -> tuple:
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(search(query))
+        latencies.append(time.perf_counter() - start)
+    return results, float(np.median(latencies) * 1000), float(np.percentile(latencies, 95) * 1000)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("-k", type=int, default=config.RAG_K)
+    parser.add_argument("--rescore-factor", type=int, default=config.QUANTIZED_RESCORE_FACTOR)
+    parser.add_argument("--embed-file", help="Embed these texts instead of generating vectors")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.embed_file:
+        vectors = embedded_vectors(args.embed_file)
+        queries = vectors[rng.choice(len(vectors), args.queries)] + 0.05 * rng.standard_normal((args.queries, vectors.shape[1])).astype(np.float32)
+    else:
+        data = synthetic_vectors(args.chunks + args.queries, args.dim, args.clusters, rng)
+        vectors, queries = data[:args.chunks], data[args.chunks:]
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    count, dim = vectors.shape
+    truth = exact_top_k(vectors, queries, args.k)
+
+    rows = []
+
+    gc.collect()
+    baseline = rss_bytes()
+    float_vectors = np.array(vectors)
+    _, p50, p95 = timed(lambda q: np.argsort(-(float_vectors @ q))[:args.k], queries)
+    rows.append(("float32", resident_growth(baseline), 1.0, p50, p95, float_vectors.nbytes))
+    del float_vectors
+
+    try:
+        import chromadb
+
+        gc.collect()
+        baseline = rss_bytes()
+        collection = chromadb.EphemeralClient().create_collection("bench", metadata={"hnsw:space": "cosine"})
+        for start in range(0, count, 5000):
+            batch = vectors[start:start + 5000]
+            collection.add(ids=[str(i) for i in range(start, start + len(batch))], embeddings=batch.tolist())
+        found, p50, p95 = timed(
+            lambda q: [int(i) for i in collection.query(query_embeddings=[q.tolist()], n_results=args.k)["ids"][0]],
+            queries
+        )
+        rows.append(("chroma", resident_growth(baseline), recall(found, truth), p50, p95, None))
+    except ImportError:
+        print("chromadb not installed, skipping the Chroma baseline")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        gc.collect()
+        baseline = rss_bytes()
+        index = QuantizedVectorIndex(tmp)
+        for start in range(0, count, 50000):
+            batch = vectors[start:start + 50000]
+            index.add(["" for _ in batch], batch, [{"source": "bench"} for _ in batch])
+        found, p50, p95 = timed(
+            lambda q: [row for row, _ in index.search(q, args.k, rescore_factor=args.rescore_factor)],
+            queries
+        )
+        # Rescoring pages float32 vectors in from the memmap; those pages count too
+        rows.append(("int8", resident_growth(baseline), recall(found, truth), p50, p95, index.nbytes))
+
+    def per_million(total: int) -> float:
+        return total / count * 1e6 / 2**20
+
+    print(f"\n{count} chunks, dim {dim}, k={args.k}, rescore factor {args.rescore_factor}\n")
+    print(f"{'store':<8} {'RSS MB/1M':>10} {'arrays MB/1M':>13} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, resident, rec, p50, p95, array_bytes in rows:
+        arrays = f"{per_million(array_bytes):>13.0f}" if array_bytes is not None else f"{'-':>13}"
+        print(f"{name:<8} {per_million(resident):>10.0f} {arrays} {rec:>9.3f} {p50:>8.2f} {p95:>8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Throughput benchmark for yeest.xyz across gunicorn worker counts.
+
+Starts the backend with each requested worker count, fires a fixed number of
+concurrent requests at it and reports requests per second.
+
+Each request asks a distinct question (the base question plus a request
+number), since identical in-flight questions are coalesced into one pipeline
+run. Pass --identical-questions to measure the coalesced case instead.
+
+Usage:
+    python benchmarks/bench_workers.py --workers 1 2 4 --requests 64 --concurrency 16
+
+Point CHROMA_SERVER_HOST at a running Chroma server (``chroma run --path ./chroma_db``)
+and REDIS_URL at Redis so every worker shares the same state.
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+def start_server(workers: int, port: int) -> subprocess.Popen:
+    """Start gunicorn with the given number of workers."""
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), PORT=str(port))
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app.main:app"],
+        cwd=BACKEND_DIR,
+        env=env
+    )
+
+def wait_until_healthy(base_url: str, timeout: float = 300.0) -> None:
+    """Poll /health until the server answers."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/health", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(1)
+    raise RuntimeError(f"Server at {base_url} did not become healthy")
+
+def question_for(question: str, i: int, identical: bool) -> str:
+    """The question sent by request i."""
+    return question if identical else f"{question} (request {i})"
+
+async def run_load(
+    base_url: str,
+    path: str,
+    question: str,
+    total: int,
+    concurrency: int,
+    identical: bool = False
+) -> dict:
+    """Send `total` requests with at most `concurrency` in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=300) as client:
+        async def one(i: int) -> None:
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                if path == "/chat":
+                    response = await client.post(path, json={"question": question_for(question, i, identical), "session_id": f"bench-{i}"})
+                else:
+                    response = await client.get(path)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "throughput_rps": total / elapsed,
+        "p50_s": latencies[len(latencies) // 2],
+        "p95_s": latencies[int(len(latencies) * 0.95) - 1],
+        "errors": errors
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--path", default="/chat")
+    parser.add_argument("--question", default="What is artificial intelligence?")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument(
+        "--identical-questions", action="store_true",
+        help="Send the same question every time, so concurrent requests coalesce"
+    )
+    args = parser.parse_args()
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    print(f"{'workers':>8} {'req/s':>8} {'p50 s':>8} {'p95 s':>8} {'errors':>7}")
+    for workers in args.workers:
+        server = start_server(workers, args.port)
+        try:
+            wait_until_healthy(base_url)
+            stats = asyncio.run(run_load(
+                base_url, args.path, args.question, args.requests, args.concurrency, args.identical_questions
+            ))
+            print(
+                f"{workers:>8} {stats['throughput_rps']:>8.2f} {stats['p50_s']:>8.2f} "
+                f"{stats['p95_s']:>8.2f} {stats['errors']:>7}"
+            )
+        finally:
+            server.terminate()
+            server.wait()
+
+if __name__ == "__main__":
+    main()
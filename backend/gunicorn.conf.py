@@ -0,0 +1,36 @@
+"""Gunicorn configuration for running yeest.xyz with several uvicorn workers.
+
+Usage:
+    gunicorn -c gunicorn.conf.py app.main:app
+
+With WEB_CONCURRENCY > 1 and CHROMA_SERVER_HOST set, the app is imported once
+in the master before forking, so the embedding model weights are shared
+copy-on-write between workers instead of being loaded once per worker.
+"""
+
+import gc
+import os
+
+from app.config import config
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = config.WEB_CONCURRENCY
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+# Preloading imports the embedded Chroma client too, which must not be shared
+# across a fork, so only preload when the vector store lives in a server.
+preload_app = workers > 1 and bool(config.CHROMA_SERVER_HOST)
+
+def pre_fork(server, worker):
+    """Move preloaded objects out of the GC's reach so refcount-only pages stay shared."""
+    gc.freeze()
+
+def post_fork(server, worker):
+    """Split the cores between workers so torch threads don't oversubscribe."""
+    try:
+        import torch
+
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // max(1, workers)))
+    except ImportError:
+        pass
@@ -0,0 +1,97 @@
+"""Tests for request coalescing and admission control."""
+
+import asyncio
+import threading
+import time
+
+from app.admission import AdmissionController, Overloaded, coalesce_key
+
+def test_coalesce_key_normalizes_question():
+    """Test that case, whitespace and trailing punctuation don't split keys."""
+    assert coalesce_key("What is  AI?") == coalesce_key("what is ai")
+
+def test_identical_requests_share_one_execution():
+    """Test that concurrent identical requests run the pipeline once."""
+    controller = AdmissionController(max_concurrent=2, max_queued=4, queue_timeout=5)
+    calls = []
+    lock = threading.Lock()
+
+    def pipeline(question):
+        with lock:
+            calls.append(question)
+        time.sleep(0.1)
+        return f"answer to {question}"
+
+    async def scenario():
+        return await asyncio.gather(*(
+            controller.run("same", pipeline, "q") for _ in range(5)
+        ))
+
+    results = asyncio.run(scenario())
+    assert results == ["answer to q"] * 5
+    assert calls == ["q"]
+
+def test_full_queue_is_shed_with_429():
+    """Test that requests beyond the queue limit are rejected immediately."""
+    controller = AdmissionController(max_concurrent=1, max_queued=1, queue_timeout=5)
+
+    async def scenario():
+        return await asyncio.gather(
+            controller.run("a", time.sleep, 0.2),
+            controller.run("b", time.sleep, 0.2),
+            controller.run("c", time.sleep, 0.2),
+            return_exceptions=True
+        )
+
+    results = asyncio.run(scenario())
+    errors = [r for r in results if isinstance(r, Overloaded)]
+    assert len(errors) == 1
+    assert errors[0].status_code == 429
+
+def test_queue_deadline_is_shed_with_503():
+    """Test that a request waiting past the deadline is rejected."""
+    controller = AdmissionController(max_concurrent=1, max_queued=4, queue_timeout=0.05)
+
+    async def scenario():
+        return await asyncio.gather(
+            controller.run("a", time.sleep, 0.3),
+            controller.run("b", time.sleep, 0.3),
+            return_exceptions=True
+        )
+
+    results = asyncio.run(scenario())
+    assert results[0] is None
+    assert isinstance(results[1], Overloaded)
+    assert results[1].status_code == 503
+
+def test_timed_out_waiters_leave_no_permits_behind():
+    """Test that shedding queued requests on deadline doesn't leak pipeline slots."""
+    controller = AdmissionController(max_concurrent=2, max_queued=16, queue_timeout=0.02)
+
+    async def scenario():
+        results = await asyncio.gather(
+            *(controller.run(str(i), time.sleep, 0.05) for i in range(10)),
+            return_exceptions=True
+        )
+        # Every slot is free again, so two fresh requests run without queueing
+        assert not controller._active.locked()
+        await asyncio.gather(controller.run("x", time.sleep, 0), controller.run("y", time.sleep, 0))
+        return results
+
+    results = asyncio.run(scenario())
+    assert sum(isinstance(r, Overloaded) for r in results) == 8
+    assert controller.queued == 0
+
+def test_llm_slot_holds_a_shared_slot():
+    """Test that llm_slot takes and returns one of the thread semaphore's slots."""
+    controller = AdmissionController(max_llm_calls=1)
+
+    async def scenario():
+        async with controller.llm_slot():
+            assert not controller.llm_slots.acquire(blocking=False)
+            assert isinstance(controller.queued, int)
+        assert controller.llm_slots.acquire(blocking=False)
+        controller.llm_slots.release()
+
+    asyncio.run(scenario())
+    assert controller.queued == 0
@@ -0,0 +1,45 @@
+"""Tests for the process-pool indexing engine."""
+
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from app import indexing
+from app.indexing import _chunk_and_embed, _partition
+from app.records import DocumentRecord
+from app.utils import chunk_documents
+
+class FakeEmbeddings:
+    def embed_documents(self, texts):
+        return [[float(len(text)), 1.0] for text in texts]
+
+def test_partition_keeps_order_and_balances():
+    """Test that documents are split into contiguous runs of similar size."""
+    assert _partition([10, 10, 10, 10], 2) == [(0, 2), (2, 4)]
+    assert _partition([100, 1, 1], 3) == [(0, 1), (1, 2), (2, 3)]
+    assert _partition([5], 4) == [(0, 1)]
+
+def test_worker_matches_in_process_chunking(monkeypatch):
+    """Test that chunks read from shared memory match utils.chunk_documents."""
+    monkeypatch.setattr(indexing, "_worker_embeddings", FakeEmbeddings())
+    documents = [
+        DocumentRecord("Ünïcode text. " * 80, "wikipedia"),
+        DocumentRecord("Short one.", "news"),
+    ]
+    encoded = [d.text.encode("utf-8") for d in documents]
+    shm = shared_memory.SharedMemory(create=True, size=sum(len(e) for e in encoded))
+    try:
+        shm.buf[:len(encoded[0])] = encoded[0]
+        shm.buf[len(encoded[0]):len(encoded[0]) + len(encoded[1])] = encoded[1]
+        owners, offsets, vectors = _chunk_and_embed(
+            shm.name, [(0, len(encoded[0])), (len(encoded[0]), len(encoded[0]) + len(encoded[1]))]
+        )
+    finally:
+        shm.close()
+        shm.unlink()
+
+    expected = chunk_documents(documents)
+    assert [(documents[o], s, e) for o, (s, e) in zip(owners.tolist(), offsets.tolist())] == [
+        (c.parent, c.start, c.end) for c in expected
+    ]
+    assert np.array_equal(vectors[:, 0], [len(c.text) for c in expected])
@@ -0,0 +1,116 @@
+"""Tests for background ingestion cursors."""
+
+import sys
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from app.ingest import BackgroundIngestor, FreshnessIndex
+from app.records import DocumentRecord
+from app.retrievers.news import parse_published_at, retrieve_news_since
+from app.retrievers.reddit import retrieve_subreddit_new
+
+def news_doc(url):
+    return DocumentRecord(f"text of {url}", "news", url=url, extra={"published_at": "2024-05-01T10:00:00Z"})
+
+def test_published_at_with_fractional_seconds():
+    """Test that NewsAPI timestamps parse with or without fractions and offsets."""
+    assert parse_published_at("2024-05-01T10:00:00Z") == datetime(2024, 5, 1, 10, 0, 0)
+    assert parse_published_at("2024-05-01T10:00:00.123Z") == datetime(2024, 5, 1, 10, 0, 0, 123000)
+    assert parse_published_at("2024-05-01T12:00:00+02:00") == datetime(2024, 5, 1, 10, 0, 0)
+
+def test_news_keeps_pages_fetched_before_an_error():
+    """Test that a failing later page keeps the newest articles instead of discarding them."""
+    articles = [
+        {
+            "title": f"AI {i}", "description": "", "content": "text", "url": f"https://example.com/{i}",
+            "publishedAt": f"2024-05-01T{10 + i // 60:02d}:{i % 60:02d}:00Z", "source": {"name": "Example"},
+        }
+        for i in range(100)
+    ]
+
+    class Client:
+        def __init__(self, api_key):
+            pass
+
+        def get_everything(self, page, **kwargs):
+            if page == 1:
+                return {"status": "ok", "totalResults": 250, "articles": articles}
+            raise RuntimeError("maximumResultsReached")
+
+    with patch.dict(sys.modules, {"newsapi": SimpleNamespace(NewsApiClient=Client)}):
+        documents, newest = retrieve_news_since("ai", datetime(2024, 5, 1), max_pages=3)
+    assert len(documents) == 100
+    assert newest == datetime(2024, 5, 1, 11, 39)
+
+    class Down(Client):
+        def get_everything(self, page, **kwargs):
+            raise RuntimeError("upstream down")
+
+    with patch.dict(sys.modules, {"newsapi": SimpleNamespace(NewsApiClient=Down)}):
+        with pytest.raises(RuntimeError):
+            retrieve_news_since("ai", datetime(2024, 5, 1))
+
+def test_failed_poll_keeps_cursor_and_freshness(tmp_path):
+    """Test that only feeds that were polled and indexed move their cursor."""
+    freshness = FreshnessIndex(str(tmp_path / "state.json"))
+    freshness.set_cursor("news:ai", "2024-05-01T09:00:00.5Z")
+    ingestor = BackgroundIngestor(freshness)
+    polled = []
+
+    def fake_news(topic, since, max_pages):
+        polled.append(since)
+        if topic == "space":
+            raise ConnectionError("upstream down")
+        return [news_doc("https://example.com/ai")], datetime(2024, 5, 1, 10, 0, 0)
+
+    indexed = []
+    with patch("app.ingest.config.INGEST_TOPICS", ["ai", "space"]), \
+         patch("app.ingest.config.NEWSAPI_KEY", "key"), \
+         patch("app.ingest.config.INGEST_SUBREDDITS", []), \
+         patch("app.ingest.retrieve_news_since", side_effect=fake_news):
+        assert ingestor.run_once(indexed.extend) == 1
+
+    # The stored fractional cursor was readable
+    assert polled[0] == datetime(2024, 5, 1, 9, 0, 0, 500000)
+    assert freshness.get_cursor("news:ai") == "2024-05-01T10:00:00Z"
+    assert freshness.get_cursor("news:space") is None
+    assert "news" not in freshness._state["last_ingested"]
+
+def test_indexing_failure_commits_nothing(tmp_path):
+    """Test that cursors and seen URLs stay put when indexing raises."""
+    freshness = FreshnessIndex(str(tmp_path / "state.json"))
+    ingestor = BackgroundIngestor(freshness)
+
+    def fail(documents):
+        raise RuntimeError("index unavailable")
+
+    with patch("app.ingest.config.INGEST_TOPICS", ["ai"]), \
+         patch("app.ingest.config.NEWSAPI_KEY", "key"), \
+         patch("app.ingest.config.INGEST_SUBREDDITS", []), \
+         patch("app.ingest.retrieve_news_since", return_value=([news_doc("u")], datetime(2024, 5, 1))):
+        try:
+            ingestor.run_once(fail)
+        except RuntimeError:
+            pass
+
+    assert freshness.get_cursor("news:ai") is None
+    assert freshness.filter_unseen([news_doc("u")])
+
+def test_reddit_cursor_advances_past_link_posts():
+    """Test that the cursor is the newest post in the listing, even without selftext."""
+    def post(name, selftext):
+        return SimpleNamespace(
+            name=name, selftext=selftext, title=name, permalink=f"/r/x/{name}", score=1,
+            created_utc=0, subreddit=SimpleNamespace(display_name="x")
+        )
+
+    listing = [post("t3_c", ""), post("t3_b", "")]
+    reddit = SimpleNamespace(subreddit=lambda name: SimpleNamespace(new=lambda limit, params: iter(listing)))
+    with patch("app.retrievers.reddit._get_reddit", return_value=reddit):
+        docs, newest = retrieve_subreddit_new("x", before="t3_a", limit=100)
+
+    assert docs == []
+    assert newest == "t3_c"
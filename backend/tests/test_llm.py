@@ -0,0 +1,110 @@
+"""Tests for the tiered, hedged LLM client layer."""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import groq
+import httpx
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from app.llm import TieredChatModel, _tracker
+
+class FakeClient:
+    """Stands in for ChatGroq; each call takes the next (delay, error) step."""
+
+    def __init__(self, text, steps):
+        self.text = text
+        self.steps = list(steps)
+        self.calls = 0
+        self.timeouts = []
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.timeouts.append(kwargs.get("timeout"))
+        delay, error = self.steps[min(self.calls, len(self.steps) - 1)]
+        self.calls += 1
+        time.sleep(delay)
+        if error is not None:
+            raise error
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.text))])
+
+def rate_limit_error():
+    response = httpx.Response(429, request=httpx.Request("POST", "https://api.groq.com"))
+    return groq.RateLimitError("rate limited", response=response, body=None)
+
+def test_rate_limit_falls_back_to_next_tier():
+    """Test that a rate-limited primary model hands over to the fallback."""
+    clients = {
+        "primary": FakeClient("slow answer", [(0, rate_limit_error())]),
+        "fallback": FakeClient("fast answer", [(0, None)]),
+    }
+    with patch("app.llm.get_groq_client", side_effect=clients.get):
+        llm = TieredChatModel(model_names=["primary", "fallback"], deadline=1.0, hedge_percentile=0)
+        assert llm.invoke([HumanMessage(content="hi")]).content == "fast answer"
+
+def test_deadline_falls_back_to_next_tier():
+    """Test that a call exceeding its deadline moves on to the fallback."""
+    clients = {
+        "slow": FakeClient("late", [(0.5, None)]),
+        "fast": FakeClient("on time", [(0, None)]),
+    }
+    with patch("app.llm.get_groq_client", side_effect=clients.get):
+        llm = TieredChatModel(model_names=["slow", "fast"], deadline=0.1, hedge_percentile=0)
+        assert llm.invoke([HumanMessage(content="hi")]).content == "on time"
+
+def test_slow_call_is_hedged():
+    """Test that a duplicate request is sent once the latency percentile passes."""
+    client = FakeClient("answer", [(0.5, None), (0, None)])
+    for _ in range(50):
+        _tracker("hedged").record(0.05)
+
+    with patch("app.llm.get_groq_client", return_value=client):
+        llm = TieredChatModel(model_names=["hedged"], deadline=2.0, hedge_percentile=95)
+        start = time.monotonic()
+        assert llm.invoke([HumanMessage(content="hi")]).content == "answer"
+        assert time.monotonic() - start < 0.4
+        assert client.calls == 2
+
+def test_budget_caps_latency_across_tiers():
+    """Test that the fallback tier only gets what is left of the overall budget."""
+    clients = {
+        "slow": FakeClient("late", [(0.5, None)]),
+        "slower": FakeClient("later", [(0.5, None)]),
+    }
+    with patch("app.llm.get_groq_client", side_effect=clients.get):
+        llm = TieredChatModel(model_names=["slow", "slower"], deadline=0.2, budget=0.3, hedge_percentile=0)
+        start = time.monotonic()
+        with pytest.raises(TimeoutError):
+            llm.invoke([HumanMessage(content="hi")])
+        assert time.monotonic() - start < 0.4
+    # Each request's own timeout ends with its tier's share of the budget
+    assert clients["slow"].timeouts[0] <= 0.2
+    assert clients["slower"].timeouts[0] <= 0.1 + 0.01
+
+def test_attempt_timeout_starts_when_a_thread_picks_it_up():
+    """Test that time spent queued for a pool thread comes out of the request timeout."""
+    client = FakeClient("answer", [(0, None)])
+    pool = ThreadPoolExecutor(max_workers=1)
+    with patch("app.llm.get_groq_client", return_value=client), patch("app.llm._executor", pool):
+        busy = pool.submit(time.sleep, 0.15)
+        llm = TieredChatModel(model_names=["queued"], deadline=1.0, hedge_percentile=0)
+        assert llm.invoke([HumanMessage(content="hi")]).content == "answer"
+        busy.result()
+        assert client.timeouts[0] < 0.9
+
+        # An attempt whose deadline passes while it waits for a thread never calls the API
+        busy = pool.submit(time.sleep, 0.3)
+        late = TieredChatModel(model_names=["queued"], deadline=0.1, budget=0.5, hedge_percentile=0)
+        with pytest.raises(TimeoutError):
+            late.invoke([HumanMessage(content="hi")])
+        busy.result()
+        time.sleep(0.05)
+        assert client.calls == 1
+    pool.shutdown()
+
+def test_tiers_are_required():
+    """Test that a model without tiers is rejected at construction."""
+    with pytest.raises(ValueError):
+        TieredChatModel(model_names=[])
@@ -1,5 +1,6 @@
 """Tests for the main FastAPI application."""
 
+import json
 import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import patch, MagicMock
@@ -92,5 +93,62 @@ def test_chat_endpoint_with_history():
         # Verify memory was loaded
         mock_memory.load_from_history.assert_called_once()
 
+def test_chat_endpoint_with_session():
+    """Test that a session_id routes the turn to that session's memory."""
+    with patch('app.main.rag_system') as mock_rag, \
+         patch('app.main.memory_manager') as mock_memory, \
+         patch('app.main.get_session_memory') as mock_get_session:
+        
+        mock_rag_chain = MagicMock()
+        mock_rag_chain.return_value = {
+            "result": "Session answer",
+            "source_documents": []
+        }
+        mock_rag.get_rag_chain.return_value = mock_rag_chain
+        mock_rag.fetch_and_index_documents.return_value = []
+        session_memory = MagicMock()
+        mock_get_session.return_value = session_memory
+        
+        response = client.post("/chat", json={"question": "What is AI?", "session_id": "abc"})
+        assert response.status_code == 200
+        
+        mock_get_session.assert_called_once_with("abc")
+        session_memory.add_message.assert_called_once_with("What is AI?", "Session answer")
+        mock_memory.add_message.assert_not_called()
+
+def test_chat_batch_endpoint_streams_ndjson():
+    """Test that batch answers stream back as one JSON line per question."""
+    from langchain.schema import Document
+    from app.rag import BatchAnswer
+
+    async def fake_answers(questions, contexts):
+        for i in reversed(range(len(questions))):
+            yield BatchAnswer(i, questions[i], f"answer {i}", contexts[i])
+
+    with patch('app.main.rag_system') as mock_rag:
+        context = [Document(page_content="Context", metadata={"source": "wikipedia", "title": "AI"})]
+        mock_rag.retrieve_batch.return_value = [context, context]
+        mock_rag.generate_answers = fake_answers
+
+        response = client.post("/chat/batch", json={"questions": ["What is AI?", "What is ML?"]})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["index"] for line in lines] == [1, 0]
+        assert lines[1]["answer"] == "answer 0"
+        assert lines[1]["sources"][0]["metadata"]["source"] == "wikipedia"
+
+def test_chat_batch_endpoint_rejects_empty_batch():
+    """Test that an empty batch is rejected."""
+    response = client.post("/chat/batch", json={"questions": []})
+    assert response.status_code == 400
+
+def test_chat_batch_endpoint_rejects_bad_k():
+    """Test that k below 1 is a validation error rather than a default or a huge prompt."""
+    for k in (0, -3):
+        response = client.post("/chat/batch", json={"questions": ["What is AI?"], "k": k})
+        assert response.status_code == 422
+
 if __name__ == "__main__":
     pytest.main([__file__])
@@ -0,0 +1,40 @@
+"""Tests for per-session memory."""
+
+from unittest.mock import MagicMock, patch
+
+from app import memory
+from app.admission import admission
+
+def test_local_sessions_are_capped_and_expire():
+    """Test that in-process sessions are evicted by recency and by idle time."""
+    with patch.object(memory, "ChatMemoryManager", side_effect=lambda session_id: object()), \
+         patch.object(memory.config, "REDIS_URL", None), \
+         patch.object(memory.config, "MAX_LOCAL_SESSIONS", 2), \
+         patch.object(memory.config, "SESSION_TTL_SECONDS", 60), \
+         patch.object(memory, "_local_sessions", memory.OrderedDict()), \
+         patch.object(memory.time, "monotonic", return_value=0.0) as clock:
+        first = memory.get_session_memory("a")
+        memory.get_session_memory("b")
+        assert memory.get_session_memory("a") is first
+        memory.get_session_memory("c")
+        assert list(memory._local_sessions) == ["a", "c"]
+
+        clock.return_value = 120.0
+        assert memory.get_session_memory("a") is not first
+        assert list(memory._local_sessions) == ["a"]
+
+def test_summary_calls_take_an_llm_slot():
+    """Test that summarizing a turn holds one of the shared LLM slots."""
+    manager = memory.ChatMemoryManager.__new__(memory.ChatMemoryManager)
+    manager.buffer_memory = MagicMock()
+    manager.summary_memory = MagicMock()
+    manager._redis = None
+    free_during_call = []
+    manager.summary_memory.save_context.side_effect = (
+        lambda *args: free_during_call.append(admission.llm_slots._value)
+    )
+
+    before = admission.llm_slots._value
+    manager.add_message("What is AI?", "Artificial intelligence.")
+    assert free_during_call == [before - 1]
+    assert admission.llm_slots._value == before
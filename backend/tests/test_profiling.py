@@ -0,0 +1,104 @@
+"""Tests for the per-request sampling profiler."""
+
+import asyncio
+import threading
+import time
+
+from app.admission import AdmissionController
+from app.profiling import Profiler, ProfilingMiddleware, _current, profiled, to_speedscope
+
+def busy_retrieval(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(1000))
+
+def test_profile_records_attached_thread_only(tmp_path):
+    """Test that samples come from threads working on the request, not bystanders."""
+    profiler = Profiler(directory=str(tmp_path))
+    profile = profiler.start("POST", "/chat")
+    stop = threading.Event()
+    bystander = threading.Thread(target=lambda: stop.wait(), name="bystander")
+    bystander.start()
+
+    def worker():
+        token = _current.set(profile)
+        try:
+            profiled(busy_retrieval)(0.2)
+        finally:
+            _current.reset(token)
+
+    thread = threading.Thread(target=worker, name="pipeline")
+    thread.start()
+    thread.join()
+    stop.set()
+    bystander.join()
+    profiler.finish(profile)
+
+    assert profile.samples > 0
+    assert all(stack.startswith("thread pipeline;") for stack in profile.stacks)
+    assert any("busy_retrieval (test_profiling.py" in stack for stack in profile.stacks)
+    assert [meta["id"] for meta in profiler.list_profiles()] == [profile.id]
+    assert profiler.collapsed_path(profile.id) is not None
+    assert profiler.collapsed_path("../etc") is None
+
+def test_coalesced_request_points_to_the_profile_that_ran_it(tmp_path):
+    """Test that the worker thread, not the loop, is sampled and joiners link to its profile."""
+    profiler = Profiler(directory=str(tmp_path))
+    controller = AdmissionController(max_concurrent=2, max_queued=4, queue_timeout=5)
+
+    async def request():
+        profile = profiler.start("POST", "/chat")
+        token = _current.set(profile)
+        try:
+            await controller.run("same", profiled(busy_retrieval), 0.2)
+        finally:
+            _current.reset(token)
+        profiler.finish(profile)
+        return profile
+
+    async def joining():
+        await asyncio.sleep(0.05)
+        return await request()
+
+    async def scenario():
+        return await asyncio.gather(request(), joining())
+
+    owner, joiner = asyncio.run(scenario())
+    assert owner.samples > 0 and owner.metadata()["coalesced_into"] is None
+    assert not any(stack.startswith("thread MainThread;") for stack in owner.stacks)
+    assert joiner.samples == 0
+    assert joiner.metadata()["coalesced_into"] == owner.id
+    assert owner.id in joiner.metadata()["note"]
+
+def test_middleware_does_not_sample_the_event_loop(tmp_path, monkeypatch):
+    """Test that a request busy only on the event loop thread records no samples."""
+    from app import profiling
+
+    recorder = Profiler(directory=str(tmp_path), sample_rate=1.0)
+    monkeypatch.setattr(profiling, "profiler", recorder)
+
+    async def app(scope, receive, send):
+        busy_retrieval(0.1)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "path": "/chat", "method": "POST", "headers": []}
+    asyncio.run(ProfilingMiddleware(app)(scope, None, send))
+    [meta] = recorder.list_profiles()
+    assert meta["status"] == 200 and meta["samples"] == 0
+
+def test_profiled_is_passthrough_without_profile():
+    """Test that decorated functions run untouched when nothing is being profiled."""
+    assert profiled(lambda x: x * 2)(21) == 42
+
+def test_to_speedscope():
+    """Test conversion of collapsed stacks into a speedscope sampled profile."""
+    result = to_speedscope("main;fetch;get 3\nmain;embed 1\n", "abc", 5)
+    assert [frame["name"] for frame in result["shared"]["frames"]] == ["main", "fetch", "get", "embed"]
+    profile = result["profiles"][0]
+    assert profile["samples"] == [[0, 1, 2], [0, 3]]
+    assert profile["weights"] == [15, 5]
+    assert profile["endValue"] == 20
@@ -0,0 +1,79 @@
+"""Tests for the quantized vector index."""
+
+import numpy as np
+
+from app.quantized_store import QuantizedVectorIndex, quantize_int8
+
+def normalized(rng, count, dim=32):
+    vectors = rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def test_quantize_int8_round_trip():
+    """Test that dequantized vectors stay close to the originals."""
+    vectors = normalized(np.random.default_rng(0), 10)
+    codes, scales = quantize_int8(vectors)
+    assert codes.dtype == np.int8
+    assert np.abs(codes * scales[:, None] - vectors).max() < 0.01
+
+def test_search_matches_exact_and_survives_reload(tmp_path):
+    """Test that two-stage search finds the exact top hits, also after reopening."""
+    rng = np.random.default_rng(1)
+    vectors = normalized(rng, 500)
+    index = QuantizedVectorIndex(str(tmp_path))
+    index.add([f"chunk {i}" for i in range(500)], vectors, [{"source": "wikipedia"} for _ in range(500)])
+
+    query = vectors[42]
+    exact = list(np.argsort(-(vectors @ query))[:5])
+    assert [row for row, _ in index.search(query, 5)] == exact
+
+    reopened = QuantizedVectorIndex(str(tmp_path))
+    assert len(reopened) == 500
+    assert [row for row, _ in reopened.search(query, 5)] == exact
+    assert reopened.record(42) == ("chunk 42", {"source": "wikipedia"})
+
+def test_search_filters_by_source(tmp_path):
+    """Test that a source filter only returns rows from that source."""
+    rng = np.random.default_rng(2)
+    vectors = normalized(rng, 20)
+    metadatas = [{"source": "news" if i % 2 else "reddit"} for i in range(20)]
+    index = QuantizedVectorIndex(str(tmp_path))
+    index.add([str(i) for i in range(20)], vectors, metadatas)
+
+    rows = [row for row, _ in index.search(vectors[0], 5, filter={"source": "news"})]
+    assert len(rows) == 5
+    assert all(row % 2 == 1 for row in rows)
+    assert index.search(vectors[0], 5, filter={"source": "wikipedia"}) == []
+
+def test_adds_grow_capacity_geometrically(tmp_path):
+    """Test that small adds fill preallocated space instead of reallocating every time."""
+    rng = np.random.default_rng(3)
+    vectors = normalized(rng, 300)
+    index = QuantizedVectorIndex(str(tmp_path))
+
+    buffers = set()
+    for i in range(300):
+        index.add([str(i)], vectors[i:i + 1], [{"source": "news"}])
+        buffers.add(id(index._codes))
+    assert len(buffers) == 1
+    assert len(index) == 300 and index.codes.shape == (300, 32)
+
+    snapshot = index.codes
+    index.add(["x"] * 2000, normalized(rng, 2000), [{"source": "news"}] * 2000)
+    assert len(snapshot) == 300
+    assert index.search(vectors[7], 1)[0][0] == 7
+    assert index.nbytes >= index.codes.nbytes + index.scales.nbytes
+
+def test_known_ids_are_skipped_after_reload(tmp_path):
+    """Test that re-adding stable passage IDs after a restart doesn't duplicate rows."""
+    rng = np.random.default_rng(4)
+    vectors = normalized(rng, 3)
+    metadatas = [{"source": "wikipedia", "id": f"wiki:{i}"} for i in range(3)]
+    index = QuantizedVectorIndex(str(tmp_path))
+    index.add(["a", "b", "a"], vectors[[0, 1, 0]], [metadatas[0], metadatas[1], metadatas[0]])
+    assert len(index) == 2
+
+    reopened = QuantizedVectorIndex(str(tmp_path))
+    reopened.add(["a", "b", "c"], vectors, metadatas)
+    assert len(reopened) == 3
+    assert [row for row, _ in reopened.search(vectors[2], 3)][0] == 2
+    assert reopened.record(2)[0] == "c"
@@ -0,0 +1,28 @@
+"""Tests for batch retrieval in the RAG system."""
+
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from app.rag import RAGSystem
+from app.records import ChunkRecord, DocumentRecord
+
+def test_retrieve_batch_shares_fetches_and_ranks_by_similarity():
+    """Test that repeated questions fetch once and each question gets its closest chunks."""
+    shared = DocumentRecord("Apples are red. Bananas are yellow.", "wikipedia", url="https://example.org/fruit")
+    chunks = [ChunkRecord(shared, 0, 15), ChunkRecord(shared, 16, 35)]
+
+    rag = RAGSystem.__new__(RAGSystem)
+    rag.fetch_documents = MagicMock(return_value=[shared])
+    rag.index_documents = MagicMock(return_value=(chunks, np.eye(2, dtype=np.float32)))
+    rag.embeddings = MagicMock()
+    rag.embeddings.embed_query.side_effect = [[0.1, 0.9], [0.8, 0.2]]
+
+    contexts = rag.retrieve_batch(["Which fruit is yellow?", "Which fruit is red?", "which fruit is yellow"], k=1)
+
+    assert rag.fetch_documents.call_count == 2
+    # The document came back for both questions but is indexed once
+    assert rag.index_documents.call_args[0][0] == [shared]
+    # Questions are embedded as queries, keeping them out of the document cache
+    assert not rag.embeddings.embed_documents.called
+    assert [ctx[0].page_content for ctx in contexts] == ["Bananas are yellow.", "Apples are red.", "Bananas are yellow."]
@@ -0,0 +1,166 @@
+"""Tests for index snapshots and the embedding cache."""
+
+import fcntl
+import os
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from app import snapshot as snapshot_module
+from app.config import config
+from app.embedding_cache import CachedEmbeddings, EmbeddingCache, text_key
+from app.snapshot import SnapshotError, export_snapshot, import_at_startup, import_snapshot, verify_snapshot
+
+def make_targets(root):
+    vectors = root / "index"
+    (vectors / "quantized").mkdir(parents=True)
+    (vectors / "quantized" / "codes.i8").write_bytes(bytes(range(256)) * 40)
+    (vectors / "ingest_state.json").write_text('{"cursors": {"news:ai": "2024-01-01"}}')
+    return {
+        "vector_index": str(vectors),
+        "embedding_cache": None,
+        "retrieval_state": str(vectors / "ingest_state.json"),
+    }
+
+def test_export_import_round_trip(tmp_path):
+    """Test that an imported snapshot reproduces every part, once."""
+    source = make_targets(tmp_path / "source")
+    snapshot = str(tmp_path / "snapshot.yeest")
+    manifest = export_snapshot(snapshot, source)
+    assert {p["group"] for p in manifest["parts"]} == {"vector_index", "retrieval_state"}
+    assert all(p["offset"] % 4096 == 0 for p in manifest["parts"])
+
+    dest = tmp_path / "dest"
+    targets = {
+        "vector_index": str(dest / "index"),
+        "embedding_cache": None,
+        "retrieval_state": str(dest / "index" / "ingest_state.json"),
+    }
+    assert import_snapshot(snapshot, targets)
+    assert (dest / "index" / "quantized" / "codes.i8").read_bytes() == bytes(range(256)) * 40
+    assert "news:ai" in (dest / "index" / "ingest_state.json").read_text()
+    # The same snapshot isn't imported over the index twice
+    assert not import_snapshot(snapshot, targets)
+
+def test_import_swaps_contents_of_existing_directory(tmp_path):
+    """Test that the vector directory itself stays in place, as a mount point would."""
+    snapshot = str(tmp_path / "snapshot.yeest")
+    export_snapshot(snapshot, make_targets(tmp_path / "source"))
+
+    root = tmp_path / "mounted"
+    root.mkdir()
+    (root / "stale.bin").write_bytes(b"old")
+    inode = os.stat(root).st_ino
+    targets = {"vector_index": str(root), "embedding_cache": None, "retrieval_state": str(root / "ingest_state.json")}
+
+    with ThreadPoolExecutor(4) as pool:
+        imported = list(pool.map(lambda _: import_snapshot(snapshot, targets), range(4)))
+    assert imported.count(True) == 1
+    assert os.stat(root).st_ino == inode
+    assert not (root / "stale.bin").exists()
+    assert (root / "quantized" / "codes.i8").exists()
+    assert sorted(os.listdir(root)) == [".snapshot", ".snapshot.lock", "ingest_state.json", "quantized"]
+
+def test_startup_import_failure_is_logged_not_raised(tmp_path, monkeypatch):
+    """Test that an unwritable vector directory doesn't stop the app from starting."""
+    snapshot = str(tmp_path / "snapshot.yeest")
+    export_snapshot(snapshot, make_targets(tmp_path / "source"))
+    monkeypatch.setattr(config, "SNAPSHOT_PATH", snapshot)
+    monkeypatch.setattr(config, "CHROMA_SERVER_HOST", None)
+
+    def unwritable(*args, **kwargs):
+        raise PermissionError(13, "Permission denied")
+
+    monkeypatch.setattr(snapshot_module, "import_snapshot", unwritable)
+    import_at_startup()
+
+def test_export_holds_lock_only_while_copying(tmp_path):
+    """Test that the snapshot is written from copies after the index lock is released."""
+    targets = make_targets(tmp_path / "source")
+    lock = threading.Lock()
+    held = []
+
+    class RecordingLock:
+        def __enter__(self):
+            lock.acquire()
+
+        def __exit__(self, *exc):
+            lock.release()
+
+    real_write = snapshot_module._write_snapshot
+
+    def write(out_path, files):
+        held.append(lock.locked())
+        return real_write(out_path, files)
+
+    snapshot = str(tmp_path / "snapshot.yeest")
+    snapshot_module._write_snapshot = write
+    try:
+        export_snapshot(snapshot, targets, lock=RecordingLock())
+    finally:
+        snapshot_module._write_snapshot = real_write
+    assert held == [False]
+    verify_snapshot(snapshot)
+
+def test_corrupt_snapshot_is_rejected(tmp_path):
+    """Test that a flipped byte in a part fails verification."""
+    snapshot = tmp_path / "snapshot.yeest"
+    manifest = export_snapshot(str(snapshot), make_targets(tmp_path))
+    data = bytearray(snapshot.read_bytes())
+    data[manifest["parts"][0]["offset"]] ^= 0xFF
+    snapshot.write_bytes(bytes(data))
+
+    with pytest.raises(SnapshotError, match="Checksum mismatch"):
+        verify_snapshot(str(snapshot))
+
+def test_embedding_cache_only_embeds_new_texts(tmp_path):
+    """Test that cached texts skip the model, also after reopening the cache."""
+    class CountingModel:
+        calls = []
+
+        def embed_documents(self, texts):
+            self.calls.append(list(texts))
+            return [[float(len(t)), 1.0, 0.0] for t in texts]
+
+    path = str(tmp_path / "embeddings.cache")
+    model = CountingModel()
+    embeddings = CachedEmbeddings(model, EmbeddingCache(path))
+    assert embeddings.embed_documents(["a", "bb"]) == [[1.0, 1.0, 0.0], [2.0, 1.0, 0.0]]
+
+    reopened = CachedEmbeddings(model, EmbeddingCache(path))
+    vectors = reopened.embed_documents(["bb", "ccc"])
+    assert np.allclose(vectors, [[2.0, 1.0, 0.0], [3.0, 1.0, 0.0]])
+    assert model.calls == [["a", "bb"], ["ccc"]]
+
+def test_embedding_cache_append_after_another_writer(tmp_path):
+    """Test that a writer waiting on the file lock appends after what others wrote meanwhile."""
+    path = str(tmp_path / "embeddings.cache")
+    cache = EmbeddingCache(path)
+    other_texts = [f"other {i}" for i in range(5)]
+    records = np.empty(5, dtype=[("key", "S20"), ("vector", "<f4", (4,))])
+    records["key"] = [text_key(text) for text in other_texts]
+    records["vector"] = np.arange(20, dtype=np.float32).reshape(5, 4)
+
+    with open(path, 'ab') as other:
+        # Another process holds the lock while this cache opens the file and waits for it
+        fcntl.flock(other, fcntl.LOCK_EX)
+        writer = threading.Thread(
+            target=cache.put_many, args=(["mine"], np.array([[9.0, 9.0, 9.0, 9.0]], dtype=np.float32))
+        )
+        writer.start()
+        time.sleep(0.2)
+        other.write(struct.pack("<4sI", b"YEC1", 4) + records.tobytes())
+        other.flush()
+        fcntl.flock(other, fcntl.LOCK_UN)
+    writer.join()
+
+    assert np.array_equal(cache.get_many(["mine"])[0], [9.0, 9.0, 9.0, 9.0])
+    reopened = EmbeddingCache(path)
+    assert np.array_equal(reopened.get_many(["mine"])[0], [9.0, 9.0, 9.0, 9.0])
+    assert np.array_equal(np.array(reopened.get_many(other_texts)), records["vector"])
+    with open(path, 'rb') as f:
+        assert b"YEC1" not in f.read()[4:]
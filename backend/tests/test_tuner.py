@@ -0,0 +1,71 @@
+"""Tests for the chunking and retrieval auto-tuner."""
+
+import json
+import zlib
+
+import numpy as np
+
+from app.eval_runner import EvaluationRunner
+from app.records import DocumentRecord
+from app.tuner import UpstreamCache, as_env, pareto_front, recommend, sweep
+from app.utils import maximal_marginal_relevance
+
+class HashEmbeddings:
+    """Deterministic bag-of-words vectors, normalized like the real model."""
+
+    def embed_documents(self, texts):
+        vectors = np.zeros((len(texts), 64), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[i, zlib.crc32(word.strip(".?,").encode()) % 64] += 1
+        return (vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-9)).tolist()
+
+def result(quality, tokens, index_seconds=1.0, **settings):
+    return dict(
+        settings, context_rougeL=quality, prompt_tokens=tokens, index_seconds=index_seconds,
+        search_ms=0.1, index_mb=1.0
+    )
+
+def test_pareto_front_and_recommendation():
+    """Test that dominated configs drop out and the cheapest near-best one is picked."""
+    best = result(0.80, 900, chunk_size=1000, chunk_overlap=100, k=8, search_type="similarity", store="float32")
+    cheaper = result(0.795, 400, chunk_size=500, chunk_overlap=50, k=5, search_type="mmr", store="int8")
+    dominated = result(0.70, 950, chunk_size=250, chunk_overlap=0, k=8, search_type="similarity", store="float32")
+
+    front = pareto_front([best, cheaper, dominated])
+    assert dominated not in front
+    assert recommend(front, tolerance=0.01) is cheaper
+    assert recommend(front, tolerance=0.0) is best
+    assert as_env(cheaper) == {
+        "CHUNK_SIZE": "500", "CHUNK_OVERLAP": "50", "RAG_K": "5",
+        "RAG_SEARCH_TYPE": "mmr", "VECTOR_STORE_BACKEND": "quantized",
+    }
+
+def test_maximal_marginal_relevance_skips_duplicates():
+    """Test that MMR prefers a diverse second pick over a near-duplicate."""
+    query = np.array([1.0, 0.0], dtype=np.float32)
+    candidates = np.array([[1.0, 0.0], [0.999, 0.045], [0.8, 0.6]], dtype=np.float32)
+    assert maximal_marginal_relevance(query, candidates, 2, lambda_mult=0.3) == [0, 2]
+
+def test_sweep_runs_offline_from_cache(tmp_path):
+    """Test a small sweep over cached documents without network or LLM."""
+    dataset = tmp_path / "eval.jsonl"
+    dataset.write_text(json.dumps({
+        "query": "Who invented the printing press?",
+        "reference_answer": "Johannes Gutenberg invented the printing press.",
+    }) + "\n")
+    cache = UpstreamCache(str(tmp_path / "cache.json"))
+    cache.set_documents("Who invented the printing press?", [
+        DocumentRecord("Johannes Gutenberg invented the printing press around 1440. " * 5, "wikipedia", url="a"),
+        DocumentRecord("Bananas grow in tropical climates and are rich in potassium. " * 5, "wikipedia", url="b"),
+    ])
+
+    grid = {"chunk_size": [100, 200], "chunk_overlap": [0], "k": [1], "search_type": ["similarity", "mmr"], "store": ["float32", "int8"]}
+    results = sweep(EvaluationRunner(str(dataset)), cache, grid, embedding_model=HashEmbeddings())
+
+    assert len(results) == 8
+    assert all(r["context_rougeL"] > 0.5 for r in results)
+    assert {r["store"] for r in results} == {"float32", "int8"}
+    small = [r for r in results if r["chunk_size"] == 100]
+    large = [r for r in results if r["chunk_size"] == 200]
+    assert small[0]["chunks"] > large[0]["chunks"]
@@ -0,0 +1,141 @@
+"""Tests for the offline Wikipedia corpus: reading dumps, building and searching the index."""
+
+import json
+import os
+import zlib
+
+import numpy as np
+import pytest
+
+from app import wiki_corpus
+from app.wiki_corpus import LocalWikiIndex, build_index, iter_articles, strip_wikitext
+
+DUMP = """<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.10/">
+  <page>
+    <title>Printing press</title>
+    <ns>0</ns>
+    <revision><text>{{Infobox|name=x}}A '''printing press''' applies [[pressure|pressure]] to [[ink]].&lt;ref&gt;cite&lt;/ref&gt;
+== History ==
+Invented by [[Johannes Gutenberg]].</text></revision>
+  </page>
+  <page>
+    <title>Press</title>
+    <ns>0</ns>
+    <redirect title="Printing press" />
+    <revision><text>#REDIRECT [[Printing press]]</text></revision>
+  </page>
+  <page>
+    <title>Talk:Printing press</title>
+    <ns>1</ns>
+    <revision><text>Discussion</text></revision>
+  </page>
+</mediawiki>
+"""
+
+def test_strip_wikitext():
+    """Test that markup is reduced to prose."""
+    text = "{{Infobox|a={{nested}}}}'''Bold''' [[Target|label]] and [[Plain]].<ref name=x>c</ref>\n== Heading =="
+    assert strip_wikitext(text) == "Bold label and Plain.\nHeading"
+
+def test_iter_articles_skips_redirects_and_other_namespaces(tmp_path):
+    """Test that only main-namespace, non-redirect pages are read."""
+    dump = tmp_path / "dump.xml"
+    dump.write_text(DUMP, encoding="utf-8")
+
+    articles = list(iter_articles(str(dump)))
+    assert len(articles) == 1
+    title, url, text = articles[0]
+    assert title == "Printing press"
+    assert url == "https://en.wikipedia.org/wiki/Printing_press"
+    assert text == "A printing press applies pressure to ink.\nHistory\nInvented by Johannes Gutenberg."
+
+class HashEmbeddings:
+    """Deterministic bag-of-words vectors, normalized like the real model."""
+
+    def embed_documents(self, texts):
+        vectors = np.zeros((len(texts), 64), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[i, zlib.crc32(word.strip(".?,").encode()) % 64] += 1
+        return (vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-9)).tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+def write_jsonl(path, articles):
+    path.write_text("".join(json.dumps({"title": t, "text": text}) + "\n" for t, text in articles.items()))
+    return str(path)
+
+def query(text):
+    return np.asarray(HashEmbeddings().embed_query(text), dtype=np.float32)
+
+ARTICLES = {
+    "Printing press": "Johannes Gutenberg built the printing press with movable metal type.",
+    "Banana": "Bananas grow in tropical climates and are rich in potassium.",
+    "Volcano": "A volcano erupts molten lava, ash and gases from the mantle.",
+}
+
+@pytest.fixture(autouse=True)
+def in_process_embeddings(monkeypatch):
+    monkeypatch.setattr(wiki_corpus, "_worker_embeddings", HashEmbeddings())
+
+def test_incremental_build_skips_unchanged_and_tombstones_removed(tmp_path):
+    """Test that a refreshed source only re-embeds changes and hides removed articles."""
+    out = str(tmp_path / "corpus")
+    stats = build_index(write_jsonl(tmp_path / "v1.jsonl", ARTICLES), out, workers=0)
+    assert (stats["added"], stats["unchanged"]) == (3, 0)
+
+    refreshed = {
+        "Printing press": ARTICLES["Printing press"],
+        "Banana": "Bananas are berries and plantains are cooked bananas.",
+    }
+    stats = build_index(write_jsonl(tmp_path / "v2.jsonl", refreshed), out, workers=0)
+    assert (stats["added"], stats["updated"], stats["unchanged"], stats["removed"]) == (0, 1, 1, 1)
+
+    index = LocalWikiIndex(out)
+    assert {hit.title for hit in index.search(query("volcano lava ash"), 10)} == {"Printing press", "Banana"}
+    assert "potassium" not in " ".join(hit.text for hit in index.search(query("bananas potassium"), 10))
+
+def test_interrupted_build_resumes_from_last_batch(tmp_path, monkeypatch):
+    """Test that rows written after the last committed batch are discarded and redone."""
+    out = str(tmp_path / "corpus")
+    source = write_jsonl(tmp_path / "v1.jsonl", ARTICLES)
+    embed = wiki_corpus._embed_articles
+    calls = []
+
+    def fail_on_second_batch(batch):
+        calls.append(batch)
+        if len(calls) == 2:
+            # A torn write from the batch that never committed
+            with open(os.path.join(out, wiki_corpus.VECTORS), 'ab') as f:
+                f.write(b"\0" * 100)
+            raise KeyboardInterrupt
+        return embed(batch)
+
+    monkeypatch.setattr(wiki_corpus, "_embed_articles", fail_on_second_batch)
+    with pytest.raises(KeyboardInterrupt):
+        build_index(source, out, workers=0, batch_articles=1)
+    monkeypatch.setattr(wiki_corpus, "_embed_articles", embed)
+
+    stats = build_index(source, out, workers=0, batch_articles=1)
+    assert (stats["added"], stats["unchanged"]) == (2, 1)
+    index = LocalWikiIndex(out)
+    assert os.path.getsize(os.path.join(out, wiki_corpus.VECTORS)) == index.vectors.nbytes
+    assert index.search(query("Gutenberg printing press"), 1)[0].title == "Printing press"
+
+def test_search_through_inverted_file_matches_full_scan(tmp_path, monkeypatch):
+    """Test that clustered search finds the same best hits and returns stored vectors."""
+    monkeypatch.setattr(wiki_corpus, "IVF_MIN_ROWS", 1)
+    out = str(tmp_path / "corpus")
+    articles = {f"Article {i}": f"topic{i % 7} word{i} filler{i % 3}" for i in range(60)}
+    build_index(write_jsonl(tmp_path / "many.jsonl", articles), out, workers=0)
+
+    clustered = LocalWikiIndex(out, nprobe=1000)
+    assert clustered.centroids is not None
+    full = LocalWikiIndex(out)
+    full.centroids = None
+
+    q = query("topic3 word10 filler1")
+    assert [h.row for h in clustered.search(q, 5)] == [h.row for h in full.search(q, 5)]
+    best = clustered.search(q, 1)[0]
+    assert np.allclose(clustered.vector(best.row) @ q, best.score)
@@ -0,0 +1,66 @@
+"""Tests for follow-up-aware retrieval reuse."""
+
+import numpy as np
+
+from app.records import ChunkRecord, DocumentRecord
+from app.working_set import WorkingSet, expand_follow_up
+
+def unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+def make_chunks(text, count):
+    parent = DocumentRecord(text=text * count, source="wikipedia", title="Paris")
+    return [ChunkRecord(parent, i * len(text), (i + 1) * len(text)) for i in range(count)]
+
+def test_expand_follow_up_uses_previous_question():
+    """Test that pronoun follow-ups are expanded and standalone questions are not."""
+    previous = "What is the capital of France?"
+    assert expand_follow_up("and what about its population?", previous) == f"{previous} and what about its population?"
+    assert expand_follow_up("Who wrote Hamlet?", previous) == "Who wrote Hamlet?"
+    assert expand_follow_up("and its population?", None) == "and its population?"
+    assert expand_follow_up("When was he born?", "Who discovered penicillin?") == "Who discovered penicillin? When was he born?"
+
+def test_expand_follow_up_leaves_standalone_questions_alone():
+    """Test that questions naming their own subject aren't rewritten."""
+    previous = "What is the capital of France?"
+    for question in (
+        "Why is the sky blue?",
+        "Is there life on Mars?",
+        "What is this thing called love?",
+        "How does Bitcoin work and who controls it?",
+    ):
+        assert expand_follow_up(question, previous) == question
+
+def test_working_set_covers_related_follow_up():
+    """Test that a follow-up close to the last turn's chunks is covered."""
+    working_set = WorkingSet(max_turns=2)
+    chunks = make_chunks("Paris facts. ", 3)
+    working_set.add(chunks, np.vstack([unit(1, 0.1, 0), unit(1, 0, 0.1), unit(0, 1, 0)]))
+
+    hits = working_set.search(unit(1, 0, 0), k=2)
+    assert [doc.page_content for doc, _ in hits] == [chunk.text for chunk in chunks[:2]]
+    assert hits[0][0].metadata["title"] == "Paris"
+    assert working_set.covers(hits)
+
+    unrelated = working_set.search(unit(0, 0, 1), k=2)
+    assert not working_set.covers(unrelated)
+
+def test_working_set_keeps_only_recent_turns():
+    """Test that the oldest turn is dropped once the turn limit is reached."""
+    working_set = WorkingSet(max_turns=1)
+    working_set.add(make_chunks("old ", 2), np.vstack([unit(1, 0), unit(1, 0)]))
+    working_set.add(make_chunks("new ", 1), np.vstack([unit(0, 1)]))
+
+    assert len(working_set) == 1
+    assert working_set.search(unit(1, 0), k=5)[0][0].page_content == "new "
+
+def test_working_set_keeps_chunk_text_not_parent_pages():
+    """Test that only the chunks' own text is retained."""
+    working_set = WorkingSet(max_turns=1)
+    chunks = make_chunks("Paris facts. ", 100)[:1]
+    working_set.add(chunks, np.vstack([unit(1, 0)]))
+
+    texts, metadatas, _ = working_set._turns[0]
+    assert texts == ["Paris facts. "]
+    assert "Paris facts. " * 100 not in metadatas[0].values()
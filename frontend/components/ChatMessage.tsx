@@ -6,7 +6,11 @@ export interface ChatMessage {
   content: string
   sources?: Array<{
     content: string
-    metadata: Record<string, any>
+    metadata: {
+      source: string
+      title?: string | null
+      url?: string | null
+    }
   }>
 }
 